@@ -0,0 +1,83 @@
+"""
+Micro-benchmark of the Gini fit in ogeth.income.get_gini_scale against
+the previous implementation, which ran scipy's bisection and built an
+ogcore.utils.Inequality object at every iteration.
+
+The OG-Core default parameters are used as the baseline ability matrix,
+so no network access is needed. Run with:
+
+    python benchmarks/bench_gini_scale.py
+"""
+
+import timeit
+import numpy as np
+import scipy.optimize as opt
+from ogcore import utils
+from ogcore.parameters import Specifications
+from ogeth import income
+
+
+def bisect_inequality(gini_to_match, usa):
+    """
+    Previous implementation of the Gini fit in get_e_interp.
+    """
+    gini_usa_model = utils.Inequality(
+        usa["e"], usa["omega_SS"], usa["lambdas"], usa["S"], usa["J"]
+    ).gini()
+
+    def f(a):
+        gini_target_model = utils.Inequality(
+            usa["e"] * np.exp(a * usa["e"]),
+            usa["omega_SS"],
+            usa["lambdas"],
+            usa["S"],
+            usa["J"],
+        ).gini()
+        return (gini_to_match / income.GINI_USA_DATA) - (
+            gini_target_model / gini_usa_model
+        )
+
+    return opt.root_scalar(
+        f, method="bisect", bracket=[-1, 1], xtol=1e-10
+    ).root
+
+
+def main(number=20):
+    p = Specifications()
+    usa = {
+        "e": p.e[0, :, :],
+        "omega_SS": p.omega_SS,
+        "lambdas": p.lambdas,
+        "S": p.S,
+        "J": p.J,
+    }
+    targets = np.linspace(25, 45, 100)
+    cases = [
+        (
+            "single target",
+            lambda: bisect_inequality(31.1, usa),
+            lambda: income.get_gini_scale(31.1, usa),
+        ),
+        (
+            "100 targets",
+            lambda: [bisect_inequality(g, usa) for g in targets],
+            lambda: income.get_gini_scale(targets, usa),
+        ),
+    ]
+    for name, old, new in cases:
+        t_old = min(timeit.repeat(old, number=number, repeat=3)) / number
+        t_new = min(timeit.repeat(new, number=number, repeat=3)) / number
+        print(
+            f"{name}: bisect + Inequality {t_old * 1e3:.3f} ms, "
+            + f"get_gini_scale {t_new * 1e3:.3f} ms, "
+            + f"speedup {t_old / t_new:.1f}x"
+        )
+    err = np.abs(
+        income.get_gini_scale(targets, usa)
+        - np.array([bisect_inequality(g, usa) for g in targets])
+    ).max()
+    print(f"max abs difference in a: {err:.2e}")
+
+
+if __name__ == "__main__":
+    main()
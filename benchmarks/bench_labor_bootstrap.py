@@ -0,0 +1,103 @@
+"""
+Benchmark of the labor moment bootstrap in ogeth.labor.VCV_moments
+against the previous implementation, which masked the full QLFS
+DataFrame and refit the moments one replicate at a time.
+
+Synthetic QLFS data are used, so no survey files are needed. Run with:
+
+    python benchmarks/bench_labor_bootstrap.py
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from scipy import interpolate
+from ogeth import labor
+
+
+def synthetic_qlfs(N=50_000, seed=0):
+    rng = np.random.default_rng(seed)
+    age_group = rng.choice(labor.AGE_GROUPS, N)
+    mean_hours = 40 - 0.02 * (np.arange(len(labor.AGE_GROUPS)) - 8) ** 2 * 10
+    hours = rng.poisson(
+        np.maximum(
+            mean_hours[pd.Index(labor.AGE_GROUPS).get_indexer(age_group)], 1
+        )
+    )
+    df = pd.DataFrame(
+        {
+            "age_group": pd.Categorical(
+                age_group, dtype=labor.AGE_GROUP_DTYPE
+            ),
+            "hours": hours.astype(float),
+            "weight": rng.uniform(50, 500, N).astype(np.float32),
+        }
+    )
+
+    return df
+
+
+def loop_moments(df):
+    """
+    Previous implementation of compute_labor_moments.
+    """
+    by_age = pd.DataFrame(
+        df.groupby("age_group", observed=True)[["hours", "weight"]].apply(
+            lambda x: (x["hours"] * x["weight"]).sum() / x["weight"].sum()
+        )
+    )
+    by_age.columns = ["hours"]
+    by_age = by_age.drop(["00-04", "05-09", "10-14"])
+    by_age = by_age.rename(index={"75+": "75-85"})
+    age_midpoints = (
+        pd.Series(by_age.index)
+        .str.split("-")
+        .apply(lambda x: (int(x[0]) + int(x[1])) / 2)
+    )
+    by_age["frac_work"] = by_age["hours"] / ((24 - 8) * 7)
+    labor_dist = interpolate.interp1d(
+        age_midpoints, by_age["frac_work"], kind="cubic"
+    )
+    labor_spline = labor_dist(np.linspace(20, 80, 60))
+    slope = (labor_spline[-1] - labor_spline[-8]) / (8 + 1)
+    labor_dist_data = np.zeros(80)
+    labor_dist_data[:60] = labor_spline
+    labor_dist_data[60:] = labor_spline[-1] + slope * range(20)
+
+    return labor_dist_data
+
+
+def loop_VCV(df, n):
+    """
+    Previous implementation of VCV_moments.
+    """
+    boot = np.zeros((n, 80))
+    for i in range(n):
+        boot[i, :] = loop_moments(
+            df[np.random.randint(2, size=len(df.index)).astype(bool)]
+        )
+
+    return np.cov(boot.T)
+
+
+def main(n=1000):
+    df = synthetic_qlfs()
+    start = time.perf_counter()
+    VCV_old = loop_VCV(df, n)
+    t_old = time.perf_counter() - start
+    start = time.perf_counter()
+    VCV_new = labor.VCV_moments(df, n, seed=0)
+    t_new = time.perf_counter() - start
+    print(
+        f"{n} replicates, {len(df)} observations: loop {t_old:.2f} s, "
+        + f"VCV_moments {t_new:.2f} s, speedup {t_old / t_new:.1f}x"
+    )
+    # the two bootstraps use different draws, so only compare the scale
+    print(
+        "median ratio of bootstrap variances: "
+        + f"{np.median(np.diag(VCV_new) / np.diag(VCV_old)):.3f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,14 +4,13 @@ from distributed import Client
 import os
 import json
 import time
-import copy
 from importlib.resources import files
 import matplotlib.pyplot as plt
 from ogeth.calibrate import Calibration
 from ogcore.parameters import Specifications
 from ogcore import output_tables as ot
 from ogcore import output_plots as op
-from ogcore.execute import runner
+from ogeth.scenarios import run_scenarios
 from ogcore.utils import safe_read_pickle
 from ogeth.utils import is_connected
 import ogcore
@@ -29,20 +28,16 @@ def main():
     # Directories to save data
     CUR_DIR = os.path.dirname(os.path.realpath(__file__))
     save_dir = os.path.join(CUR_DIR, "OG-ETH-Example")
-    base_dir = os.path.join(save_dir, "OUTPUT_BASELINE")
-    reform_dir = os.path.join(save_dir, "OUTPUT_REFORM")
 
     """
     ---------------------------------------------------------------------------
-    Run baseline policy
+    Set up baseline policy
     ---------------------------------------------------------------------------
     """
     # Set up baseline parameterization
     p = Specifications(
         baseline=True,
         num_workers=num_workers,
-        baseline_dir=base_dir,
-        output_base=base_dir,
     )
     # Update parameters for baseline from default json file
     # with (
@@ -65,32 +60,43 @@ def main():
         updated_params = c.get_dict()
         p.update_specifications(updated_params)
 
-    # Run model
-    start_time = time.time()
-    runner(p, time_path=True, client=client)
-    print("run time = ", time.time() - start_time)
-
     """
-    Run reform policy
+    ---------------------------------------------------------------------------
+    Run baseline and reform policies
     ---------------------------------------------------------------------------
     """
-
-    # create new Specifications object for reform simulation
-    p2 = copy.deepcopy(p)
-    p2.baseline = False
-    p2.output_base = reform_dir
-
-    # Parameter change for the reform run
-    updated_params_ref = {
-        "cit_rate": [[0.25]],  # decrease CIT rate to 25%
-    }
-    p2.update_specifications(updated_params_ref)
+    # Parameter changes for the reform runs, which are run at the same
+    # time once the baseline is solved
+    reforms = [
+        {
+            "cit_rate": [[0.25]],  # decrease CIT rate to 25%
+        },
+    ]
 
     # Run model
     start_time = time.time()
-    runner(p2, time_path=True, client=client)
+    # solutions of models with the same parameters as a previous run are
+    # taken from the result cache of ogeth.result_cache
+    manifest = run_scenarios(
+        p,
+        reforms,
+        save_dir,
+        client=client,
+        names=["cit"],
+        time_path=True,
+        use_cache=True,
+    )
     print("run time = ", time.time() - start_time)
     client.close()
+    # a failed reform is recorded in the manifest, and its output
+    # directory may hold the output of an earlier run
+    for scenario in manifest:
+        if scenario["status"] != "complete":
+            raise RuntimeError(
+                scenario["name"] + " failed: " + str(scenario["error"])
+            )
+    base_dir = manifest[0]["output_dir"]
+    reform_dir = manifest[1]["output_dir"]
 
     """
     ---------------------------------------------------------------------------
@@ -1,11 +1,43 @@
 """
 Specify what is available to import from the ogeth package.
+
+The submodules are imported on first use (PEP 562), so that
+``import ogeth`` does not import pandas, statsmodels, or ogcore, or read
+the SAM, until a function or class that needs them is accessed.
 """
 
-from ogeth.calibrate import *
-from ogeth.income import *
-from ogeth.input_output import *
-from ogeth.macro_params import *
-from ogeth.utils import *
+import importlib
 
 __version__ = "0.0.5"
+
+# Submodules whose public names are available from the ogeth package.
+# When two submodules define the same name, the one later in this list
+# is used.
+_SUBMODULES = (
+    "calibrate",
+    "income",
+    "input_output",
+    "macro_params",
+    "utils",
+)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module("ogeth." + name)
+    if name == "__all__":
+        names = []
+        for submodule in _SUBMODULES:
+            module = importlib.import_module("ogeth." + submodule)
+            names += [n for n in dir(module) if not n.startswith("_")]
+        return sorted(set(names))
+    if not name.startswith("_"):
+        for submodule in reversed(_SUBMODULES):
+            module = importlib.import_module("ogeth." + submodule)
+            if hasattr(module, name):
+                return getattr(module, name)
+    raise AttributeError("module 'ogeth' has no attribute " + repr(name))
+
+
+def __dir__():
+    return sorted(set(globals().keys()) | set(_SUBMODULES))
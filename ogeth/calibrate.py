@@ -1,9 +1,65 @@
-from ogeth import macro_params, income
+from ogeth import macro_params, income, demographics, snapshots
 from ogeth import input_output as io
+from ogeth.utils import (
+    CACHE_DIR,
+    hash_bytes,
+    evict_cache,
+    to_json,
+    write_json,
+)
 import os
-import numpy as np
+import json
+import time
 import datetime
-from ogcore import demographics
+import numpy as np
+import ogcore
+import ogeth
+
+# Directory of the cached calibration components, each saved as a
+# compressed .npz file of its arrays and a .json file of its other
+# values, and the size the directory is kept under
+CALIBRATION_CACHE_DIR = os.path.join(CACHE_DIR, "calibration")
+CALIBRATION_CACHE_MAX_BYTES = 500 * 1024**2
+# Macro parameters pulled from the APIs are cached for at most
+# MACRO_CACHE_TTL seconds
+MACRO_CACHE_TTL = 30 * 24 * 60 * 60
+# Components built from the UN data or the OG-USA baseline are cached
+# for at most DATA_CACHE_TTL seconds
+DATA_CACHE_TTL = 30 * 24 * 60 * 60
+# Components of the calibration, with the parameters of p and the
+# options of the Calibration each one depends on, and the components it
+# uses. A component is listed after the components it uses.
+COMPONENTS = {
+    "macro": {
+        "params": (),
+        "options": (
+            "macro_data_start_year",
+            "macro_data_end_year",
+            "update_from_api",
+            "snapshot_id",
+            "api_period",
+        ),
+        "deps": (),
+    },
+    "alpha_c": {"params": ("I",), "options": ("sam",), "deps": ()},
+    "io_matrix": {"params": ("M",), "options": ("sam",), "deps": ()},
+    "demographics": {
+        "params": ("E", "S", "T", "start_year"),
+        "options": ("data_period",),
+        "deps": (),
+    },
+    # demographics for 80 period lives, needed for getting e
+    "demog80": {
+        "params": ("T", "start_year"),
+        "options": ("data_period",),
+        "deps": (),
+    },
+    "e": {
+        "params": ("E", "S", "J", "lambdas"),
+        "options": ("gini_to_match", "data_period"),
+        "deps": ("demog80",),
+    },
+}
 
 
 class Calibration:
@@ -17,16 +73,42 @@ class Calibration:
         demographic_data_path=None,
         output_path=None,
         update_from_api=True,  # Set True to update from World Bank and UN APIs
+        gini_to_match=31.1,
+        snapshot_id=None,
+        use_cache=True,
+        refresh=False,
+        cache_dir=None,
     ):
         """
         Constructor for the Calibration class.
 
+        The components of the calibration in COMPONENTS are computed
+        when they are first accessed, e.g., by get_dict, and after
+        recalibrate only the components whose inputs changed are
+        computed again. Each component is also cached on disk, keyed by
+        its inputs. The names of the computed components are in
+        self.recomputed. With update_from_api=True and no snapshot_id,
+        the cached macro parameters are reused for at most
+        MACRO_CACHE_TTL seconds, and the components built from the UN
+        data or the OG-USA baseline for at most DATA_CACHE_TTL seconds,
+        or until refresh is used. The UN data is saved to
+        demographic_data_path when the demographics are computed, and
+        they are computed again if the files are not there.
+
         Args:
             p (OG-Core Specifications object): model parameters
             demographic_data_path (str): path to save demographic data
             output_path (str): path to save output to
             update_from_api (bool): Set True if you want to pull updated macro data
                 from World Bank and UN APIs
+            gini_to_match (float): Gini coefficient of earnings to match
+            snapshot_id (str): if not None, id of a snapshot of the macro
+                data (or "latest") to use instead of the APIs
+            use_cache (bool): if True, use and update the cache
+            refresh (bool or list): if True, recompute all components,
+                or the components in the list, and update the cache
+            cache_dir (str): path to the cache, defaults to
+                CALIBRATION_CACHE_DIR
 
         Returns:
             None
@@ -36,76 +118,347 @@ class Calibration:
         if output_path is not None:
             if not os.path.exists(output_path):
                 os.makedirs(output_path)
-
-        # Macro estimation
-        self.macro_params = macro_params.get_macro_params(
-            macro_data_start_year,
-            macro_data_end_year,
+        self.output_path = output_path
+        self.demographic_data_path = demographic_data_path
+        self.use_cache = use_cache
+        self.cache_dir = (
+            CALIBRATION_CACHE_DIR if cache_dir is None else cache_dir
+        )
+        self.recomputed = []
+        self._values = {}
+        self._keys = {}
+        self._params = {}
+        self._options = {}
+        self._refresh = set()
+        if demographic_data_path is not None and not all(
+            os.path.exists(os.path.join(demographic_data_path, file))
+            for file in demographics.UN_RATES_FILES.values()
+        ):
+            if refresh is not True:
+                refresh = list(refresh or ()) + ["demographics"]
+        self.recalibrate(
+            p,
+            refresh=refresh,
+            macro_data_start_year=macro_data_start_year,
+            macro_data_end_year=macro_data_end_year,
             update_from_api=update_from_api,
+            gini_to_match=gini_to_match,
+            snapshot_id=snapshot_id,
+        )
+
+    def recalibrate(self, p=None, refresh=False, **options):
+        """
+        Update the parameters and options of the calibration. The
+        components whose inputs changed, and the components that use
+        them, are computed again when they are next accessed.
+
+        Args:
+            p (OG-Core Specifications object): model parameters, if None
+                the parameters are unchanged
+            refresh (bool or list): if True, recompute all components,
+                or the components in the list, without the cache
+            options: new values of the options of the constructor, e.g.,
+                gini_to_match
+
+        Returns:
+            dirty (list): names of the components to compute again
+
+        """
+        old_params, old_options = self._params, self._options
+        if p is not None:
+            self._params = {
+                name: to_json(np.asarray(getattr(p, name)))
+                for name in sorted(
+                    {k for c in COMPONENTS.values() for k in c["params"]}
+                )
+            }
+        self._options = dict(old_options)
+        for name, value in options.items():
+            if name == "snapshot_id" and value is not None:
+                # resolve "latest" so that the key changes with new
+                # snapshots
+                value = snapshots.get_snapshot_info(value)["id"]
+            self._options[name] = value
+        # data pulled from the APIs is keyed by the period of
+        # MACRO_CACHE_TTL seconds it was pulled in, so that it is pulled
+        # again in the next period
+        if (
+            self._options["update_from_api"]
+            and self._options["snapshot_id"] is None
+        ):
+            self._options["api_period"] = int(time.time() // MACRO_CACHE_TTL)
+        else:
+            self._options["api_period"] = None
+        self._options["sam"] = io.get_sam_hash()
+        # the UN data and the OG-USA baseline are keyed the same way
+        self._options["data_period"] = int(time.time() // DATA_CACHE_TTL)
+        if refresh is True:
+            refresh = list(COMPONENTS)
+        self._refresh.update(refresh or ())
+        dirty = []
+        for name, component in COMPONENTS.items():
+            if (
+                name in self._refresh
+                or any(dep in dirty for dep in component["deps"])
+                or any(
+                    old_params.get(k) != self._params[k]
+                    for k in component["params"]
+                )
+                or any(
+                    old_options.get(k) != self._options[k]
+                    for k in component["options"]
+                )
+            ):
+                dirty.append(name)
+                self._values.pop(name, None)
+                self._keys.pop(name, None)
+        self.recomputed = []
+
+        return dirty
+
+    @property
+    def macro_params(self):
+        return self._get("macro")["params"]
+
+    @property
+    def alpha_c(self):
+        return self._get("alpha_c")["alpha_c"]
+
+    @property
+    def io_matrix(self):
+        return self._get("io_matrix")["io_matrix"]
+
+    @property
+    def demographic_params(self):
+        return self._get("demographics")
+
+    @property
+    def e(self):
+        return self._get("e")["e"]
+
+    # method to return all newly calibrated parameters in a dictionary
+    def get_dict(self):
+        dict = {}
+        dict.update(self.macro_params)
+        # demographics before e, so that both population builds run at
+        # the same time if neither is cached
+        demographic_params = self.demographic_params
+        dict["e"] = self.e
+        dict["alpha_c"] = self.alpha_c
+        dict["io_matrix"] = self.io_matrix
+        dict.update(demographic_params)
+
+        return dict
+
+    def _inputs(self, name):
+        component = COMPONENTS[name]
+        inputs = {k: self._params[k] for k in component["params"]}
+        inputs.update({k: self._options[k] for k in component["options"]})
+        for dep in component["deps"]:
+            self._get(dep)
+            inputs[dep] = self._keys[dep]
+
+        return inputs
+
+    def _load(self, name, key):
+        # earnings profiles are recomputed if their plots are requested
+        if (
+            not self.use_cache
+            or name in self._refresh
+            or (name == "e" and self.output_path is not None)
+        ):
+            return None
+        return load_component(name, key, self.cache_dir)
+
+    def _get(self, name):
+        if name in self._values:
+            return self._values[name]
+        inputs = self._inputs(name)
+        key = get_cache_key(name, inputs)
+        values = self._load(name, key)
+        if values is None:
+            values = getattr(self, "_compute_" + name)(inputs)
+            self.recomputed.append(name)
+            self._refresh.discard(name)
+            print("Recomputed calibration component: " + name)
+            # components with data sources that failed are not cached
+            if self.use_cache and values.get("ok", True):
+                save_component(name, key, inputs, values, self.cache_dir)
+                evict_cache(
+                    self.cache_dir, max_bytes=CALIBRATION_CACHE_MAX_BYTES
+                )
+        self._values[name] = values
+        self._keys[name] = key
+
+        return values
+
+    def _compute_macro(self, inputs):
+        params, status = macro_params.get_macro_params(
+            self._options["macro_data_start_year"],
+            self._options["macro_data_end_year"],
+            update_from_api=inputs["update_from_api"],
+            return_status=True,
+            snapshot_id=inputs["snapshot_id"],
         )
         print("Calibrated macro parameters.")
-        print(self.macro_params)
+        print(params)
 
-        # io matrix and alpha_c
-        if p.I > 1:  # no need if just one consumption good
+        return {
+            "params": params,
+            "ok": all(source["ok"] for source in status.values()),
+        }
+
+    def _compute_alpha_c(self, inputs):
+        if inputs["I"] > 1:  # no need if just one consumption good
             alpha_c_dict = io.get_alpha_c()
             # check that model dimensions are consistent with alpha_c
-            assert p.I == len(list(alpha_c_dict.keys()))
-            self.alpha_c = np.array(list(alpha_c_dict.values()))
+            assert inputs["I"] == len(list(alpha_c_dict.keys()))
+            alpha_c = np.array(list(alpha_c_dict.values()))
         else:
-            self.alpha_c = np.array([1.0])
-        if p.M > 1:  # no need if just one production good
+            alpha_c = np.array([1.0])
+
+        return {"alpha_c": alpha_c}
+
+    def _compute_io_matrix(self, inputs):
+        if inputs["M"] > 1:  # no need if just one production good
             io_df = io.get_io_matrix()
             # check that model dimensions are consistent with io_matrix
-            assert p.M == len(list(io_df.keys()))
-            self.io_matrix = io_df.values
+            assert inputs["M"] == len(list(io_df.keys()))
+            io_matrix = io_df.values
         else:
-            self.io_matrix = np.array([[1.0]])
-
-        # demographics
-        self.demographic_params = demographics.get_pop_objs(
-            p.E,
-            p.S,
-            p.T,
-            0,
-            99,
-            country_id="231",
-            initial_data_year=p.start_year - 1,
-            final_data_year=p.start_year + 1,
-            GraphDiag=False,
-            download_path=demographic_data_path,
+            io_matrix = np.array([[1.0]])
+
+        return {"io_matrix": io_matrix}
+
+    def _compute_demographics(self, inputs):
+        dims = [(inputs["E"], inputs["S"])]
+        # build the demographics for 80 period lives at the same time if
+        # they will be needed, the build is memoized by demographics
+        if "demog80" not in self._values:
+            demog80_inputs = self._inputs("demog80")
+            if (
+                self._load("demog80", get_cache_key("demog80", demog80_inputs))
+                is None
+            ):
+                dims.append((20, 80))
+        pop_dicts = demographics.get_pop_objs_concurrent(
+            dims, inputs["T"], inputs["start_year"]
         )
+        if self.demographic_data_path is not None:
+            demographics.save_un_rates(
+                inputs["E"],
+                inputs["S"],
+                inputs["start_year"],
+                self.demographic_data_path,
+            )
+
+        return dict(pop_dicts[0])
 
-        # demographics for 80 period lives (needed for getting e below)
+    def _compute_demog80(self, inputs):
         demog80 = demographics.get_pop_objs(
-            20,
-            80,
-            p.T,
-            0,
-            99,
-            country_id="231",
-            initial_data_year=p.start_year - 1,
-            final_data_year=p.start_year + 1,
-            GraphDiag=False,
+            20, 80, inputs["T"], inputs["start_year"]
         )
 
-        # earnings profiles
-        self.e = income.get_e_interp(
-            p.E,
-            p.S,
-            p.J,
-            p.lambdas,
-            demog80["omega_SS"],
-            plot_path=output_path,
+        return {"omega_SS": demog80["omega_SS"]}
+
+    def _compute_e(self, inputs):
+        e = income.get_e_interp(
+            inputs["E"],
+            inputs["S"],
+            inputs["J"],
+            np.asarray(inputs["lambdas"]),
+            self._values["demog80"]["omega_SS"],
+            gini_to_match=inputs["gini_to_match"],
+            plot_path=self.output_path,
         )
 
-    # method to return all newly calibrated parameters in a dictionary
-    def get_dict(self):
-        dict = {}
-        dict.update(self.macro_params)
-        dict["e"] = self.e
-        dict["alpha_c"] = self.alpha_c
-        dict["io_matrix"] = self.io_matrix
-        dict.update(self.demographic_params)
+        return {"e": e}
 
-        return dict
+
+def get_cache_key(name, inputs):
+    """
+    Get the cache key of a calibration component, a hash of its inputs
+    and of the OG-Core and OG-ETH versions.
+
+    Args:
+        name (str): name of the component
+        inputs (dict): JSON serializable inputs of the component
+
+    Returns:
+        key (str): hex digest of the component
+
+    """
+    key = hash_bytes(
+        json.dumps(
+            {
+                "name": name,
+                "inputs": inputs,
+                "ogcore": ogcore.__version__,
+                "ogeth": ogeth.__version__,
+            },
+            sort_keys=True,
+            default=to_json,
+        ).encode("utf-8")
+    )
+
+    return key
+
+
+def load_component(name, key, cache_dir=CALIBRATION_CACHE_DIR):
+    """
+    Load a cached calibration component.
+
+    Args:
+        name (str): name of the component
+        key (str): cache key of the component
+        cache_dir (str): path to the cache
+
+    Returns:
+        values (dict): values of the component, None if not cached
+
+    """
+    base = os.path.join(cache_dir, name + "-" + key)
+    if not (os.path.exists(base + ".npz") and os.path.exists(base + ".json")):
+        return None
+    with open(base + ".json", "r") as file:
+        values = json.load(file)["values"]
+    with np.load(base + ".npz") as arrays:
+        values.update({k: arrays[k] for k in arrays.files})
+
+    return values
+
+
+def save_component(name, key, inputs, values, cache_dir=CALIBRATION_CACHE_DIR):
+    """
+    Save a calibration component to the cache, its arrays to a
+    compressed .npz file and its other values and inputs to a .json
+    file.
+
+    Args:
+        name (str): name of the component
+        key (str): cache key of the component
+        inputs (dict): inputs of the component
+        values (dict): values of the component
+        cache_dir (str): path to the cache
+
+    Returns:
+        None
+
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    base = os.path.join(cache_dir, name + "-" + key)
+    arrays = {k: v for k, v in values.items() if isinstance(v, np.ndarray)}
+    with open(base + ".npz.tmp", "wb") as file:
+        np.savez_compressed(file, **arrays)
+    os.replace(base + ".npz.tmp", base + ".npz")
+    write_json(
+        {
+            "name": name,
+            "inputs": inputs,
+            "created": datetime.datetime.now(
+                datetime.timezone.utc
+            ).isoformat(),
+            "values": {k: v for k, v in values.items() if k not in arrays},
+        },
+        base + ".json",
+    )
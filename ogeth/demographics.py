@@ -0,0 +1,273 @@
+"""
+This module builds the OG-Core population objects for OG-ETH from the
+UN World Population Prospects data. The raw UN fertility, mortality, and
+population series are downloaded once and shared by all population
+builds, and population builds for different model dimensions run
+concurrently.
+"""
+
+# imports
+import os
+import copy
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from ogcore import demographics
+
+UN_COUNTRY_ID = "231"  # UN code for Ethiopia
+MIN_AGE = 0
+MAX_AGE = 99
+# files of the UN data series written by save_un_rates, with the same
+# names as ogcore.demographics
+UN_RATES_FILES = {
+    "fert_rates": "fert_rates.csv",
+    "mort_rates": "mort_rates.csv",
+    "infmort_rates": "infmort_rates.csv",
+    "pop_dist": "population_distribution.csv",
+    "pre_pop_dist": "pre_period_population_distribution.csv",
+}
+
+
+@functools.lru_cache(maxsize=8)
+def get_un_series(country_id=UN_COUNTRY_ID, start_year=2021, end_year=2023):
+    """
+    Retrieve the raw UN fertility, mortality, and population series
+    used by ogcore.demographics.get_pop_objs. The series are memoized so
+    that they are only downloaded once per process.
+
+    Args:
+        country_id (str): country id for UN data
+        start_year (int): initial year of data to use
+        end_year (int): final year of data to use
+
+    Returns:
+        un_series (dict): DataFrames of UN data, with keys "fert"
+            (years start_year to end_year), "mort" (start_year to
+            end_year), and "pop" (start_year - 1 to end_year + 2)
+
+    """
+    un_series = {
+        "fert": demographics.get_un_data(
+            "68",
+            country_id=country_id,
+            start_year=start_year,
+            end_year=end_year,
+        ),
+        "mort": demographics.get_un_data(
+            "80",
+            country_id=country_id,
+            start_year=start_year,
+            end_year=end_year,
+        ),
+        # population data are needed one year before the start year for
+        # omega_S_preTP and two years after the end year to infer
+        # immigration rates
+        "pop": demographics.get_un_data(
+            "47",
+            country_id=country_id,
+            start_year=start_year - 1,
+            end_year=end_year + 2,
+        ),
+    }
+
+    return un_series
+
+
+def get_un_rates(
+    E,
+    S,
+    country_id=UN_COUNTRY_ID,
+    initial_data_year=2021,
+    final_data_year=2023,
+):
+    """
+    Compute fertility rates, mortality rates, and population
+    distributions over E+S model ages from the shared UN series. This
+    follows the cleaning and rebinning in ogcore.demographics.get_fert,
+    get_mort, and get_pop.
+
+    Args:
+        E (int): number of model periods in which agent is not
+            economically active, >= 1
+        S (int): number of model periods in which agent is economically
+            active, >= 3
+        country_id (str): country id for UN data
+        initial_data_year (int): initial year of data to use
+        final_data_year (int): final year of data to use
+
+    Returns:
+        un_rates (dict): fert_rates (T0 x E+S), mort_rates (T0 x E+S),
+            infmort_rates (T0), pop_dist (T0+1 x E+S), and pre_pop_dist
+            (E+S), with T0 = final_data_year - initial_data_year + 1
+
+    """
+    totpers = E + S
+    un = get_un_series(country_id, initial_data_year, final_data_year)
+    T0 = final_data_year - initial_data_year + 1
+    fert_rates = np.zeros((T0, totpers))
+    mort_rates = np.zeros((T0, totpers))
+    infmort_rates = np.zeros(T0)
+    pop_dist = np.zeros((T0 + 1, totpers))
+    for t, y in enumerate(range(initial_data_year, final_data_year + 1)):
+        df = un["fert"]
+        fert = df[
+            (df.age >= MIN_AGE) & (df.age <= MAX_AGE) & (df.year == y)
+        ].value.values
+        # fill in with zeros for ages < 15 and > 49
+        fert = np.append(fert, np.zeros(MAX_AGE - 49))
+        fert = np.append(np.zeros(15 - MIN_AGE), fert)
+        # births per 1000 women to births per person
+        fert_rates[t, :] = demographics.pop_rebin(fert / 2000, totpers)
+        df = un["mort"]
+        mort = df[
+            (df.age >= MIN_AGE) & (df.age <= MAX_AGE) & (df.year == y)
+        ].value.values
+        # mortality rates for 0 year olds are the infant mortality rates
+        infmort_rates[t] = mort[0]
+        mort_rates[t, :] = demographics.pop_rebin(
+            np.append(mort[1:], 1.0), totpers
+        )
+    df = un["pop"]
+    for t, y in enumerate(range(initial_data_year, final_data_year + 2)):
+        pop = df[
+            (df.age >= MIN_AGE) & (df.age <= MAX_AGE) & (df.year == y)
+        ].value.values
+        pop_dist[t, :] = demographics.pop_rebin(pop, totpers)
+    pre_pop = df[
+        (df.age >= MIN_AGE)
+        & (df.age <= MAX_AGE)
+        & (df.year == initial_data_year - 1)
+    ].value.values
+    un_rates = {
+        "fert_rates": fert_rates,
+        "mort_rates": mort_rates,
+        "infmort_rates": infmort_rates,
+        "pop_dist": pop_dist,
+        "pre_pop_dist": demographics.pop_rebin(pre_pop, totpers),
+    }
+
+    return un_rates
+
+
+def get_pop_objs(E, S, T, start_year, country_id=UN_COUNTRY_ID):
+    """
+    Compute the OG-Core population objects for the given model
+    dimensions, using the data years start_year - 1 to start_year + 1.
+    Results are memoized by (E, S, T, start_year, country_id), and each
+    call returns copies of the memoized arrays.
+
+    Args:
+        E (int): number of model periods in which agent is not
+            economically active, >= 1
+        S (int): number of model periods in which agent is economically
+            active, >= 3
+        T (int): number of periods to be simulated in TPI, > 2*S
+        start_year (int): first year of the model
+        country_id (str): country id for UN data
+
+    Returns:
+        pop_dict (dict): population objects from
+            ogcore.demographics.get_pop_objs
+
+    """
+    pop_dict = {
+        k: copy.deepcopy(v)
+        for k, v in _get_pop_objs(E, S, T, start_year, country_id).items()
+    }
+
+    return pop_dict
+
+
+@functools.lru_cache(maxsize=16)
+def _get_pop_objs(E, S, T, start_year, country_id):
+    """
+    Memoized implementation of get_pop_objs.
+    """
+    un_rates = get_un_rates(E, S, country_id, start_year - 1, start_year + 1)
+    pop_dict = demographics.get_pop_objs(
+        E,
+        S,
+        T,
+        MIN_AGE,
+        MAX_AGE,
+        fert_rates=un_rates["fert_rates"],
+        mort_rates=un_rates["mort_rates"],
+        infmort_rates=un_rates["infmort_rates"],
+        pop_dist=un_rates["pop_dist"],
+        pre_pop_dist=un_rates["pre_pop_dist"],
+        country_id=country_id,
+        initial_data_year=start_year - 1,
+        final_data_year=start_year + 1,
+        GraphDiag=False,
+    )
+
+    return pop_dict
+
+
+def get_pop_objs_concurrent(dims, T, start_year, country_id=UN_COUNTRY_ID):
+    """
+    Compute the population objects for several model dimensions at
+    once. The UN data are retrieved once, and the builds for distinct
+    dimensions run at the same time in a thread pool.
+
+    Args:
+        dims (list): list of (E, S) tuples
+        T (int): number of periods to be simulated in TPI, > 2*S
+        start_year (int): first year of the model
+        country_id (str): country id for UN data
+
+    Returns:
+        pop_dicts (list): population objects for each (E, S) in dims
+
+    """
+    # download the UN data before starting the threads
+    get_un_series(country_id, start_year - 1, start_year + 1)
+    unique_dims = list(dict.fromkeys(dims))
+    with ThreadPoolExecutor(max_workers=len(unique_dims)) as executor:
+        futures = {
+            (E, S): executor.submit(
+                get_pop_objs, E, S, T, start_year, country_id
+            )
+            for E, S in unique_dims
+        }
+    pop_dicts = [futures[(E, S)].result() for E, S in dims]
+
+    return pop_dicts
+
+
+def save_un_rates(E, S, start_year, download_path, country_id=UN_COUNTRY_ID):
+    """
+    Save the UN data series used for the population objects to csv
+    files, with the same file names as ogcore.demographics.
+
+    Args:
+        E (int): number of model periods in which agent is not
+            economically active, >= 1
+        S (int): number of model periods in which agent is economically
+            active, >= 3
+        start_year (int): first year of the model
+        download_path (str): path to save the data to
+        country_id (str): country id for UN data
+
+    Returns:
+        None
+
+    """
+    un_rates = get_un_rates(E, S, country_id, start_year - 1, start_year + 1)
+    for key, file in UN_RATES_FILES.items():
+        np.savetxt(
+            os.path.join(download_path, file), un_rates[key], delimiter=","
+        )
+    demographics.get_imm_rates(
+        E + S,
+        MIN_AGE,
+        MAX_AGE,
+        un_rates["fert_rates"],
+        un_rates["mort_rates"],
+        un_rates["infmort_rates"],
+        un_rates["pop_dist"],
+        country_id,
+        start_year - 1,
+        start_year + 1,
+        download_path=download_path,
+    )
@@ -0,0 +1,440 @@
+"""
+------------------------------------------------------------------------
+Estimates the disutility of labor parameters, chi_n, by GMM. The model
+moments are the steady-state labor supply by age and the data moments
+are the QLFS labor moments from ogeth.labor.
+
+chi_n is parameterized as exp(basis @ theta), with a basis of Chebyshev
+polynomials in age, so the optimizer searches over a few coefficients.
+The steady state solves for the trial point and for the finite
+difference steps of the gradient are run at the same time on a Dask
+client, and each steady state solve starts from the solution for the
+nearest chi_n solved so far.
+------------------------------------------------------------------------
+"""
+
+# imports
+import os
+import copy
+import threading
+import contextlib
+import numpy as np
+import scipy.optimize as opt
+import matplotlib.pyplot as plt
+from ogcore import SS
+from ogeth import labor
+
+# number of coefficients of the chi_n basis
+NUM_BASIS = 5
+# step of the finite difference gradient of the GMM objective
+GRAD_STEP = 1e-3
+# value of the GMM objective when the steady state cannot be solved
+FAIL_VALUE = 1e10
+# steady state variables in the order of the SS root finder guesses
+SS_GUESS_KEYS = ["r_p", "r", "w", "p_m", "Y", "BQ", "TR", "factor"]
+
+
+class SSCache:
+    """
+    Steady state solutions of previous chi_n vectors, used to warm
+    start the steady state solves of new chi_n vectors from the nearest
+    previous solution, with counts of the SS root finder evaluations.
+    Warm starts are only used while they take fewer evaluations on
+    average than cold starts, since the root finder can take longer to
+    terminate from a point close to the solution.
+    """
+
+    def __init__(self):
+        self.chi_n = []
+        self.guess = []
+        self.nfev_cold = []
+        self.nfev_warm = []
+
+    def nearest(self, chi_n):
+        """
+        Initial guesses from the solution for the nearest chi_n, in
+        distance between log(chi_n), or None if the cache is empty or
+        warm starts do not save evaluations.
+        """
+        if not self.chi_n:
+            return None
+        if (
+            self.nfev_warm
+            and self.nfev_cold
+            and np.mean(self.nfev_warm) >= np.mean(self.nfev_cold)
+        ):
+            return None
+        dist = np.linalg.norm(
+            np.log(np.array(self.chi_n)) - np.log(chi_n), axis=1
+        )
+        return self.guess[int(np.argmin(dist))]
+
+    def add(self, chi_n, guess, nfev, warm):
+        """
+        Add a steady state solution and the number of SS root finder
+        evaluations it took.
+        """
+        if guess is not None:
+            self.chi_n.append(np.asarray(chi_n))
+            self.guess.append(guess)
+        (self.nfev_warm if warm else self.nfev_cold).append(nfev)
+
+    def summary(self):
+        """
+        Number of solves and of SS root finder evaluations, and the
+        evaluations saved by warm starts compared to the average cold
+        start.
+        """
+        summary = {
+            "solves": len(self.nfev_cold) + len(self.nfev_warm),
+            "warm_solves": len(self.nfev_warm),
+            "nfev": sum(self.nfev_cold) + sum(self.nfev_warm),
+            "nfev_saved": None,
+        }
+        if self.nfev_cold:
+            summary["nfev_saved"] = np.mean(self.nfev_cold) * len(
+                self.nfev_warm
+            ) - sum(self.nfev_warm)
+
+        return summary
+
+
+def chi_estimate(
+    p,
+    client=None,
+    estimate=True,
+    plot=False,
+    year=2023,
+    data_dir=os.path.join(labor.CUR_DIR, "data", "qlfs"),
+    num_basis=NUM_BASIS,
+    n_boot=1000,
+    seed=None,
+    ss_cache=None,
+):
+    """
+    Estimate chi_n by GMM, matching the steady-state labor supply by age
+    to the QLFS labor moments, weighted by the inverse of their
+    bootstrapped variance-covariance matrix.
+
+    Args:
+        p (OG-Core Specifications object): model parameters
+        client (Dask client object): client to solve the steady states
+            on, if None they are solved one after another
+        estimate (bool): if True, estimate chi_n, otherwise only compute
+            the model moments at the current p.chi_n
+        plot (bool): if True, save a plot of the data and model moments
+            to p.output_base
+        year (int): year of QLFS data
+        data_dir (str): path to directory with QLFS data
+        num_basis (int): number of coefficients of the chi_n basis
+        n_boot (int): number of bootstrap replicates for the
+            variance-covariance matrix of the moments
+        seed (int): seed of the bootstrap
+        ss_cache (SSCache): cache of steady state solutions to warm
+            start the solves from, a new one is used if None
+
+    Returns:
+        chi_n (Numpy array): estimated chi_n, length S
+
+    """
+    # data moments and weighting matrix
+    qlfs = labor.get_labor_data(year, data_dir)
+    data_moments = labor.compute_labor_moments(qlfs, p.S)[3]
+    VCV = labor.VCV_moments(qlfs, n_boot, p.S, seed=seed, executor=client)
+    # the moments are interpolated from a few age groups, so VCV is
+    # singular and its pseudo-inverse is used
+    W = np.linalg.pinv(VCV, hermitian=True)
+
+    chi_n = np.asarray(p.chi_n)
+    if chi_n.ndim > 1:
+        chi_n = chi_n[0, :]
+    basis = get_chi_n_basis(p.S, num_basis)
+    if ss_cache is None:
+        ss_cache = SSCache()
+    if estimate:
+        # start from the chi_n basis fit of the current chi_n
+        theta_init = np.linalg.lstsq(basis, np.log(chi_n), rcond=None)[0]
+        est_output = opt.minimize(
+            gmm_objective_and_gradient,
+            theta_init,
+            args=(data_moments, W, p, basis, client, ss_cache),
+            jac=True,
+            method="L-BFGS-B",
+        )
+        print("GMM estimation of chi_n: ", est_output.message)
+        chi_n = np.exp(basis @ est_output.x)
+    if plot:
+        model_moments = get_model_moments([chi_n], p, client, ss_cache)[0]
+        ages = np.linspace(20, 100, p.S, endpoint=False)
+        plt.plot(ages, data_moments, label="Data")
+        plt.plot(ages, model_moments, label="Model")
+        plt.xlabel("Age")
+        plt.ylabel("Labor supply")
+        plt.title("Labor supply by age")
+        plt.legend()
+        plt.savefig(
+            os.path.join(p.output_base, "labor_moments_fit.png"),
+            bbox_inches="tight",
+            dpi=300,
+        )
+        plt.close()
+    summary = ss_cache.summary()
+    print(
+        "Steady state solves: "
+        + str(summary["solves"])
+        + ", warm started: "
+        + str(summary["warm_solves"])
+        + ", SS root finder evaluations saved: "
+        + str(summary["nfev_saved"])
+    )
+
+    return chi_n
+
+
+def get_chi_n_basis(S, num_basis=NUM_BASIS):
+    """
+    Get the basis of the chi_n parameterization, Chebyshev polynomials
+    in age, with chi_n = exp(basis @ theta).
+
+    Args:
+        S (int): number of periods of economic life for model households
+        num_basis (int): number of basis functions
+
+    Returns:
+        basis (Numpy array): S x num_basis basis matrix
+
+    """
+    x = np.linspace(-1, 1, S)
+    basis = np.polynomial.chebyshev.chebvander(x, num_basis - 1)
+
+    return basis
+
+
+def gmm_objective_and_gradient(
+    theta, data_moments, W, p, basis, client, ss_cache=None
+):
+    """
+    GMM objective at theta and its forward difference gradient. The
+    steady states at theta and at each step of the gradient are solved
+    at the same time.
+
+    Args:
+        theta (Numpy array): coefficients of the chi_n basis
+        data_moments (Numpy array): labor moments from the data
+        W (Numpy array): weighting matrix
+        p (OG-Core Specifications object): model parameters
+        basis (Numpy array): basis of the chi_n parameterization
+        client (Dask client object): client
+        ss_cache (SSCache): cache of steady state solutions
+
+    Returns:
+        value (float): GMM objective at theta
+        gradient (Numpy array): gradient of the GMM objective
+
+    """
+    thetas = [theta] + [
+        theta + GRAD_STEP * np.eye(len(theta))[k] for k in range(len(theta))
+    ]
+    values = gmm_objectives(
+        thetas, data_moments, W, p, basis, client, ss_cache
+    )
+    gradient = (values[1:] - values[0]) / GRAD_STEP
+
+    return values[0], gradient
+
+
+def gmm_objectives(
+    thetas, data_moments, W, p, basis, client=None, ss_cache=None
+):
+    """
+    Evaluate the GMM objective at several candidate points at once.
+
+    Args:
+        thetas (list): candidate coefficients of the chi_n basis
+        data_moments (Numpy array): labor moments from the data
+        W (Numpy array): weighting matrix
+        p (OG-Core Specifications object): model parameters
+        basis (Numpy array): basis of the chi_n parameterization
+        client (Dask client object): client
+        ss_cache (SSCache): cache of steady state solutions
+
+    Returns:
+        values (Numpy array): GMM objective at each candidate point
+
+    """
+    chi_ns = [np.exp(basis @ theta) for theta in thetas]
+    values = np.array(
+        [
+            (
+                FAIL_VALUE
+                if model_moments is None
+                else (model_moments - data_moments)
+                @ W
+                @ (model_moments - data_moments)
+            )
+            for model_moments in get_model_moments(chi_ns, p, client, ss_cache)
+        ]
+    )
+
+    return values
+
+
+def get_model_moments(chi_ns, p, client=None, ss_cache=None):
+    """
+    Solve the steady state for each candidate chi_n and compute the
+    model labor moments. The steady states are solved at the same time
+    on the Dask client, each starting from the solution in ss_cache for
+    the nearest chi_n.
+
+    Args:
+        chi_ns (list): candidate chi_n vectors, each of length S
+        p (OG-Core Specifications object): model parameters
+        client (Dask client object): client
+        ss_cache (SSCache): cache of steady state solutions, the new
+            solutions are added to it
+
+    Returns:
+        model_moments (list): labor supply by age as a fraction of the
+            time endowment for each chi_n, None where the steady state
+            could not be solved
+
+    """
+    if ss_cache is None:
+        ss_cache = SSCache()
+    guesses = [ss_cache.nearest(chi_n) for chi_n in chi_ns]
+    if client is None:
+        results = [
+            solve_model_moments(p, chi_n, guess)
+            for chi_n, guess in zip(chi_ns, guesses)
+        ]
+    else:
+        # send the parameters to the workers once
+        p_future = client.scatter(p, broadcast=True)
+        futures = [
+            client.submit(
+                solve_model_moments, p_future, chi_n, guess, pure=False
+            )
+            for chi_n, guess in zip(chi_ns, guesses)
+        ]
+        results = client.gather(futures)
+    model_moments = []
+    for chi_n, guess, (moments, ss_guess, nfev) in zip(
+        chi_ns, guesses, results
+    ):
+        ss_cache.add(chi_n, ss_guess, nfev, warm=guess is not None)
+        model_moments.append(moments)
+
+    return model_moments
+
+
+def solve_model_moments(p, chi_n, guess=None):
+    """
+    Solve the steady state for one chi_n and compute the model labor
+    moments.
+
+    Args:
+        p (OG-Core Specifications object): model parameters
+        chi_n (Numpy array): disutility of labor by age, length S
+        guess (dict): initial guesses of the SS solver from a previous
+            solution, see get_ss_guess, if None the OG-Core initial
+            guesses are used
+
+    Returns:
+        model_moments (Numpy array): labor supply by age as a fraction
+            of the time endowment, averaged over ability types, None if
+            the steady state could not be solved
+        ss_guess (dict): initial guesses for later solves from this
+            solution, None if the steady state could not be solved
+        nfev (int): number of evaluations of the SS root finder
+
+    """
+    p = copy.deepcopy(p)
+    p.chi_n = np.tile(chi_n.reshape(1, p.S), (p.T + p.S, 1))
+    with _SS_hooks(guess) as state:
+        try:
+            ss_output = SS.run_SS(p, client=None)
+        except RuntimeError as e:
+            print("Steady state not solved for chi_n: ", e)
+            return None, None, state.nfev
+    model_moments = (ss_output["n"] @ p.lambdas.reshape(p.J)) / p.ltilde
+
+    return model_moments, get_ss_guess(ss_output), state.nfev
+
+
+def get_ss_guess(ss_output):
+    """
+    Initial guesses of the SS solver from a steady state solution.
+
+    Args:
+        ss_output (dict): output of ogcore.SS.run_SS
+
+    Returns:
+        guess (dict): guesses of the SS root finder, and of savings and
+            labor supply for the household problem
+
+    """
+    guess = {
+        "guesses": np.concatenate(
+            [np.ravel(ss_output[key]) for key in SS_GUESS_KEYS]
+        ),
+        "b_guess": np.asarray(ss_output["b_sp1"]),
+        "n_guess": np.asarray(ss_output["n"]),
+    }
+
+    return guess
+
+
+# OG-Core starts every SS solve from fixed initial guesses. To warm
+# start the solves and count the evaluations of the root finder, by
+# thread, ogcore.SS.SS_initial_guesses and ogcore.SS.SS_fsolve are
+# wrapped while _SS_hooks is entered. Solves may run in several threads
+# of a worker at once, so the originals are restored when the last of
+# them exits. The wrappers call the original functions, except for the
+# first initial guesses of a solve given a previous solution.
+_SS_INITIAL_GUESSES = SS.SS_initial_guesses
+_SS_FSOLVE = SS.SS_fsolve
+_ss_hooks_lock = threading.Lock()
+_ss_hooks_users = 0
+_ss_state = threading.local()
+
+
+def _warm_SS_initial_guesses(
+    p, b_val=0.0055, n_val=0.4, r_tr_scalars=[1.0, 1.0]
+):
+    guess = getattr(_ss_state, "guess", None)
+    # the other guess factors are only tried if the first guess fails,
+    # and start from the OG-Core guesses
+    if guess is None or list(r_tr_scalars) != list(SS.DEV_FACTOR_LIST[0]):
+        return _SS_INITIAL_GUESSES(p, b_val, n_val, r_tr_scalars)
+    guesses = list(guess["guesses"])
+    if not p.baseline:
+        # the factor is only solved for in the baseline
+        guesses = guesses[:-1]
+
+    return guesses, guess["b_guess"].copy(), guess["n_guess"].copy()
+
+
+def _counting_SS_fsolve(*args, **kwargs):
+    _ss_state.nfev = getattr(_ss_state, "nfev", 0) + 1
+    return _SS_FSOLVE(*args, **kwargs)
+
+
+@contextlib.contextmanager
+def _SS_hooks(guess=None):
+    global _ss_hooks_users
+    with _ss_hooks_lock:
+        if _ss_hooks_users == 0:
+            SS.SS_initial_guesses = _warm_SS_initial_guesses
+            SS.SS_fsolve = _counting_SS_fsolve
+        _ss_hooks_users += 1
+    _ss_state.nfev = 0
+    _ss_state.guess = guess
+    try:
+        yield _ss_state
+    finally:
+        _ss_state.guess = None
+        with _ss_hooks_lock:
+            _ss_hooks_users -= 1
+            if _ss_hooks_users == 0:
+                SS.SS_initial_guesses = _SS_INITIAL_GUESSES
+                SS.SS_fsolve = _SS_FSOLVE
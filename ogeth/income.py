@@ -1,15 +1,141 @@
 import numpy as np
-import scipy.optimize as opt
-import scipy.interpolate as si
+import functools
+from scipy import sparse, spatial
 from ogcore import parameter_plots as pp
-from ogcore import utils
 from ogcore.parameters import Specifications
 import os
+import glob
 import json
+import time
+import urllib.error
 import urllib.request
+from ogeth.utils import CACHE_DIR, hash_bytes, evict_cache
 
 CUR_PATH = os.path.abspath(os.path.dirname(__file__))
 OUTPUT_DIR = os.path.join(CUR_PATH, "OUTPUT", "ability")
+OGUSA_PARAMS_URL = (
+    "https://raw.githubusercontent.com/PSLmodels/OG-USA/master/ogusa/"
+    + "ogusa_default_parameters.json"
+)
+# Cached OG-USA baselines are re-validated against the source URL after
+# USA_CACHE_TTL seconds and the cache is kept under USA_CACHE_MAX_BYTES
+USA_CACHE_TTL = 30 * 24 * 60 * 60
+USA_CACHE_MAX_BYTES = 50 * 1024**2
+USA_BASELINE_KEYS = ["e", "omega_SS", "lambdas", "S", "J", "E"]
+# Note, USA gini in the World Bank data is 41.5
+# See https://data.worldbank.org/indicator/SI.POV.GINI
+GINI_USA_DATA = 41.5
+
+
+def get_usa_baseline(
+    url=OGUSA_PARAMS_URL,
+    cache_dir=None,
+    ttl=USA_CACHE_TTL,
+    max_bytes=USA_CACHE_MAX_BYTES,
+    refresh=False,
+):
+    """
+    Load the parts of the OG-USA default parameterization that are
+    needed to calibrate the ability matrix. Building an OG-Core
+    Specifications object from the OG-USA defaults requires a download
+    and a full validation of the parameter file, so the extracted arrays
+    are cached on disk as a .npz file named by the hash of the source
+    URL and the hash of the downloaded content.
+
+    A cached baseline is used without any network access until it is
+    older than ttl. After that the source is downloaded again and only
+    re-validated if its content changed. If the download fails, the
+    most recent cached baseline is used, so that calibrations can run
+    without internet access once the cache has been populated.
+
+    Args:
+        url (str): URL of the OG-USA default parameters JSON file
+        cache_dir (str): directory to store cached baselines in,
+            defaults to CACHE_DIR/ogusa_baseline
+        ttl (float): seconds after which a cached baseline is
+            re-validated against url
+        max_bytes (int): maximum total size of the cache directory
+        refresh (bool): if True, re-validate against url even if the
+            cached baseline is not expired
+
+    Returns:
+        usa_baseline (dict): OG-USA values of e (first period, SxJ),
+            omega_SS, lambdas, S, J, and E
+
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(CACHE_DIR, "ogusa_baseline")
+    url_hash = hash_bytes(url.encode("utf-8"))[:16]
+    # most recently validated baseline for this url first
+    cached = sorted(
+        glob.glob(os.path.join(cache_dir, url_hash + "-*.npz")),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    if cached and not refresh:
+        if time.time() - os.path.getmtime(cached[0]) <= ttl:
+            return _load_usa_baseline(cached[0])
+    try:
+        with urllib.request.urlopen(url, timeout=60) as response:
+            content = response.read()
+    except (urllib.error.URLError, OSError) as err:
+        if not cached:
+            raise
+        print(
+            "Failed to download OG-USA parameters from "
+            + url
+            + " ("
+            + str(err)
+            + "). Using cached baseline "
+            + cached[0]
+        )
+        return _load_usa_baseline(cached[0])
+    path = os.path.join(
+        cache_dir, url_hash + "-" + hash_bytes(content)[:16] + ".npz"
+    )
+    if os.path.exists(path):
+        # content unchanged, so skip the Specifications validation and
+        # mark the cached baseline as freshly validated
+        os.utime(path)
+    else:
+        usa_params = Specifications()
+        usa_params.update_specifications(json.loads(content))
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez_compressed(
+            path,
+            e=usa_params.e[0, :, :],
+            omega_SS=usa_params.omega_SS,
+            lambdas=usa_params.lambdas,
+            S=usa_params.S,
+            J=usa_params.J,
+            E=usa_params.E,
+        )
+    # expired baselines of other urls are kept for when their source
+    # can't be reached, and only removed to stay under max_bytes
+    evict_cache(cache_dir, ttl=ttl, keep=[path], pattern=url_hash + "-*.npz")
+    evict_cache(cache_dir, max_bytes=max_bytes, keep=[path])
+
+    return _load_usa_baseline(path)
+
+
+def _load_usa_baseline(path):
+    """
+    Read a cached OG-USA baseline written by get_usa_baseline.
+
+    Args:
+        path (str): path to .npz file
+
+    Returns:
+        usa_baseline (dict): OG-USA values of e, omega_SS, lambdas, S,
+            J, and E
+
+    """
+    with np.load(path) as data:
+        usa_baseline = {k: data[k] for k in USA_BASELINE_KEYS}
+    for k in ["S", "J", "E"]:
+        usa_baseline[k] = int(usa_baseline[k])
+
+    return usa_baseline
 
 
 def get_e_interp(
@@ -41,161 +167,437 @@ def get_e_interp(
         gini_to_match (float): Gini coefficient to match, default is
             31.1, the Gini coefficient for ETH in 2021
             https://data.worldbank.org/indicator/SI.POV.GINI?locations=ET
-        plot (bool): if True, creates plots of emat_orig and the new
-            interpolated emat_new
+        plot_path (str): if not None, path to save plots of the
+            interpolated emat_new to
 
     Returns:
         emat_new_scaled (Numpy array): interpolated ability matrix scaled
             so that population-weighted average is 1, size SxJ
 
+    """
+    emat_new_scaled = get_e_interp_batch(
+        E, S, J, lambdas, age_wgts, [gini_to_match]
+    )[0, :, :]
+
+    if plot_path is not None:
+        new_s_midp, abil_midp = get_midpoints(E, S, lambdas)
+        kwargs = {"path": plot_path, "filesuffix": "_intrp_scaled"}
+        pp.plot_income_data(
+            new_s_midp,
+            abil_midp,
+            lambdas,
+            emat_new_scaled.reshape(1, S, J),
+            **kwargs,
+        )
+
+    return emat_new_scaled
+
+
+def get_e_interp_batch(E, S, J, lambdas, age_wgts, gini_to_match):
+    """
+    Compute the ability matrices of get_e_interp for many Gini
+    coefficient targets at once. The scale parameters for all targets
+    are found simultaneously by get_gini_scale and the interpolation
+    to the S x J grid is done for all targets with one triangulation.
+
+    Args:
+        E (int): the age agents become economically active
+        S (int): number of ages to interpolate, >= 3
+        J (int): number of ability types to interpolate
+        lambdas (Numpy array): distribution of population in each
+            ability group, length J
+        age_wgts (Numpy array): distribution of population in each age
+            group, length S
+        gini_to_match (array_like): Gini coefficients to match, length K
+
+    Returns:
+        emat_new_scaled (Numpy array): interpolated ability matrices
+            scaled so that population-weighted average is 1, size KxSxJ
+
     """
     assert lambdas.shape[0] == J
     assert age_wgts.shape[0] == S
     # Load USA e matrix as a baseline
-    usa_params = Specifications()
-    usa_params.update_specifications(
-        json.load(
-            urllib.request.urlopen(
-                "https://raw.githubusercontent.com/PSLmodels/OG-USA/master/ogusa/ogusa_default_parameters.json"
-            )
-        )
-    )
+    usa = get_usa_baseline()
 
-    # Define a function that will find the "a" in the equation:
-    # e_Y = e_USA * exp(a * e_USA)
-    # such that the e_Y produces a gini coefficient in the model that
-    # gives the same ratio between the model implied Gini's in the USA
-    # and the target country and the empirical Gini's in the USA and given
-    # by gin_to_match for the target country
-    def f(
-        a,
-        emat_orig,
-        age_wgts,
-        abil_wgts,
-        gini_to_match,
-        gini_usa_data,
-        gini_usa_model,
-    ):
-        gini_target_model = utils.Inequality(
-            emat_orig * np.exp(a * emat_orig),
-            age_wgts,
-            abil_wgts,
-            len(age_wgts),
-            len(abil_wgts),
-        ).gini()
-        error = (gini_to_match / gini_usa_data) - (
-            gini_target_model / gini_usa_model
-        )
-        return error
-
-    # Note, USA gini in the World Bank data is 41.5
-    # See https://data.worldbank.org/indicator/SI.POV.GINI
-    gini_usa_data = 41.5
-    # Find the model implied Gini for the USA
-    gini_usa_model = utils.Inequality(
-        usa_params.e[0, :, :],
-        usa_params.omega_SS,
-        usa_params.lambdas,
-        usa_params.S,
-        usa_params.J,
-    ).gini()
-
-    x = opt.root_scalar(
-        f,
-        args=(
-            usa_params.e[0, :, :],
-            usa_params.omega_SS,
-            usa_params.lambdas,
-            gini_to_match,
-            gini_usa_data,
-            gini_usa_model,
-        ),
-        method="bisect",
-        bracket=[-1, 1],
-        xtol=1e-10,
+    a = get_gini_scale(gini_to_match, usa)
+    K = a.shape[0]
+    e_new = usa["e"][None, :, :] * np.exp(
+        a.reshape(K, 1, 1) * usa["e"][None, :, :]
     )
-    a = x.root
-    e_new = usa_params.e[0, :, :] * np.exp(a * usa_params.e[0, :, :])
-    emat_new_scaled = (
+    emat_new_scaled = e_new / (
         e_new
-        / (
-            e_new
-            * usa_params.omega_SS.reshape(usa_params.S, 1)
-            * usa_params.lambdas.reshape(1, usa_params.J)
-        ).sum()
-    )
+        * usa["omega_SS"].reshape(1, usa["S"], 1)
+        * usa["lambdas"].reshape(1, 1, usa["J"])
+    ).sum(axis=(1, 2), keepdims=True)
     # Now interpolate for the cases where S and/or J not the same in the
     # country parameterization as in the default USA parameterization
     if (
-        S == usa_params.S
+        S == usa["S"]
         and np.array_equal(
-            usa_params.lambdas,
+            usa["lambdas"],
             lambdas,
         )
         is True
     ):
         pass  # will return the e_new_scaled found above since dims the same
     else:
-        # generate vector of mid points for the Filipino ability groups
-        abil_midp = np.zeros(J)
-        pct_lb = 0.0
-        for j in range(J):
-            abil_midp[j] = pct_lb + 0.5 * lambdas[j]
-            pct_lb += lambdas[j]
+        # generate vector of mid points for the ability groups
+        _, abil_midp = get_midpoints(E, S, lambdas)
         # generate vector of mid points for the USA ability groups
-        M = usa_params.lambdas.shape[0]
-        emat_j_midp = np.zeros(M)
-        pct_lb = 0.0
-        for m in range(M):
-            emat_j_midp[m] = pct_lb + 0.5 * usa_params.lambdas[m]
-            pct_lb += usa_params.lambdas[m]
+        _, emat_j_midp = get_midpoints(usa["E"], usa["S"], usa["lambdas"])
 
         # Make sure that values in abil_midp are within interpolating
         # bounds
         if abil_midp.min() < emat_j_midp.min() or abil_midp.max() > (
-            1 - usa_params.lambdas[-1]
+            1 - usa["lambdas"][-1]
         ):
             err = (
                 "One or more entries in abilities vector (lambdas) is outside the "
                 + "allowable bounds for interpolation."
             )
             raise RuntimeError(err)
-        usa_step = 80 / usa_params.S
-        emat_s_midp = np.linspace(
-            usa_params.E + 0.5 * usa_step,
-            usa_params.E + usa_params.S - 0.5 * usa_step,
-            usa_params.S,
-        )
-        emat_j_mesh, emat_s_mesh = np.meshgrid(emat_j_midp, emat_s_midp)
-        newstep = 80 / S
-        new_s_midp = np.linspace(E + 0.5 * newstep, E + S - 0.5 * newstep, S)
-        new_j_mesh, new_s_mesh = np.meshgrid(abil_midp, new_s_midp)
-        newcoords = np.hstack(
-            (
-                emat_s_mesh.reshape((usa_params.S * usa_params.J, 1)),
-                emat_j_mesh.reshape((usa_params.S * usa_params.J, 1)),
+        # interpolate all K matrices with one sparse matrix product
+        interp_mat = get_interp_matrix(E, S, lambdas, usa)
+        emat_new = (
+            interp_mat @ emat_new_scaled.reshape(K, usa["S"] * usa["J"]).T
+        ).T.reshape(K, S, J)
+        emat_new_scaled = emat_new / (
+            emat_new * age_wgts.reshape(1, S, 1) * lambdas.reshape(1, 1, J)
+        ).sum(axis=(1, 2), keepdims=True)
+
+    return emat_new_scaled
+
+
+def get_interp_matrix(E, S, lambdas, usa):
+    """
+    Get the matrix that linearly interpolates an OG-USA sized ability
+    matrix to an S x J grid. Flattened ability matrices are mapped with
+    emat_new.flatten() = interp_mat @ emat_usa.flatten(), which gives the
+    same result as scipy.interpolate.griddata with method="linear", but
+    the Delaunay triangulation of the OG-USA grid and the barycentric
+    weights of the new grid are computed once and memoized.
+
+    Args:
+        E (int): the age agents become economically active
+        S (int): number of ages to interpolate to
+        lambdas (Numpy array): distribution of population in each
+            ability group, length J
+        usa (dict): OG-USA baseline from get_usa_baseline
+
+    Returns:
+        interp_mat (scipy.sparse.csr_array): interpolation matrix, size
+            SJ x (S_usa J_usa), with NaN rows for points outside of the
+            OG-USA grid
+
+    """
+    return _get_interp_matrix(
+        int(E),
+        int(S),
+        tuple(np.asarray(lambdas, dtype=float).flatten()),
+        usa["E"],
+        usa["S"],
+        tuple(np.asarray(usa["lambdas"], dtype=float).flatten()),
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _get_interp_matrix(E, S, lambdas, usa_E, usa_S, usa_lambdas):
+    """
+    Memoized implementation of get_interp_matrix, with lambdas passed as
+    tuples.
+    """
+    tri = _get_triangulation(usa_E, usa_S, usa_lambdas)
+    new_s_midp, abil_midp = get_midpoints(E, S, np.array(lambdas))
+    new_j_mesh, new_s_mesh = np.meshgrid(abil_midp, new_s_midp)
+    xi = np.hstack((new_s_mesh.reshape(-1, 1), new_j_mesh.reshape(-1, 1)))
+    # barycentric coordinates of each new point in its simplex
+    simplex = tri.find_simplex(xi)
+    transform = tri.transform[simplex]
+    bary = np.einsum(
+        "ijk,ik->ij", transform[:, :2, :], xi - transform[:, 2, :]
+    )
+    bary = np.hstack((bary, 1 - bary.sum(axis=1, keepdims=True)))
+    cols = tri.simplices[simplex]
+    # points outside of the triangulation get a NaN, as in griddata
+    outside = simplex == -1
+    bary[outside] = np.array([np.nan, 0.0, 0.0])
+    cols[outside] = 0
+    rows = np.repeat(np.arange(xi.shape[0]), 3)
+    interp_mat = sparse.csr_array(
+        (bary.flatten(), (rows, cols.flatten())),
+        shape=(xi.shape[0], tri.npoints),
+    )
+
+    return interp_mat
+
+
+@functools.lru_cache(maxsize=4)
+def _get_triangulation(usa_E, usa_S, usa_lambdas):
+    """
+    Delaunay triangulation of the (age, ability percentile) midpoints of
+    the OG-USA ability matrix, with points in the order of the flattened
+    matrix.
+    """
+    emat_s_midp, emat_j_midp = get_midpoints(
+        usa_E, usa_S, np.array(usa_lambdas)
+    )
+    emat_j_mesh, emat_s_mesh = np.meshgrid(emat_j_midp, emat_s_midp)
+    points = np.hstack(
+        (emat_s_mesh.reshape(-1, 1), emat_j_mesh.reshape(-1, 1))
+    )
+
+    return spatial.Delaunay(points)
+
+
+def get_midpoints(E, S, lambdas):
+    """
+    Compute the midpoints of the age and ability groups used to
+    interpolate ability matrices. Ages are assumed to be evenly spaced
+    between E and E+80 and ability midpoints are in percentiles.
+
+    Args:
+        E (int): the age agents become economically active
+        S (int): number of ages
+        lambdas (Numpy array): distribution of population in each
+            ability group, length J
+
+    Returns:
+        s_midp (Numpy array): midpoints of age groups, length S
+        j_midp (Numpy array): midpoints of ability groups, length J
+
+    """
+    step = 80 / S
+    s_midp = np.linspace(E + 0.5 * step, E + S - 0.5 * step, S)
+    lambdas = lambdas.reshape(-1)
+    J = lambdas.shape[0]
+    j_midp = np.zeros(J)
+    pct_lb = 0.0
+    for j in range(J):
+        j_midp[j] = pct_lb + 0.5 * lambdas[j]
+        pct_lb += lambdas[j]
+
+    return s_midp, j_midp
+
+
+def weighted_gini(emat, age_wgts, abil_wgts):
+    """
+    Compute the population-weighted Gini coefficient of one or more
+    ability matrices. Gives the same result as
+    ogcore.utils.Inequality(emat, age_wgts, abil_wgts, S, J).gini(), but
+    is vectorized over any leading dimensions of emat.
+
+    Args:
+        emat (Numpy array): ability matrices, size (..., S, J)
+        age_wgts (Numpy array): distribution of population in each age
+            group, length S
+        abil_wgts (Numpy array): distribution of population in each
+            ability group, length J
+
+    Returns:
+        gini (Numpy array): Gini coefficients, size emat.shape[:-2]
+
+    """
+    S, J = emat.shape[-2:]
+    weights = (age_wgts.reshape(S, 1) * abil_wgts.reshape(1, J)).flatten()
+    dist = emat.reshape(emat.shape[:-2] + (S * J,))
+    idx = np.argsort(dist, axis=-1)
+    sort_dist = np.take_along_axis(dist, idx, axis=-1)
+    sort_weights = weights[idx]
+    p = np.cumsum(sort_weights, axis=-1)
+    nu = np.cumsum(sort_dist * sort_weights, axis=-1)
+    nu = nu / nu[..., -1:]
+    gini = (nu[..., 1:] * p[..., :-1]).sum(axis=-1) - (
+        nu[..., :-1] * p[..., 1:]
+    ).sum(axis=-1)
+
+    return gini
+
+
+class GiniScaleKernel:
+    """
+    Evaluates the Gini coefficient of emat * exp(a * emat), and its
+    derivative with respect to a, for many values of a. For a > -1 /
+    max(emat), x * exp(a * x) is increasing in x >= 0, so the sort
+    order of the scaled matrix is the sort order of emat. That order and
+    the cumulative population weights are computed once, which makes
+    each evaluation O(SJ). Values of a outside that range are sorted
+    individually.
+    """
+
+    def __init__(self, emat, age_wgts, abil_wgts):
+        """
+        Args:
+            emat (Numpy array): non-negative ability matrix, size SxJ
+            age_wgts (Numpy array): distribution of population in each
+                age group, length S
+            abil_wgts (Numpy array): distribution of population in each
+                ability group, length J
+
+        Returns:
+            None
+
+        """
+        S, J = emat.shape
+        weights = (age_wgts.reshape(S, 1) * abil_wgts.reshape(1, J)).flatten()
+        dist = emat.flatten()
+        idx = np.argsort(dist)
+        self.dist = dist
+        self.weights = weights
+        self.sort_dist = dist[idx]
+        self.sort_weights = weights[idx]
+        self.cum_weights = np.cumsum(self.sort_weights)
+        # smallest a for which the sort order of emat is preserved
+        self.a_min = -1 / self.sort_dist[-1]
+
+    def __call__(self, a):
+        """
+        Args:
+            a (array_like): scale parameters, length K
+
+        Returns:
+            gini (Numpy array): Gini coefficients, length K
+            gini_prime (Numpy array): derivatives of the Gini
+                coefficients with respect to a, length K
+
+        """
+        a = np.asarray(a, dtype=float).reshape(-1, 1)
+        sorted_ok = a[:, 0] > self.a_min
+        if sorted_ok.all():
+            return self._evaluate(
+                a, self.sort_dist, self.sort_weights, self.cum_weights
+            )
+        gini = np.zeros(a.shape[0])
+        gini_prime = np.zeros(a.shape[0])
+        if sorted_ok.any():
+            gini[sorted_ok], gini_prime[sorted_ok] = self._evaluate(
+                a[sorted_ok],
+                self.sort_dist,
+                self.sort_weights,
+                self.cum_weights,
             )
+        resort = ~sorted_ok
+        x = self.dist[None, :] * np.exp(a[resort] * self.dist[None, :])
+        idx = np.argsort(x, axis=-1)
+        sort_weights = self.weights[idx]
+        gini[resort], gini_prime[resort] = self._evaluate(
+            a[resort],
+            self.dist[idx],
+            sort_weights,
+            np.cumsum(sort_weights, axis=-1),
         )
-        emat_new = si.griddata(
-            newcoords,
-            emat_new_scaled.flatten(),
-            (new_s_mesh, new_j_mesh),
-            method="linear",
+
+        return gini, gini_prime
+
+    @staticmethod
+    def _evaluate(a, sort_dist, sort_weights, cum_weights):
+        """
+        Gini coefficient and its derivative given the sort order.
+
+        Args:
+            a (Numpy array): scale parameters, size Kx1
+            sort_dist (Numpy array): sorted emat, length SJ or size KxSJ
+            sort_weights (Numpy array): population weights in the order
+                of sort_dist
+            cum_weights (Numpy array): cumulative sum of sort_weights
+
+        Returns:
+            gini (Numpy array): Gini coefficients, length K
+            gini_prime (Numpy array): derivatives of the Gini
+                coefficients with respect to a, length K
+
+        """
+        x_wgt = sort_dist * np.exp(a * sort_dist) * sort_weights
+        nu = np.cumsum(x_wgt, axis=-1)
+        # d(x)/da = emat * x
+        dnu = np.cumsum(sort_dist * x_wgt, axis=-1)
+        total = nu[:, -1:]
+        dnu = (dnu - nu * (dnu[:, -1:] / total)) / total
+        nu = nu / total
+        # the Gini coefficient is linear in the normalized nu
+        p_lo = cum_weights[..., :-1]
+        p_hi = cum_weights[..., 1:]
+        gini = (nu[:, 1:] * p_lo).sum(axis=-1) - (nu[:, :-1] * p_hi).sum(
+            axis=-1
         )
-        emat_new_scaled = (
-            emat_new
-            / (emat_new * age_wgts.reshape(S, 1) * lambdas.reshape(1, J)).sum()
+        gini_prime = (dnu[:, 1:] * p_lo).sum(axis=-1) - (
+            dnu[:, :-1] * p_hi
+        ).sum(axis=-1)
+
+        return gini, gini_prime
+
+
+def get_gini_scale(
+    gini_to_match, usa, bracket=(-1, 1), xtol=1e-10, maxiter=100
+):
+    """
+    Find the "a" in the equation:
+    e_Y = e_USA * exp(a * e_USA)
+    such that the e_Y produces a gini coefficient in the model that
+    gives the same ratio between the model implied Gini's in the USA
+    and the target country and the empirical Gini's in the USA and given
+    by gini_to_match for the target country. All targets are solved
+    simultaneously by Newton's method with the analytic derivative from
+    GiniScaleKernel, safeguarded by bisection so that iterates stay in
+    the bracket.
+
+    Args:
+        gini_to_match (array_like): Gini coefficients to match, length K
+        usa (dict): OG-USA baseline from get_usa_baseline
+        bracket (tuple): interval that contains the roots
+        xtol (float): absolute tolerance of the roots
+        maxiter (int): maximum number of iterations
+
+    Returns:
+        a (Numpy array): scale parameters, length K
+
+    """
+    targets = np.atleast_1d(np.asarray(gini_to_match, dtype=float))
+    kernel = GiniScaleKernel(usa["e"], usa["omega_SS"], usa["lambdas"])
+    # Find the model implied Gini for the USA
+    gini_usa_model = kernel(0.0)[0][0]
+
+    def f(a, targets):
+        gini_target_model, gini_prime = kernel(a)
+        error = (targets / GINI_USA_DATA) - (
+            gini_target_model / gini_usa_model
         )
+        return error, -gini_prime / gini_usa_model
 
-        if plot_path is not None:
-            kwargs = {"path": plot_path, "filesuffix": "_intrp_scaled"}
-            pp.plot_income_data(
-                new_s_midp,
-                abil_midp,
-                abil_wgts,
-                emat_new_scaled,
-                plot_path,
-                **kwargs,
-            )
+    K = targets.shape[0]
+    lo = np.full(K, float(bracket[0]))
+    hi = np.full(K, float(bracket[1]))
+    f_ends = f(np.concatenate((lo, hi)), np.tile(targets, 2))[0]
+    f_lo, f_hi = f_ends[:K], f_ends[K:]
+    if np.any(f_lo * f_hi > 0):
+        raise ValueError("f(a) and f(b) must have different signs")
+    # start from the OG-USA shape, a = 0
+    a = np.clip(np.zeros(K), lo, hi)
+    active = np.ones(K, dtype=bool)
+    for i in range(maxiter):
+        fa, fprime = f(a[active], targets[active])
+        # shrink the bracket around the root
+        below = fa * f_lo[active] > 0
+        lo[active] = np.where(below, a[active], lo[active])
+        f_lo[active] = np.where(below, fa, f_lo[active])
+        hi[active] = np.where(below, hi[active], a[active])
+        # Newton step, or bisection if the step leaves the bracket
+        with np.errstate(divide="ignore", invalid="ignore"):
+            a_new = a[active] - fa / fprime
+        outside = ~(
+            (a_new > lo[active]) & (a_new < hi[active])
+        ) | ~np.isfinite(a_new)
+        a_new = np.where(outside, 0.5 * (lo[active] + hi[active]), a_new)
+        done = (fa == 0) | (np.abs(a_new - a[active]) < xtol)
+        a_new = np.where(fa == 0, a[active], a_new)
+        idx = np.flatnonzero(active)
+        a[idx] = a_new
+        active[idx[done]] = False
+        if not active.any():
+            break
+    if active.any():
+        raise RuntimeError(
+            "Failed to converge after " + str(maxiter) + " iterations"
+        )
 
-    return emat_new_scaled
+    return a
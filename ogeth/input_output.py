@@ -1,90 +1,432 @@
 import pandas as pd
 import numpy as np
 import os
+import json
+import functools
+from scipy import sparse
 from ogeth.constants import CONS_DICT, PROD_DICT
-
+from ogeth.utils import CACHE_DIR, hash_bytes
 
 CUR_DIR = os.path.dirname(os.path.realpath(__file__))
 """
-Read in Social Accounting Matrix (SAM) file
+Social Accounting Matrix (SAM) file, read on first use with get_sam()
 """
-# Read in SAM file
 # SAM file:
 sam_path = os.path.join(CUR_DIR, "data", "IFPRI_SAM_ETH_2022_SAM.csv")
-SAM = pd.read_csv(sam_path, index_col=1, thousands=",")
-# replace NaN with 0
-SAM.fillna(0, inplace=True)
+# household accounts in the SAM
+HH_COLS = [
+    "hhd-r1",
+    "hhd-r2",
+    "hhd-r3",
+    "hhd-r4",
+    "hhd-r5",
+    "hhd-u1",
+    "hhd-u2",
+    "hhd-u3",
+    "hhd-u4",
+    "hhd-u5",
+]
+
+
+@functools.lru_cache(maxsize=4)
+def get_sam(path=sam_path):
+    """
+    Read in the Social Accounting Matrix (SAM) file. The SAM is only
+    parsed on the first call for each path and cached after that.
+
+    Args:
+        path (str): path to the SAM csv file
+
+    Returns:
+        sam (pd.DataFrame): SAM, with NaN replaced by 0
+    """
+    sam = pd.read_csv(path, index_col=1, thousands=",")
+    # replace NaN with 0
+    sam.fillna(0, inplace=True)
+
+    return sam
+
+
+def __getattr__(name):
+    # the SAM module attribute is kept for backwards compatibility
+    if name == "SAM":
+        return get_sam()
+    raise AttributeError(
+        "module " + repr(__name__) + " has no attribute " + repr(name)
+    )
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + ["SAM"])
+
+
+def get_sam_matrix(path=sam_path):
+    """
+    Get the SAM as a dense float64 matrix with integer indices of the
+    row and column accounts. The matrix is saved once to a .npy file
+    next to the SAM csv file (or in CACHE_DIR/sam if that directory is
+    not writable), together with a .json file holding the account codes
+    and the SHA-256 hash of the csv file. The cache is rebuilt when the
+    csv file changes. Later calls, in this or any other process, read a
+    read-only memory-mapped view of the .npy file.
+
+    Args:
+        path (str): path to the SAM csv file
+
+    Returns:
+        matrix (np.ndarray): SAM values, rows are accounts receiving
+            payments and columns are accounts making payments
+        row_index (dict): maps row account codes to row positions
+        col_index (dict): maps column account codes to column positions
+    """
+    return _load_sam_matrix(path, get_sam_hash(path))
+
+
+def get_sam_hash(path=sam_path):
+    """
+    Get the SHA-256 hash of the SAM csv file. The file is only read
+    again when its modification time or size changes.
+
+    Args:
+        path (str): path to the SAM csv file
+
+    Returns:
+        csv_hash (str): hex digest of the csv file
+    """
+    stat = os.stat(path)
+    return _hash_sam(path, stat.st_mtime_ns, stat.st_size)
+
+
+@functools.lru_cache(maxsize=4)
+def _hash_sam(path, mtime_ns, size):
+    """
+    Cached implementation of get_sam_hash.
+    """
+    with open(path, "rb") as file:
+        return hash_bytes(file.read())
+
+
+@functools.lru_cache(maxsize=4)
+def _load_sam_matrix(path, csv_hash):
+    """
+    Cached implementation of get_sam_matrix.
+    """
+    base = os.path.splitext(os.path.basename(path))[0]
+    cache_dirs = [
+        os.path.dirname(os.path.abspath(path)),
+        os.path.join(CACHE_DIR, "sam"),
+    ]
+    for cache_dir in cache_dirs:
+        npy_path = os.path.join(cache_dir, base + ".npy")
+        json_path = os.path.join(cache_dir, base + ".json")
+        try:
+            with open(json_path, "r") as file:
+                meta = json.load(file)
+            if meta["csv_hash"] == csv_hash:
+                matrix = np.load(npy_path, mmap_mode="r")
+                return (
+                    matrix,
+                    {code: i for i, code in enumerate(meta["rows"])},
+                    {code: i for i, code in enumerate(meta["cols"])},
+                )
+        except (OSError, ValueError, KeyError):
+            pass
+    # build the cache from the csv file
+    matrix, row_index, col_index = sam_to_matrix(get_sam(path))
+    meta = {
+        "csv_hash": csv_hash,
+        "rows": list(row_index.keys()),
+        "cols": list(col_index.keys()),
+    }
+    for cache_dir in cache_dirs:
+        npy_path = os.path.join(cache_dir, base + ".npy")
+        json_path = os.path.join(cache_dir, base + ".json")
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # write to temporary files so that other processes never
+            # read a partially written cache
+            np.save(npy_path + ".tmp.npy", matrix)
+            os.replace(npy_path + ".tmp.npy", npy_path)
+            with open(json_path + ".tmp", "w") as file:
+                json.dump(meta, file)
+            os.replace(json_path + ".tmp", json_path)
+            return np.load(npy_path, mmap_mode="r"), row_index, col_index
+        except OSError:
+            continue
+    print("Could not save the SAM cache, using the matrix in memory")
+
+    return matrix, row_index, col_index
+
+
+def sam_to_matrix(sam):
+    """
+    Convert a SAM DataFrame, as returned by get_sam(), to a dense
+    float64 matrix and integer indices of the account codes. Rows
+    without an account code (blank rows in the csv file) are dropped.
+
+    Args:
+        sam (pd.DataFrame): SAM file
+
+    Returns:
+        matrix (np.ndarray): SAM values
+        row_index (dict): maps row account codes to row positions
+        col_index (dict): maps column account codes to column positions
+    """
+    sam = sam.loc[sam.index.notna(), sam.dtypes != object]
+    matrix = np.ascontiguousarray(sam.values, dtype=np.float64)
+    row_index = {code: i for i, code in enumerate(sam.index)}
+    col_index = {code: i for i, code in enumerate(sam.columns)}
+
+    return matrix, row_index, col_index
+
+
+def _sam_arrays(sam):
+    """
+    Return the SAM matrix and account indices for sam, which is either
+    None (use the default SAM) or a SAM DataFrame.
+    """
+    if sam is None:
+        return get_sam_matrix()
+    return sam_to_matrix(sam)
 
 
-def get_alpha_c(sam=SAM, cons_dict=CONS_DICT):
+def get_aggregation_matrix(index, groups, strict=False):
+    """
+    Build a sparse 0/1 matrix that aggregates SAM accounts into groups,
+    with a row for each group and a column for each account in index.
+    Multiplying the SAM by this matrix sums the accounts in each group.
+
+    Args:
+        index (dict): maps account codes to positions, as returned by
+            get_sam_matrix
+        groups (dict): maps group names to lists of account codes
+        strict (bool): if True, raise a KeyError for codes that are not
+            in index (as with sam.loc[:, codes]), otherwise ignore them
+            (as with sam.index.isin(codes))
+
+    Returns:
+        agg_matrix (scipy.sparse.csr_array): len(groups) x len(index)
+            aggregation matrix
+    """
+    return _aggregation_matrix(
+        tuple(index.keys()),
+        tuple((key, tuple(value)) for key, value in groups.items()),
+        strict,
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _aggregation_matrix(codes, groups, strict):
+    """
+    Cached implementation of get_aggregation_matrix.
+    """
+    index = {code: i for i, code in enumerate(codes)}
+    rows = []
+    cols = []
+    for i, (key, value) in enumerate(groups):
+        if strict:
+            pos = [index[code] for code in value]
+        else:
+            pos = _positions(index, value)
+        rows += [i] * len(pos)
+        cols += pos
+    # duplicate entries are summed, so that an account listed twice in
+    # a strict group is counted twice, as with sam.loc[:, codes]
+    agg_matrix = sparse.csr_array(
+        (np.ones(len(rows)), (rows, cols)), shape=(len(groups), len(codes))
+    )
+
+    return agg_matrix
+
+
+def _positions(index, codes):
+    """
+    Positions of the account codes that are in index, ignoring codes
+    that are not in the SAM (as with sam.index.isin(codes)).
+    """
+    return sorted({index[code] for code in codes if code in index})
+
+
+def get_alpha_c(sam=None, cons_dict=CONS_DICT):
     """
     Calibrate the alpha_c vector, showing the shares of household
     expenditures for each consumption category
 
     Args:
-        sam (pd.DataFrame): SAM file
+        sam (pd.DataFrame): SAM file, defaults to get_sam()
         cons_dict (dict): Dictionary of consumption categories
 
     Returns:
         alpha_c (dict): Dictionary of shares of household expenditures
     """
-    hh_cols = [
-        "hhd-r1",
-        "hhd-r2",
-        "hhd-r3",
-        "hhd-r4",
-        "hhd-r5",
-        "hhd-u1",
-        "hhd-u2",
-        "hhd-u3",
-        "hhd-u4",
-        "hhd-u5",
-    ]
-    alpha_c = {}
-    overall_sum = 0
-    for key, value in cons_dict.items():
-        # note the subtraction of the row to focus on domestic consumption
-        category_total = (
-            sam.loc[sam.index.isin(value), hh_cols].values.astype(float).sum()
-        )
-        alpha_c[key] = category_total
-        overall_sum += category_total
-    for key, value in cons_dict.items():
-        alpha_c[key] = alpha_c[key] / overall_sum
+    matrix, row_index, col_index = _sam_arrays(sam)
+    # note the subtraction of the row to focus on domestic consumption
+    C = get_aggregation_matrix(row_index, cons_dict)
+    hh_total = np.asarray(matrix)[:, [col_index[col] for col in HH_COLS]]
+    category_total = C @ hh_total.sum(axis=1)
+    alpha_c = dict(
+        zip(cons_dict.keys(), category_total / category_total.sum())
+    )
 
     return alpha_c
 
 
-def get_io_matrix(sam=SAM, cons_dict=CONS_DICT, prod_dict=PROD_DICT):
+def get_io_matrix(sam=None, cons_dict=CONS_DICT, prod_dict=PROD_DICT):
     """
     Calibrate the io_matrix array.  This array relates the share of each
     production category in each consumption category
 
     Args:
-        sam (pd.DataFrame): SAM file
+        sam (pd.DataFrame): SAM file, defaults to get_sam()
         cons_dict (dict): Dictionary of consumption categories
         prod_dict (dict): Dictionary of production categories
 
     Returns:
         io_df (pd.DataFrame): Dataframe of io_matrix
     """
-    # Create initial matrix as dataframe of 0's to fill in
-    io_dict = {}
-    for key in prod_dict.keys():
-        io_dict[key] = np.zeros(len(cons_dict.keys()))
-    io_df = pd.DataFrame(io_dict, index=cons_dict.keys())
-    # Fill in the matrix
+    matrix, row_index, col_index = _sam_arrays(sam)
     # Note, each cell in the SAM represents a payment from the columns
     # account to the row account
     # (see https://www.un.org/en/development/desa/policy/capacity/presentations/manila/6_sam_mams_philippines.pdf)
     # We are thus going to take the consumption categories from rows and
     # the production categories from columns
-    for ck, cv in cons_dict.items():
-        for pk, pv in prod_dict.items():
-            io_df.loc[io_df.index == ck, pk] = (
-                sam.loc[sam.index.isin(cv), pv].values.astype(float).sum()
-            )
-    # change from levels to share (where each row sums to one)
-    io_df = io_df.div(io_df.sum(axis=1), axis=0)
+    C = get_aggregation_matrix(row_index, cons_dict)
+    P = get_aggregation_matrix(col_index, prod_dict, strict=True)
+    io_levels = C @ (np.asarray(matrix) @ P.T)
+    # change from levels to share (where each row sums to one), rows
+    # without any production are NaN
+    with np.errstate(invalid="ignore", divide="ignore"):
+        io_shares = io_levels / io_levels.sum(axis=1, keepdims=True)
+    io_df = pd.DataFrame(
+        io_shares, index=cons_dict.keys(), columns=prod_dict.keys()
+    )
 
     return io_df
+
+
+def get_sam_accounts(account_type, sam=None):
+    """
+    Get the codes of the SAM accounts of a given type, using the account
+    descriptions in the first column of the SAM file (e.g.,
+    "Commodities - Maize").
+
+    Args:
+        account_type (str): type of account, e.g., "Commodities" or
+            "Activities"
+        sam (pd.DataFrame): SAM file, defaults to get_sam()
+
+    Returns:
+        accounts (list): codes of the accounts of that type
+    """
+    if sam is None:
+        sam = get_sam()
+    labels = sam.iloc[:, 0]
+    labels = labels[labels.index.notna()]
+    accounts = list(
+        labels.index[labels.str.split(" - ").str[0] == account_type]
+    )
+
+    return accounts
+
+
+def validate_scheme(cons_dict, prod_dict, sam=None):
+    """
+    Check that an aggregation scheme assigns every commodity account of
+    the SAM to exactly one consumption category and every activity
+    account to exactly one production category.
+
+    Args:
+        cons_dict (dict): Dictionary of consumption categories
+        prod_dict (dict): Dictionary of production categories
+        sam (pd.DataFrame): SAM file, defaults to get_sam()
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: if an account is missing, repeated, or not a
+            commodity (activity) account of the SAM
+    """
+    for name, groups, account_type in [
+        ("cons_dict", cons_dict, "Commodities"),
+        ("prod_dict", prod_dict, "Activities"),
+    ]:
+        accounts = get_sam_accounts(account_type, sam)
+        codes = [code for value in groups.values() for code in value]
+        errors = []
+        missing = [code for code in accounts if code not in codes]
+        if missing:
+            errors.append("missing " + ", ".join(missing))
+        repeated = sorted({code for code in codes if codes.count(code) > 1})
+        if repeated:
+            errors.append("repeated " + ", ".join(repeated))
+        unknown = sorted(set(codes) - set(accounts))
+        if unknown:
+            errors.append(
+                "not " + account_type.lower() + " " + ", ".join(unknown)
+            )
+        if errors:
+            raise ValueError(
+                name
+                + " does not cover the "
+                + account_type.lower()
+                + " in the SAM: "
+                + "; ".join(errors)
+            )
+
+
+def get_io_batch(schemes, sam=None, validate=True):
+    """
+    Calibrate alpha_c and the io_matrix for several aggregation schemes
+    at once. The aggregation matrices of all schemes are stacked, so the
+    SAM is only multiplied once.
+
+    Args:
+        schemes (list): list of (cons_dict, prod_dict) tuples
+        sam (pd.DataFrame): SAM file, defaults to get_sam()
+        validate (bool): if True, check each scheme with validate_scheme
+
+    Returns:
+        results (list): (alpha_c, io_df) tuple for each scheme, as
+            returned by get_alpha_c and get_io_matrix
+    """
+    if validate:
+        for cons_dict, prod_dict in schemes:
+            validate_scheme(cons_dict, prod_dict, sam)
+    matrix, row_index, col_index = _sam_arrays(sam)
+    matrix = np.asarray(matrix)
+    C = sparse.vstack(
+        [get_aggregation_matrix(row_index, c) for c, _ in schemes],
+        format="csr",
+    )
+    P = sparse.vstack(
+        [
+            get_aggregation_matrix(col_index, p, strict=True)
+            for _, p in schemes
+        ],
+        format="csr",
+    )
+    # one pass over the SAM for the production categories of all schemes
+    # and for the household expenditures
+    sam_P = matrix @ P.T
+    hh_total = matrix[:, [col_index[col] for col in HH_COLS]].sum(axis=1)
+    category_total = C @ hh_total
+    results = []
+    c_start = 0
+    p_start = 0
+    for cons_dict, prod_dict in schemes:
+        c_end = c_start + len(cons_dict)
+        p_end = p_start + len(prod_dict)
+        alpha_total = category_total[c_start:c_end]
+        alpha_c = dict(zip(cons_dict.keys(), alpha_total / alpha_total.sum()))
+        io_levels = C[c_start:c_end] @ sam_P[:, p_start:p_end]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            io_shares = io_levels / io_levels.sum(axis=1, keepdims=True)
+        io_df = pd.DataFrame(
+            io_shares, index=cons_dict.keys(), columns=prod_dict.keys()
+        )
+        results.append((alpha_c, io_df))
+        c_start = c_end
+        p_start = p_end
+
+    return results
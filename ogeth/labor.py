@@ -5,10 +5,12 @@ Computes the average labor participation rate for each age cohort.
 """
 
 import os
+import functools
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 import scipy.ndimage.filters as filter
-from scipy import interpolate
+from scipy import interpolate, sparse
 import matplotlib
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
@@ -16,49 +18,316 @@ from mpl_toolkits.mplot3d import Axes3D
 CUR_DIR = os.path.abspath(os.path.dirname(__file__))
 
 
+# QLFS variables used to compute the labor moments, their new names, and
+# the types they are read in with
+QLFS_COLUMNS = {
+    "Q418HRSWRK": "hours",
+    "age_grp1": "age_group",
+    "Weight": "weight",
+}
+QLFS_DTYPES = {
+    "Q418HRSWRK": str,
+    "age_grp1": "category",
+    "Weight": np.float32,
+}
+CHUNKSIZE = 100_000
+# QLFS age groups, in order. Some of the survey files have labels that
+# were mangled by Excel, which are mapped back to the age groups when
+# the data are read in.
+AGE_GROUPS = (
+    ["00-04", "05-09", "10-14"]
+    + [f"{a}-{a + 4}" for a in range(15, 75, 5)]
+    + ["75+"]
+)
+AGE_GROUP_FIXES = {"9-May": "05-09", "14-Oct": "10-14"}
+AGE_GROUP_DTYPE = pd.CategoricalDtype(AGE_GROUPS, ordered=True)
+# age groups used for the model (from age 15) and their midpoints, with
+# 75+ taken as 75-85
+MODEL_AGE_GROUPS = AGE_GROUPS[3:]
+AGE_MIDPOINTS = np.array([17.0 + 5 * i for i in range(12)] + [80.0])
+# maximum number of resampling weights drawn at a time in the bootstrap
+MAX_BLOCK_ELEMENTS = 2**22
+
+
+def read_labor_chunks(
+    year=2023,
+    data_dir=os.path.join(CUR_DIR, "..", "ogeth", "data", "qlfs"),
+    chunksize=CHUNKSIZE,
+    quarters=range(1, 5),
+):
+    """
+    Read the Quarterly Labour Force Survey data in chunks, keeping only
+    the variables needed to compute the labor moments.
+
+    Args:
+        year (int): year of data to read in
+        data_dir (str): path to directory with QLFS data
+        chunksize (int): number of rows in each chunk
+        quarters (list): quarters of data to read in
+
+    Returns:
+        chunks (generator): DataFrames with hours, age_group, and weight
+            columns, with at most chunksize rows each
+
+    """
+    for q in quarters:
+        file = os.path.join(data_dir, f"qlfs-{year}-q{q}-worker-v1.csv")
+        reader = pd.read_csv(
+            file,
+            encoding="latin-1",
+            usecols=list(QLFS_COLUMNS.keys()),
+            dtype=QLFS_DTYPES,
+            chunksize=chunksize,
+        )
+        with reader:
+            for chunk in reader:
+                chunk = chunk.rename(columns=QLFS_COLUMNS)
+                chunk["age_group"] = clean_age_groups(chunk["age_group"])
+                # if hours is a string, take only part after space, and
+                # replace missing hours with zero
+                chunk["hours"] = pd.to_numeric(
+                    chunk["hours"].str.extract(r"(\S+)\s*$", expand=False),
+                    errors="coerce",
+                ).fillna(0)
+                yield chunk
+
+
+def clean_age_groups(age_group):
+    """
+    Map QLFS age group labels to AGE_GROUPS, fixing labels mangled by
+    Excel. Labels that are not age groups become missing.
+
+    Args:
+        age_group (Pandas Series): age group labels
+
+    Returns:
+        age_group (Pandas Series): categorical age groups with the
+            categories AGE_GROUPS
+    """
+    if age_group.dtype == AGE_GROUP_DTYPE:
+        return age_group
+    if isinstance(age_group.dtype, pd.CategoricalDtype):
+        fixes = {
+            k: v
+            for k, v in AGE_GROUP_FIXES.items()
+            if k in age_group.cat.categories
+        }
+        age_group = age_group.astype(object)
+    else:
+        fixes = AGE_GROUP_FIXES
+    age_group = age_group.replace(fixes).astype(AGE_GROUP_DTYPE)
+
+    return age_group
+
+
+def convert_labor_data(
+    years=(2023,),
+    data_dir=os.path.join(CUR_DIR, "..", "ogeth", "data", "qlfs"),
+    parquet_dir=None,
+    max_workers=None,
+):
+    """
+    Convert the Quarterly Labour Force Survey csv files to a Parquet
+    dataset, partitioned by year and quarter, with only the variables
+    needed to compute the labor moments. The quarters are converted in
+    parallel in a process pool.
+
+    Args:
+        years (tuple): years of data to convert
+        data_dir (str): path to directory with QLFS data
+        parquet_dir (str): path to the Parquet dataset, defaults to
+            data_dir/parquet
+        max_workers (int): number of processes, defaults to the number
+            of CPUs
+
+    Returns:
+        files (list): paths to the Parquet files written
+
+    """
+    if parquet_dir is None:
+        parquet_dir = os.path.join(data_dir, "parquet")
+    quarters = [
+        (year, q)
+        for year in years
+        for q in range(1, 5)
+        if os.path.exists(
+            os.path.join(data_dir, f"qlfs-{year}-q{q}-worker-v1.csv")
+        )
+    ]
+    if not quarters:
+        return []
+    with ProcessPoolExecutor(
+        max_workers=min(max_workers or os.cpu_count(), len(quarters))
+    ) as executor:
+        futures = [
+            executor.submit(_convert_quarter, year, q, data_dir, parquet_dir)
+            for year, q in quarters
+        ]
+        files = [future.result() for future in futures]
+
+    return files
+
+
+def _convert_quarter(year, q, data_dir, parquet_dir):
+    """
+    Convert one quarter of QLFS data to Parquet.
+    """
+    df = pd.concat(read_labor_chunks(year, data_dir, quarters=[q]))
+    # store age groups as strings so that partitions with different age
+    # groups can be read together
+    df["age_group"] = (
+        df["age_group"].astype(str).where(df["age_group"].notna())
+    )
+    path = os.path.join(parquet_dir, f"year={year}", f"quarter={q}")
+    os.makedirs(path, exist_ok=True)
+    file = os.path.join(path, "part-0.parquet")
+    # write to a temporary file so that a partly written file is never
+    # read by get_labor_data
+    df.to_parquet(file + ".tmp", index=False)
+    os.replace(file + ".tmp", file)
+
+    return file
+
+
 def get_labor_data(
-    year=2023, data_dir=os.path.join(CUR_DIR, "..", "ogeth", "data", "qlfs")
+    year=2023,
+    data_dir=os.path.join(CUR_DIR, "..", "ogeth", "data", "qlfs"),
+    chunksize=CHUNKSIZE,
+    parquet_dir=None,
 ):
     """
     Read in "raw" Quarterly Labour Force Survey data to calculate moments.
+    The data are read from the Parquet dataset written by
+    convert_labor_data when it has all quarters of a year, and from the
+    csv files otherwise.
 
     Args:
-        year (int): year of data to read in
+        year (int or list): year(s) of data to read in
         data_dir (str): path to directory with QLFS data
+        chunksize (int): number of rows read at a time from csv files
+        parquet_dir (str): path to the Parquet dataset, defaults to
+            data_dir/parquet
 
     Returns:
-        df (Pandas DataFrame): QLFS data to compute labor supply from
+        df (Pandas DataFrame): QLFS data to compute labor supply from,
+            with hours, age_group, and weight columns
 
     """
-    # read in data for all quarters
+    if parquet_dir is None:
+        parquet_dir = os.path.join(data_dir, "parquet")
+    years = [year] if np.isscalar(year) else list(year)
     df_list = []
-    for q in range(1, 5):
-        file = os.path.join(data_dir, f"qlfs-{year}-q{q}-worker-v1.csv")
-        df = pd.read_csv(file, encoding="latin-1", low_memory=False)
-        df_list.append(df)
+    for y in years:
+        files = _parquet_files(parquet_dir, y)
+        if files:
+            df_list += [pd.read_parquet(file) for file in files]
+        else:
+            df_list += list(read_labor_chunks(y, data_dir, chunksize))
     df = pd.concat(df_list)
+    df["age_group"] = clean_age_groups(df["age_group"])
+
+    return df
+
+
+def get_labor_sums(
+    year=2023,
+    data_dir=os.path.join(CUR_DIR, "..", "ogeth", "data", "qlfs"),
+    chunksize=CHUNKSIZE,
+    parquet_dir=None,
+):
+    """
+    Compute the weighted sums of hours and the sums of weights by age
+    group from the Quarterly Labour Force Survey data. The csv data are
+    reduced one chunk at a time, so that memory use depends on the chunk
+    size and not on the size of the survey. The Parquet dataset written
+    by convert_labor_data is used instead when it has all quarters.
+
+    Args:
+        year (int): year of data to read in
+        data_dir (str): path to directory with QLFS data
+        chunksize (int): number of rows read at a time
+        parquet_dir (str): path to the Parquet dataset, defaults to
+            data_dir/parquet
+
+    Returns:
+        sums (Pandas DataFrame): weighted_hours and weight columns,
+            indexed by age group
+
+    """
+    if parquet_dir is None:
+        parquet_dir = os.path.join(data_dir, "parquet")
+    if _parquet_files(parquet_dir, year):
+        return _sum_by_age(
+            get_labor_data(year, data_dir, chunksize, parquet_dir)
+        )
+    sums = [
+        _sum_by_age(chunk)
+        for chunk in read_labor_chunks(year, data_dir, chunksize)
+    ]
+    sums = pd.concat(sums).groupby(level=0).sum()
 
-    # rename some variables
-    df.rename(
-        columns={
-            "Q418HRSWRK": "hours",
-            # "Q14AGE": "age",
-            "age_grp1": "age_group",
-            # "Hrswrk": "hours2",
-            "Weight": "weight",
-        },
-        inplace=True,
+    return sums
+
+
+def _parquet_files(parquet_dir, year):
+    """
+    Paths to the Parquet files of all quarters of a year, or None if
+    some quarters have not been converted.
+    """
+    files = [
+        os.path.join(
+            parquet_dir, f"year={year}", f"quarter={q}", "part-0.parquet"
+        )
+        for q in range(1, 5)
+    ]
+    if all(os.path.exists(file) for file in files):
+        return files
+    return None
+
+
+def _sum_by_age(df):
+    """
+    Weighted sum of hours and sum of weights by age group, for the age
+    groups with observations.
+    """
+    codes = clean_age_groups(df["age_group"]).cat.codes.values
+    weighted_hours, weight = sum_by_age(
+        codes, df["hours"].values, df["weight"].values
     )
-    # if hours is a string, take only part after space
-    df["hours"] = df["hours"].str.split().str[-1]
-    df["hours"] = pd.to_numeric(df["hours"], errors="coerce")
-    # create weighted mean hours by age
-    # replace missing hours with zero
-    df["hours"] = df["hours"].fillna(0)
-    # drop if hours are missing
-    # df = df[~df['hours'].isna()]
+    sums = pd.DataFrame(
+        {"weighted_hours": weighted_hours, "weight": weight},
+        index=pd.Index(AGE_GROUPS, name="age_group"),
+    )
+    sums = sums[np.bincount(codes[codes >= 0], minlength=len(AGE_GROUPS)) > 0]
 
-    return df
+    return sums
+
+
+def sum_by_age(codes, hours, weight):
+    """
+    Weighted sum of hours and sum of weights by age group.
+
+    Args:
+        codes (Numpy array): integer age group codes, positions in
+            AGE_GROUPS, with -1 for missing age groups
+        hours (Numpy array): hours worked
+        weight (Numpy array): survey weights
+
+    Returns:
+        weighted_hours (Numpy array): sum of weight * hours for each
+            age group in AGE_GROUPS
+        weight (Numpy array): sum of weights for each age group
+
+    """
+    valid = codes >= 0
+    codes = codes[valid]
+    weight = weight[valid].astype(np.float64)
+    weighted_hours = np.bincount(
+        codes, weights=weight * hours[valid], minlength=len(AGE_GROUPS)
+    )
+    weight = np.bincount(codes, weights=weight, minlength=len(AGE_GROUPS))
+
+    return weighted_hours, weight
 
 
 def compute_labor_moments(df, S=80):
@@ -66,45 +335,131 @@ def compute_labor_moments(df, S=80):
     Compute moments from labor data.
 
     Args:
-        df (Pandas DataFrame): QLFS data to compute labor supply from
+        df (Pandas DataFrame): QLFS data to compute labor supply from,
+            or the sums by age group from get_labor_sums
         S (int): number of periods of economic life for model households
 
     Returns:
+        labor_dist_data (Numpy array): fraction of time spent working
+            by age, length 80
+        age_midpoints (Pandas Series): midpoints of the age groups
+        by_age (Pandas DataFrame): mean hours and fraction of time
+            worked by age group
         labor_dist_out (Numpy array): fraction of time spent working
-            by age
+            in each model period, length S
 
     """
 
     # Find fraction of total time people work on average by age group
-    by_age = pd.DataFrame(
-        df.groupby("age_group").apply(
-            lambda x: (x["hours"] * x["weight"]).sum() / x["weight"].sum()
-        )
-    )
-    # give column name to hours
-    by_age.columns = ["hours"]
-    # drop with indices that are in ['00-04', '05-09', '10-14', '14-Oct', '9-May']
-    by_age = by_age.drop(["00-04", "05-09", "10-14", "14-Oct", "9-May"])
+    sums = df if "weighted_hours" in df.columns else _sum_by_age(df)
+    # keep the age groups in the model
     # also drop age 15-19 since not in model
     # by_age = by_age.drop('15-19')
-    # rename index for 75+ to 75-85 to be able to get midpoint
-    by_age = by_age.rename(index={"75+": "75-85"})
-    # compute midpoints of age groups
-    age_midpoints = (
-        pd.Series(by_age.index)
-        .str.split("-")
-        .apply(lambda x: (int(x[0]) + int(x[1])) / 2)
+    sums = sums[sums.index.isin(MODEL_AGE_GROUPS)]
+    hours = (sums["weighted_hours"] / sums["weight"]).values
+    # midpoints of age groups, with 75+ taken as 75-85
+    age_midpoints = AGE_MIDPOINTS[
+        [MODEL_AGE_GROUPS.index(g) for g in sums.index]
+    ]
+    labor_dist_data = labor_dist_from_hours(hours, age_midpoints)
+    by_age = pd.DataFrame(
+        {"hours": hours, "frac_work": hours / ((24 - 8) * 7)},
+        index=sums.index.map(lambda g: "75-85" if g == "75+" else g),
+    )
+
+    # the above computes moments if the model period is a year
+    # the following averages them over model periods in case it is
+    # longer
+    labor_dist_out = get_age_aggregation_matrix(S) @ labor_dist_data
+
+    return labor_dist_data, pd.Series(age_midpoints), by_age, labor_dist_out
+
+
+def labor_moments(codes, hours, weight):
+    """
+    Compute the labor moments directly from arrays of the QLFS data,
+    without building any DataFrames. This is the same calculation as
+    labor_dist_data in compute_labor_moments.
+
+    Args:
+        codes (Numpy array): integer age group codes, positions in
+            AGE_GROUPS, with -1 for missing age groups
+        hours (Numpy array): hours worked
+        weight (Numpy array): survey weights
+
+    Returns:
+        labor_dist_data (Numpy array): fraction of time spent working
+            by age, length 80
+
+    """
+    weighted_hours, weight = sum_by_age(codes, hours, weight)
+    model = slice(len(AGE_GROUPS) - len(MODEL_AGE_GROUPS), None)
+    weighted_hours = weighted_hours[model]
+    weight = weight[model]
+    observed = weight > 0
+
+    return labor_dist_from_hours(
+        weighted_hours[observed] / weight[observed],
+        AGE_MIDPOINTS[observed],
     )
 
+
+def labor_dist_from_hours(hours, age_midpoints, S=80):
+    """
+    Interpolate mean weekly hours by age group to the fraction of time
+    worked at each age from 20 to 99, or in each of S model periods.
+    This is a product with the operator from get_labor_dist_operator.
+
+    Args:
+        hours (Numpy array): mean hours worked in each age group, the
+            last axis is the age group, so that a batch of replicates
+            can be interpolated at once
+        age_midpoints (Numpy array): midpoints of the age groups
+        S (int): number of periods of economic life for model households
+
+    Returns:
+        labor_dist_data (Numpy array): fraction of time spent working
+            by age, the last axis has length S
+
+    """
+    return hours @ get_labor_dist_operator(age_midpoints, S).T
+
+
+def get_labor_dist_operator(age_midpoints=AGE_MIDPOINTS, S=80):
+    """
+    Get the linear operator that maps mean weekly hours by age group to
+    the labor moments. The cubic spline through the age group midpoints
+    and its linear extension past age 80 are linear in the mean hours,
+    so for fixed midpoints the map is an S x G matrix. It is computed
+    once for each set of midpoints and S and cached.
+
+    Args:
+        age_midpoints (Numpy array): midpoints of the G age groups
+        S (int): number of periods of economic life for model households
+
+    Returns:
+        operator (Numpy array): read-only S x G matrix
+
+    """
+    return _labor_dist_operator(tuple(float(x) for x in age_midpoints), int(S))
+
+
+@functools.lru_cache(maxsize=32)
+def _labor_dist_operator(age_midpoints, S):
+    """
+    Cached implementation of get_labor_dist_operator.
+    """
+    # interpolate each unit vector of mean hours
+    hours = np.eye(len(age_midpoints))
     # get fraction of time endowment worked (assume time
     # endowment is 24 hours minus required time to sleep)
-    by_age["frac_work"] = by_age["hours"] / ((24 - 8) * 7)
+    frac_work = hours / ((24 - 8) * 7)
 
     # fit a cubic spline to these data points -- only through age 57
     # labor_dist = interpolate.interp1d(
     #     age_midpoints[:-5], by_age['frac_work'][:-5], kind='cubic')
     labor_dist = interpolate.interp1d(
-        age_midpoints, by_age["frac_work"], kind="cubic"
+        age_midpoints, frac_work, kind="cubic", axis=-1
     )
     # now evaluate the spline at each age
     labor_spline = labor_dist(np.linspace(20, 80, 60))
@@ -112,48 +467,309 @@ def compute_labor_moments(df, S=80):
     # Data have sufficient obs through age  57 (55-59 age group)
     # Fit a line to the last few years of the average labor
     # participation which extends from ages 57 to 100.
-    slope = (labor_spline[-1] - labor_spline[-8]) / (8 + 1)
+    slope = (labor_spline[..., -1] - labor_spline[..., -8]) / (8 + 1)
     # intercept = by_age['frac_work'][-1] - slope*len(by_age['frac_work'])
     # extension = slope * (np.linspace(56, 80, 23)) + intercept
     # to_dot = slope * (np.linspace(45, 56, 11)) + intercept
 
-    labor_dist_data = np.zeros(80)
-    labor_dist_data[:60] = labor_spline
-    labor_dist_data[60:] = labor_spline[-1] + slope * range(20)
+    labor_dist_data = np.zeros(labor_spline.shape[:-1] + (80,))
+    labor_dist_data[..., :60] = labor_spline
+    labor_dist_data[..., 60:] = labor_spline[..., -1:] + slope[
+        ..., None
+    ] * np.arange(20)
 
-    # the above computes moments if the model period is a year
-    # the following adjusts those moments in case it is smaller
-    labor_dist_out = (
-        1  # filter.uniform_filter(labor_dist_data, size=int(80 / S))[
+    operator = get_age_aggregation_matrix(S) @ labor_dist_data.T
+    operator.setflags(write=False)
+
+    return operator
+
+
+@functools.lru_cache(maxsize=32)
+def get_age_aggregation_matrix(S):
+    """
+    Get the matrix that averages the 80 annual labor moments (ages 20
+    to 99) over S model periods of equal length. Each model period
+    covers 80 / S years, which need not be a whole number, and each
+    annual moment enters a period with weight equal to the share of
+    the period that its year of age covers.
+
+    Args:
+        S (int): number of periods of economic life for model households
+
+    Returns:
+        agg_matrix (Numpy array): read-only S x 80 matrix, whose rows sum
+            to one
+
+    """
+    # edges of the model periods and of the years of age, in years
+    # since age 20
+    period_edges = np.linspace(0, 80, S + 1)
+    age_edges = np.arange(81)
+    overlap = np.maximum(
+        np.minimum(period_edges[1:, None], age_edges[None, 1:])
+        - np.maximum(period_edges[:-1, None], age_edges[None, :-1]),
+        0,
     )
-    #     :: int(80 / S)
-    # ]
+    agg_matrix = overlap * (S / 80)
+    agg_matrix.setflags(write=False)
 
-    return labor_dist_data, age_midpoints, by_age, labor_dist_out
+    return agg_matrix
 
 
-def VCV_moments(qlfs, n=1000, S=80):
+def resample_weights(rng, size, N, method="half"):
     """
-    Compute Variance-Covariance matrix for labor moments by
-    bootstrapping data.
+    Draw bootstrap resampling weights for a block of replicates.
+
+    Args:
+        rng (Numpy Generator): random number generator
+        size (int): number of replicates
+        N (int): number of observations
+        method (str): "half" keeps each observation with probability
+            1/2 (a half-sample), "poisson" draws Poisson(1) weights, and
+            "multinomial" draws the counts of a resample of size N with
+            replacement
+
+    Returns:
+        weights (Numpy array): size x N resampling weights
+
+    """
+    if method == "half":
+        weights = rng.integers(0, 2, size=(size, N), dtype=np.int8)
+    elif method == "poisson":
+        weights = rng.poisson(1.0, size=(size, N))
+    elif method == "multinomial":
+        draws = rng.integers(0, N, size=(size, N))
+        draws += (np.arange(size) * N)[:, None]
+        weights = np.bincount(draws.ravel(), minlength=size * N).reshape(
+            size, N
+        )
+    else:
+        raise ValueError(
+            "method must be one of 'half', 'poisson', or 'multinomial'"
+        )
+
+    return weights
+
+
+def bootstrap_labor_moments(
+    qlfs, n=1000, method="half", seed=None, block_size=None, S=80
+):
+    """
+    Compute bootstrap replicates of the labor moments. The data are
+    first reduced to the weighted hours, weight, and age group of each
+    observation in the model age groups. The resampling weights for a
+    block of replicates are then drawn at once, the sums by age group
+    of all replicates in the block are a single matrix product, and the
+    splines of all replicates are fit at once.
 
     Args:
-        cps (Pandas DataFrame): CPS data to compute labor supply from
+        qlfs (Pandas DataFrame): QLFS data to compute labor supply from
+        n (int): number of bootstrap replicates
+        method (str): resampling method, see resample_weights
+        seed (int or SeedSequence): seed of the random number
+            generators, each block of replicates uses its own stream
+            spawned from this seed
+        block_size (int): number of replicates drawn at a time, defaults
+            to a size that keeps each block of resampling weights under
+            MAX_BLOCK_ELEMENTS elements
         S (int): number of periods of economic life for model households
+
+    Returns:
+        moments (Numpy array): n x S labor moments of each replicate,
+            replicates without observations in an age group are NaN
+
+    """
+    Y, age_midpoints = _bootstrap_data(qlfs)
+    blocks = _bootstrap_blocks(n, Y.shape[0], seed, block_size)
+    moments = np.concatenate(
+        [
+            _bootstrap_block(Y, age_midpoints, size, method, seed_seq, S)
+            for size, seed_seq in blocks
+        ]
+    )
+
+    return moments
+
+
+def _bootstrap_blocks(n, N, seed, block_size):
+    """
+    Split n replicates into blocks, with the size and an independent
+    SeedSequence for each block.
+    """
+    if block_size is None:
+        block_size = max(1, MAX_BLOCK_ELEMENTS // N)
+    sizes = [min(block_size, n - start) for start in range(0, n, block_size)]
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+
+    return list(zip(sizes, seed.spawn(len(sizes))))
+
+
+def _bootstrap_block(Y, age_midpoints, size, method, seed_seq, S=80):
+    """
+    Labor moments of a block of bootstrap replicates.
+    """
+    G = len(age_midpoints)
+    rng = np.random.default_rng(seed_seq)
+    weights = resample_weights(rng, size, Y.shape[0], method)
+    sums = (Y.T @ weights.T.astype(np.float64)).T
+    with np.errstate(invalid="ignore", divide="ignore"):
+        hours = sums[:, :G] / sums[:, G:]
+
+    return labor_dist_from_hours(hours, age_midpoints, S)
+
+
+def _bootstrap_block_stats(Y, age_midpoints, size, method, seed_seq, S=80):
+    """
+    Number of replicates, mean, and sum of squared deviations from the
+    mean of the labor moments of a block of bootstrap replicates,
+    leaving out replicates with an empty age group.
+    """
+    moments = _bootstrap_block(Y, age_midpoints, size, method, seed_seq, S)
+    moments = moments[~np.isnan(moments).any(axis=1)]
+    count = moments.shape[0]
+    if count == 0:
+        return size, 0, np.zeros(moments.shape[1]), None
+    mean = moments.mean(axis=0)
+    deviations = moments - mean
+
+    return size, count, mean, deviations.T @ deviations
+
+
+def _merge_stats(stats_a, stats_b):
+    """
+    Combine the count, mean, and sum of squared deviations of two sets
+    of replicates (Chan et al.'s parallel form of Welford's algorithm).
+    """
+    count_a, mean_a, M2_a = stats_a
+    count_b, mean_b, M2_b = stats_b
+    if count_a == 0:
+        return stats_b
+    if count_b == 0:
+        return stats_a
+    count = count_a + count_b
+    delta = mean_b - mean_a
+    mean = mean_a + delta * (count_b / count)
+    M2 = M2_a + M2_b + np.outer(delta, delta) * (count_a * count_b / count)
+
+    return count, mean, M2
+
+
+def _bootstrap_data(qlfs):
+    """
+    Sparse N x 2G matrix with the weighted hours and weight of each
+    observation in the columns of its age group, for the N observations
+    in the G model age groups with observations, and the midpoints of
+    these age groups.
+    """
+    codes = clean_age_groups(qlfs["age_group"]).cat.codes.values
+    codes = codes - (len(AGE_GROUPS) - len(MODEL_AGE_GROUPS))
+    weight = qlfs["weight"].values.astype(np.float64)
+    keep = (codes >= 0) & (weight != 0)
+    codes = codes[keep]
+    weight = weight[keep]
+    weighted_hours = weight * qlfs["hours"].values[keep]
+    observed = np.bincount(codes, minlength=len(MODEL_AGE_GROUPS)) > 0
+    # renumber the observed age groups
+    codes = (np.cumsum(observed) - 1)[codes]
+    G = observed.sum()
+    N = len(codes)
+    Y = sparse.csr_array(
+        (
+            np.concatenate([weighted_hours, weight]),
+            (np.tile(np.arange(N), 2), np.concatenate([codes, codes + G])),
+        ),
+        shape=(N, 2 * G),
+    )
+
+    return Y, AGE_MIDPOINTS[observed]
+
+
+def VCV_moments(
+    qlfs,
+    n=1000,
+    S=80,
+    method="half",
+    seed=None,
+    block_size=None,
+    executor=None,
+):
+    """
+    Compute Variance-Covariance matrix for labor moments by
+    bootstrapping data. The replicates are computed in blocks, which can
+    run in parallel on an executor, and the covariance is accumulated
+    block by block, so the moments of all replicates are never held in
+    memory at once. Each block has its own random number stream spawned
+    from seed, and blocks are combined in order, so the result for a
+    given seed and block_size does not depend on the executor or the
+    number of workers.
+    Replicates with an empty age group are dropped, and a ValueError is
+    raised if fewer than two are left.
+
+    Args:
+        qlfs (Pandas DataFrame): QLFS data to compute labor supply from
         n (int): number of bootstrap iterations to run
-        bin_weights (Numpy array): ability weight, length J
+        S (int): number of periods of economic life for model households
+        method (str): resampling method, see resample_weights
+        seed (int or SeedSequence): seed of the random number generators
+        block_size (int): number of replicates drawn at a time
+        executor (Executor or distributed.Client): executor to run the
+            blocks of replicates on, e.g., a
+            concurrent.futures.ProcessPoolExecutor or a Dask client. If
+            None, the blocks run one after another in this process.
 
     Output:
         VCV (Numpy array): = variance-covariance matrix of labor
             moments, size SxS
 
     """
-    labor_moments_boot = np.zeros((n, S))
-    for i in range(n):
-        boot = qlfs[np.random.randint(2, size=len(qlfs.index)).astype(bool)]
-        _, _, _, labor_moments_boot[i, :] = compute_labor_moments(boot, S)
+    Y, age_midpoints = _bootstrap_data(qlfs)
+    blocks = _bootstrap_blocks(n, Y.shape[0], seed, block_size)
+    if executor is None:
+        results = (
+            _bootstrap_block_stats(Y, age_midpoints, size, method, seed_seq, S)
+            for size, seed_seq in blocks
+        )
+    else:
+        if hasattr(executor, "scatter"):
+            # send the data to the Dask workers once
+            Y = executor.scatter(Y, broadcast=True)
+        futures = [
+            executor.submit(
+                _bootstrap_block_stats,
+                Y,
+                age_midpoints,
+                size,
+                method,
+                seed_seq,
+                S,
+            )
+            for size, seed_seq in blocks
+        ]
+        results = (future.result() for future in futures)
+    stats = (0, 0.0, 0.0)
+    missing = 0
+    for size, count, mean, M2 in results:
+        missing += size - count
+        stats = _merge_stats(stats, (count, mean, M2))
+    if missing:
+        print(
+            "Dropping "
+            + str(missing)
+            + " bootstrap replicates with an empty age group"
+        )
+    count, _, M2 = stats
+    if count < 2:
+        raise ValueError(
+            "At least two bootstrap replicates are needed for the VCV, "
+            + str(count)
+            + " of "
+            + str(n)
+            + " are left after dropping "
+            + str(missing)
+        )
 
-    VCV = np.cov(labor_moments_boot.T)
+    VCV = M2 / (count - 1)
 
     return VCV
 
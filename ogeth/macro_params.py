@@ -5,13 +5,36 @@ parameters for the OG-ETH model that rely on macro data for calibration.
 """
 
 # imports
-from pandas_datareader import wb
 import pandas as pd
 import numpy as np
 import requests
 import datetime
+import time
 import statsmodels.api as sm
 from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from ogeth.utils import get_legacy_session
+from ogeth import snapshots
+
+WB_API_URL = "https://api.worldbank.org/v2"
+ILO_API_URL = "https://rplumber.ilo.org/data/indicator/"
+# Dictionaries of variables and their corresponding World Bank codes
+# Annual data
+WB_A_VARIABLE_DICT = {
+    "GDP per capita (constant 2015 US$)": "NY.GDP.PCAP.KD",
+    # "Real GDP (constant 2015 US$)": "NY.GDP.MKTP.KD",
+    # "Nominal GDP (current US$)": "NY.GDP.MKTP.CD",
+    # "General government final consumption expenditure (current US$)": "NE.CON.GOVT.CD",
+}
+# Timeout in seconds for each request to a data source
+SOURCE_TIMEOUTS = {"wb": 30, "ilo": 30}
+# Number of retries for a failed request and the initial pause between
+# retries in seconds, which doubles after each retry
+MAX_RETRIES = 2
+BACKOFF = 1.0
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
 
 
 def get_macro_params(
@@ -19,6 +42,10 @@ def get_macro_params(
     data_end_date=datetime.datetime(2024, 12, 31),
     country_iso="ETH",
     update_from_api=False,
+    return_status=False,
+    snapshot_id=None,
+    snapshot_dir=None,
+    save_snapshot=False,
 ):
     """
     Compute values of parameters that are derived from macro data
@@ -27,127 +54,97 @@ def get_macro_params(
         data_start_date (datetime): start date for data
         data_end_date (datetime): end date for data
         country_iso (str): ISO code for country
+        update_from_api (bool): if True, retrieve data from the World
+            Bank and ILOSTAT APIs
+        return_status (bool): if True, also return the status of each
+            data source
+        snapshot_id (str): if not None, id of a snapshot in the
+            snapshots store (or "latest") to read the data from instead
+            of the APIs
+        snapshot_dir (str): path to the snapshot store, defaults to
+            snapshots.SNAPSHOT_DIR
+        save_snapshot (bool): if True, save the data retrieved from the
+            APIs as a new snapshot
 
     Returns:
         macro_parameters (dict): dictionary of parameter values
+        status (dict): status of each data source from fetch_sources,
+            only returned if return_status is True
     """
     # initialize a dictionary of parameters
     macro_parameters = {}
+    status = {}
 
     """
-    Retrieve data from the World Bank World Development Indicators.
-    """
-    # Dictionaries of variables and their corresponding World Bank codes
-    # Annual data
-    wb_a_variable_dict = {
-        "GDP per capita (constant 2015 US$)": "NY.GDP.PCAP.KD",
-        # "Real GDP (constant 2015 US$)": "NY.GDP.MKTP.KD",
-        # "Nominal GDP (current US$)": "NY.GDP.MKTP.CD",
-        # "General government final consumption expenditure (current US$)": "NE.CON.GOVT.CD",
-    }
-
-    if update_from_api:
-        try:
-            # pull series of interest from the WB using pandas_datareader
-            # Annual data
-            wb_data_a = wb.download(
-                indicator=wb_a_variable_dict.values(),
-                country=country_iso,
-                start=data_start_date,
-                end=data_end_date,
-            )
-            wb_data_a.rename(
-                columns=dict((y, x) for x, y in wb_a_variable_dict.items()),
-                inplace=True,
-            )
-
-            # Compute annual GDP growth safely
-            if "GDP per capita (constant 2015 US$)" in wb_data_a.columns:
-                g_y_series = wb_data_a[
-                    "GDP per capita (constant 2015 US$)"
-                ].pct_change(-1)
-
-                # If all values are NaN, return None
-                macro_parameters["g_y_annual"] = (
-                    g_y_series.mean() if not g_y_series.isna().all() else None
-                )
-            else:
-                print(
-                    "Warning: Missing GDP per capita data in World Bank data. Skipping update for g_y_annual."
-                )
-
-            print(
-                f"g_y_annual updated from World Bank API: {macro_parameters['g_y_annual']}"
-            )
-        except:
-            print("Failed to retrieve data from World Bank")
-            print("Will not update the following parameters:")
-            print(
-                "[initial_debt_ratio, initial_foreign_debt_ratio, zeta_D, g_y]"
-            )
-    else:
-        print("Not updating from World Bank API")
-
-    """
-    Retrieve labour share data from the United Nations ILOSTAT Data API
-    (see https://rplumber-test.ilo.org)
-    The series code is SDG_1041_NOC_RT_A (capital share)
+    Retrieve data from the World Bank World Development Indicators and
+    labour share data from the United Nations ILOSTAT Data API
+    (see https://rplumber-test.ilo.org) at the same time, or read them
+    from a snapshot.
+    The ILOSTAT series code is SDG_1041_NOC_RT_A (capital share)
     Labor share (gamma) = 1 - capital share
-    If this fails we will not update gamma in 'default_parameters.json'
+    If a source fails we will not update the parameters that rely on it
     """
-    if update_from_api:
-        try:
-            target = (
-                "https://rplumber.ilo.org/data/indicator/"
-                + "?id=SDG_1041_NOC_RT_A"
-                + "&ref_area="
-                + str(country_iso)
-                + "&timefrom="
-                + str(data_start_date.year)
-                + "&timeto="
-                + str(data_end_date.year)
-                + "&type=both&format=.csv"
-            )
-            # Add headers
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+    if snapshot_id is not None:
+        results = snapshots.load_snapshot(snapshot_id, snapshot_dir)
+        info = snapshots.get_snapshot_info(snapshot_id, snapshot_dir)
+        status = {
+            name: {
+                "ok": True,
+                "attempts": 0,
+                "elapsed": 0.0,
+                "error": None,
+                "snapshot": info["id"],
             }
+            for name in results.keys()
+        }
+    elif update_from_api:
+        results, queries, status = get_macro_data(
+            data_start_date, data_end_date, country_iso
+        )
+        if save_snapshot and results:
+            snapshot = snapshots.save_snapshot(results, queries, snapshot_dir)
+            for name in results.keys():
+                status[name]["snapshot"] = snapshot
+    else:
+        results = {}
+        print("Not updating from World Bank and ILOSTAT APIs")
 
-            print("Attempting to update gamma from ILOSTAT")
-            response = requests.get(target, headers=headers)
-            if response.status_code != 200:
-                print(f"Error: Received status code {response.status_code}")
-            else:
-                print("Request successful.")
-            csv_content = StringIO(response.text)
-            df_temp = pd.read_csv(csv_content)
-            ilo_data = df_temp[["time", "obs_value"]]
-            # find gamma, capital's share of income
-            macro_parameters["gamma"] = [
-                1
-                - (
-                    (
-                        ilo_data.loc[
-                            ilo_data["time"] == data_end_date.year, "obs_value"
-                        ].squeeze()
-                    )
-                    / 100
-                )
-            ]
+    # Compute annual GDP growth
+    if "wb" in results:
+        g_y_series = results["wb"][
+            "GDP per capita (constant 2015 US$)"
+        ].pct_change(-1)
+        # If all values are NaN, return None
+        macro_parameters["g_y_annual"] = (
+            g_y_series.mean() if not g_y_series.isna().all() else None
+        )
+    # find gamma, capital's share of income
+    if "ilo" in results:
+        ilo_data = results["ilo"]
+        obs_value = ilo_data.loc[
+            ilo_data["time"] == data_end_date.year, "obs_value"
+        ]
+        if obs_value.empty:
+            status["ilo"]["ok"] = False
+            status["ilo"]["error"] = "No observation for " + str(
+                data_end_date.year
+            )
+        else:
+            macro_parameters["gamma"] = [1 - (obs_value.squeeze() / 100)]
+    for source, source_status in status.items():
+        if not source_status["ok"]:
             print(
-                f"gamma updated from ILOSTAT API: {macro_parameters['gamma']}"
+                "Failed to retrieve data from "
+                + source
+                + ": "
+                + str(source_status["error"])
             )
-        except:
-            print("Failed to retrieve data from ILOSTAT")
-            print("Will not update gamma")
-    else:
-        print("Not updating from ILOSTAT API")
 
     """
     Calibrate parameters from IMF and other sources
     """
 
-    if update_from_api:
+    if update_from_api or snapshot_id is not None:
         # alpha_T, non-social security transfers (grants, subsidies, and other transfers) as a fraction of GDP
         # source: IMF GFS (12.0.0), indicator G271_T, Budgetary central government
         # source link: https://data.imf.org/en/Data-Explorer?datasetUrn=IMF.STA:GFS_SOO(12.0.0)&INDICATOR=G271_T
@@ -220,4 +217,217 @@ def get_macro_params(
     else:
         print("Not updating alpha_T, alpha_G, r_gov_shift, r_gov_scale")
 
+    if return_status:
+        return macro_parameters, status
     return macro_parameters
+
+
+def get_macro_data(
+    data_start_date=datetime.datetime(1947, 1, 1),
+    data_end_date=datetime.datetime(2024, 12, 31),
+    country_iso="ETH",
+):
+    """
+    Retrieve the raw data series used by get_macro_params from the World
+    Bank and ILOSTAT APIs at the same time.
+
+    Args:
+        data_start_date (datetime): start date for data
+        data_end_date (datetime): end date for data
+        country_iso (str): ISO code for country
+
+    Returns:
+        data (dict): DataFrames from the sources that succeeded, with
+            keys "wb" and "ilo"
+        queries (dict): source URL and query arguments of each series
+        status (dict): status of each data source from fetch_sources
+    """
+    sources = {
+        "wb": (
+            get_wb_data,
+            {
+                "indicators": WB_A_VARIABLE_DICT,
+                "country_iso": country_iso,
+                "start_year": data_start_date.year,
+                "end_year": data_end_date.year,
+            },
+        ),
+        "ilo": (
+            get_ilo_data,
+            {
+                "series": "SDG_1041_NOC_RT_A",
+                "country_iso": country_iso,
+                "start_year": data_start_date.year,
+                "end_year": data_end_date.year,
+            },
+        ),
+    }
+    queries = {
+        "wb": dict(url=WB_API_URL, **sources["wb"][1]),
+        "ilo": dict(url=ILO_API_URL, **sources["ilo"][1]),
+    }
+    session = get_legacy_session(pool_maxsize=len(sources))
+    data, status = fetch_sources(sources, session=session)
+    session.close()
+
+    return data, queries, status
+
+
+def fetch_sources(
+    sources, session=None, max_retries=MAX_RETRIES, backoff=BACKOFF
+):
+    """
+    Retrieve data from several sources at the same time, so that the
+    wall time is bounded by the slowest source rather than the sum of
+    all of them. Each source is retried with exponential backoff and
+    has its own timeout from SOURCE_TIMEOUTS.
+
+    Args:
+        sources (dict): maps source names to tuples of a function and a
+            dict of keyword arguments. The function is called with the
+            keyword arguments and session and timeout keywords, and
+            returns the data
+        session (requests.Session): session shared by all sources,
+            defaults to utils.get_legacy_session()
+        max_retries (int): number of retries after a failed request
+        backoff (float): pause in seconds before the first retry, which
+            doubles after each retry
+
+    Returns:
+        results (dict): data from each source that succeeded
+        status (dict): status of each source, a dict with keys "ok"
+            (bool), "attempts" (int), "elapsed" (seconds), and "error"
+            (str or None)
+    """
+    if session is None:
+        session = get_legacy_session(pool_maxsize=max(len(sources), 1))
+
+    def fetch(func, kwargs, timeout):
+        start = time.time()
+        error = None
+        for attempt in range(max_retries + 1):
+            if attempt > 0:
+                time.sleep(backoff * 2 ** (attempt - 1))
+            try:
+                data = func(session=session, timeout=timeout, **kwargs)
+                return data, {
+                    "ok": True,
+                    "attempts": attempt + 1,
+                    "elapsed": time.time() - start,
+                    "error": None,
+                }
+            except (requests.RequestException, ValueError, KeyError) as err:
+                error = repr(err)
+        return None, {
+            "ok": False,
+            "attempts": max_retries + 1,
+            "elapsed": time.time() - start,
+            "error": error,
+        }
+
+    with ThreadPoolExecutor(max_workers=max(len(sources), 1)) as executor:
+        futures = {
+            name: executor.submit(
+                fetch, func, kwargs, SOURCE_TIMEOUTS.get(name, 30)
+            )
+            for name, (func, kwargs) in sources.items()
+        }
+    results = {}
+    status = {}
+    for name, future in futures.items():
+        data, status[name] = future.result()
+        if status[name]["ok"]:
+            results[name] = data
+
+    return results, status
+
+
+def get_wb_data(
+    indicators, country_iso, start_year, end_year, session, timeout=30
+):
+    """
+    Retrieve annual series from the World Bank World Development
+    Indicators API.
+
+    Args:
+        indicators (dict): maps variable names to World Bank codes
+        country_iso (str): ISO code for country
+        start_year (int): first year of data
+        end_year (int): last year of data
+        session (requests.Session): session to send requests with
+        timeout (float): timeout in seconds for each request
+
+    Returns:
+        wb_data (pd.DataFrame): data indexed by country and year (most
+            recent year first), with a column for each variable
+    """
+    wb_data = None
+    for name, code in indicators.items():
+        response = session.get(
+            WB_API_URL + "/country/" + country_iso + "/indicator/" + code,
+            params={
+                "date": str(start_year) + ":" + str(end_year),
+                "format": "json",
+                "per_page": 25000,
+            },
+            headers=HEADERS,
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        out = response.json()
+        if "message" in out[0] or not out[1]:
+            raise ValueError("No World Bank data for " + code)
+        df = pd.DataFrame(
+            {
+                "country": [x["country"]["value"] for x in out[1]],
+                "year": [x["date"] for x in out[1]],
+                name: pd.to_numeric(
+                    [x["value"] for x in out[1]], errors="coerce"
+                ),
+            }
+        )
+        wb_data = (
+            df
+            if wb_data is None
+            else wb_data.merge(df, how="outer", on=["country", "year"])
+        )
+    wb_data = wb_data.set_index(["country", "year"])
+
+    return wb_data
+
+
+def get_ilo_data(
+    series, country_iso, start_year, end_year, session, timeout=30
+):
+    """
+    Retrieve an annual series from the ILOSTAT Data API.
+
+    Args:
+        series (str): ILOSTAT series code
+        country_iso (str): ISO code for country
+        start_year (int): first year of data
+        end_year (int): last year of data
+        session (requests.Session): session to send requests with
+        timeout (float): timeout in seconds for the request
+
+    Returns:
+        ilo_data (pd.DataFrame): data with time and obs_value columns
+    """
+    response = session.get(
+        ILO_API_URL,
+        params={
+            "id": series,
+            "ref_area": country_iso,
+            "timefrom": start_year,
+            "timeto": end_year,
+            "type": "both",
+            "format": ".csv",
+        },
+        headers=HEADERS,
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    df_temp = pd.read_csv(StringIO(response.text))
+    ilo_data = df_temp[["time", "obs_value"]]
+
+    return ilo_data
@@ -0,0 +1,391 @@
+"""
+A cache of model solutions, so that a model with the same parameters is
+not solved twice. Each entry is keyed by a hash of the resolved values
+of a Specifications object and of the OG-Core and OG-ETH versions, and
+holds the SS_vars.pkl, TPI_vars.pkl, and model_params.pkl files written
+by ogcore.execute.runner. The least recently used entries are evicted
+when the cache is over its disk budget.
+
+The cache can be inspected from the command line:
+
+    python -m ogeth.result_cache list
+    python -m ogeth.result_cache stats
+    python -m ogeth.result_cache evict --max-bytes 5000000000
+"""
+
+# imports
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import datetime
+import numpy as np
+import ogcore
+from ogcore.execute import runner
+import ogeth
+from ogeth.utils import CACHE_DIR, to_json, write_json
+
+RESULT_CACHE_DIR = os.path.join(CACHE_DIR, "results")
+# disk budget of the cache in bytes
+MAX_BYTES = 20 * 2**30
+ENTRY_FILE = "entry.json"
+PARAMS_FILE = "model_params.pkl"
+SS_FILE = os.path.join("SS", "SS_vars.pkl")
+TPI_FILE = os.path.join("TPI", "TPI_vars.pkl")
+# attributes of Specifications objects that do not change the solution,
+# and SS_theta, which ogcore.SS.run_SS sets on reforms from the baseline
+# solution
+EXCLUDE_PARAMS = {
+    "SS_theta",
+    "output_base",
+    "baseline_dir",
+    "num_workers",
+    "parameter_warnings",
+    "parameter_errors",
+}
+
+
+def get_result_key(p, time_path=True):
+    """
+    Get the cache key of the solution of a model, a hash of the resolved
+    parameter values, of the OG-Core and OG-ETH versions and, for a
+    reform, of the baseline solution it starts from.
+
+    Args:
+        p (OG-Core Specifications object): model parameters
+        time_path (bool): whether the time path equilibrium is solved
+
+    Returns:
+        key (str): hex digest of the model
+
+    """
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            {
+                "ogcore": ogcore.__version__,
+                "ogeth": ogeth.__version__,
+                "time_path": time_path,
+            },
+            sort_keys=True,
+        ).encode("utf-8")
+    )
+    for name in sorted(vars(p)):
+        if name.startswith("_") or name in EXCLUDE_PARAMS:
+            continue
+        value = getattr(p, name)
+        if not isinstance(
+            value, (np.ndarray, np.generic, int, float, bool, str, list)
+        ):
+            continue
+        digest.update(name.encode("utf-8"))
+        try:
+            value = np.asarray(value)
+        except ValueError:
+            # ragged lists
+            value = np.asarray(json.dumps(value, default=to_json))
+        if value.dtype == object:
+            value = np.asarray(json.dumps(value.tolist(), default=to_json))
+        digest.update(value.dtype.str.encode("utf-8"))
+        digest.update(str(value.shape).encode("utf-8"))
+        digest.update(np.ascontiguousarray(value).tobytes())
+    if not p.baseline:
+        for file in [SS_FILE, TPI_FILE]:
+            path = os.path.join(p.baseline_dir, file)
+            if os.path.exists(path):
+                digest.update(file.encode("utf-8"))
+                with open(path, "rb") as f:
+                    for block in iter(lambda: f.read(2**20), b""):
+                        digest.update(block)
+
+    return digest.hexdigest()
+
+
+def load_results(p, time_path=True, cache_dir=None, link=False, key=None):
+    """
+    Put the cached solution of a model, if any, in p.output_base. The
+    parameter file is that of the run that solved the model, so its
+    paths are those of that run.
+
+    Args:
+        p (OG-Core Specifications object): model parameters
+        time_path (bool): whether the time path equilibrium is needed
+        cache_dir (str): path to the cache, defaults to RESULT_CACHE_DIR
+        link (bool): if True, symlink the SS, TPI, and parameter files
+            into p.output_base instead of copying them
+        key (str): cache key of the model, computed from p if None
+
+    Returns:
+        hit (bool): True if the solution was in the cache
+
+    """
+    if cache_dir is None:
+        cache_dir = RESULT_CACHE_DIR
+    if key is None:
+        key = get_result_key(p, time_path)
+    entry_dir = os.path.join(cache_dir, key)
+    entry = _read_entry(entry_dir)
+    if entry is None:
+        return False
+    # the parameters are those of the solved model, with the attributes
+    # the solvers set, as written by runner
+    files = [SS_FILE, PARAMS_FILE]
+    if time_path:
+        files.append(TPI_FILE)
+    for file in files:
+        path = os.path.join(p.output_base, file)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.lexists(path):
+            os.remove(path)
+        if link:
+            os.symlink(os.path.abspath(os.path.join(entry_dir, file)), path)
+        else:
+            shutil.copyfile(os.path.join(entry_dir, file), path)
+    entry["last_used"] = time.time()
+    entry["hits"] += 1
+    _write_entry(entry, entry_dir)
+
+    return True
+
+
+def save_results(
+    p, time_path=True, cache_dir=None, max_bytes=MAX_BYTES, key=None
+):
+    """
+    Add the solution of a model in p.output_base to the cache, and evict
+    the least recently used entries if the cache is over its budget.
+
+    Args:
+        p (OG-Core Specifications object): model parameters
+        time_path (bool): whether the time path equilibrium was solved
+        cache_dir (str): path to the cache, defaults to RESULT_CACHE_DIR
+        max_bytes (int): disk budget of the cache, no limit if None
+        key (str): cache key of the model, computed from p if None. The
+            solvers set attributes of p, so the key should be computed
+            before the model is solved.
+
+    Returns:
+        key (str): cache key of the model
+
+    """
+    if cache_dir is None:
+        cache_dir = RESULT_CACHE_DIR
+    if key is None:
+        key = get_result_key(p, time_path)
+    entry_dir = os.path.join(cache_dir, key)
+    if _read_entry(entry_dir) is None:
+        # copy to a temporary directory first, so that a partial entry is
+        # never read
+        tmp_dir = entry_dir + ".tmp" + str(os.getpid())
+        files = [SS_FILE, PARAMS_FILE]
+        if time_path:
+            files.append(TPI_FILE)
+        size = 0
+        for file in files:
+            os.makedirs(
+                os.path.dirname(os.path.join(tmp_dir, file)), exist_ok=True
+            )
+            shutil.copyfile(
+                os.path.join(p.output_base, file), os.path.join(tmp_dir, file)
+            )
+            size += os.path.getsize(os.path.join(tmp_dir, file))
+        now = time.time()
+        entry = {
+            "key": key,
+            "baseline": bool(p.baseline),
+            "time_path": time_path,
+            "ogcore_version": ogcore.__version__,
+            "ogeth_version": ogeth.__version__,
+            "source": os.path.abspath(p.output_base),
+            "created": datetime.datetime.now(
+                datetime.timezone.utc
+            ).isoformat(),
+            "last_used": now,
+            "hits": 0,
+            "size": size,
+        }
+        _write_entry(entry, tmp_dir)
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # another process saved the same entry first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    if max_bytes is not None:
+        evict_results(cache_dir, max_bytes, keep=[key])
+
+    return key
+
+
+def cached_runner(
+    p,
+    time_path=True,
+    client=None,
+    cache_dir=None,
+    link=False,
+    max_bytes=MAX_BYTES,
+):
+    """
+    Run ogcore.execute.runner, unless the solution of the model is in
+    the cache, and add new solutions to the cache.
+
+    Args:
+        p (OG-Core Specifications object): model parameters
+        time_path (bool): whether to solve for the time path equilibrium
+        client (Dask client object): client
+        cache_dir (str): path to the cache, defaults to RESULT_CACHE_DIR
+        link (bool): if True, symlink cached files into p.output_base
+            instead of copying them
+        max_bytes (int): disk budget of the cache, no limit if None
+
+    Returns:
+        hit (bool): True if the solution was in the cache
+
+    """
+    key = get_result_key(p, time_path)
+    if load_results(p, time_path, cache_dir, link, key):
+        print("Using cached solution in ", p.output_base)
+        return True
+    runner(p, time_path=time_path, client=client)
+    save_results(p, time_path, cache_dir, max_bytes, key)
+
+    return False
+
+
+def list_results(cache_dir=None):
+    """
+    List the entries of the cache, most recently used first.
+
+    Args:
+        cache_dir (str): path to the cache, defaults to RESULT_CACHE_DIR
+
+    Returns:
+        entries (list): dicts describing each entry
+
+    """
+    if cache_dir is None:
+        cache_dir = RESULT_CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = [
+        _read_entry(os.path.join(cache_dir, name))
+        for name in os.listdir(cache_dir)
+    ]
+    entries = [entry for entry in entries if entry is not None]
+    entries.sort(key=lambda entry: entry["last_used"], reverse=True)
+
+    return entries
+
+
+def evict_results(cache_dir=None, max_bytes=MAX_BYTES, keep=()):
+    """
+    Remove the least recently used entries of the cache until it is
+    within max_bytes.
+
+    Args:
+        cache_dir (str): path to the cache, defaults to RESULT_CACHE_DIR
+        max_bytes (int): disk budget of the cache
+        keep (list): keys of entries that are never evicted
+
+    Returns:
+        removed (list): keys of entries that were removed
+
+    """
+    if cache_dir is None:
+        cache_dir = RESULT_CACHE_DIR
+    entries = list_results(cache_dir)
+    total = sum(entry["size"] for entry in entries)
+    removed = []
+    for entry in reversed(entries):
+        if total <= max_bytes:
+            break
+        if entry["key"] in keep:
+            continue
+        shutil.rmtree(os.path.join(cache_dir, entry["key"]))
+        removed.append(entry["key"])
+        total -= entry["size"]
+
+    return removed
+
+
+def get_stats(cache_dir=None):
+    """
+    Get summary statistics of the cache.
+
+    Args:
+        cache_dir (str): path to the cache, defaults to RESULT_CACHE_DIR
+
+    Returns:
+        stats (dict): number of entries, total size in bytes, and total
+            number of hits
+
+    """
+    entries = list_results(cache_dir)
+    stats = {
+        "entries": len(entries),
+        "size": sum(entry["size"] for entry in entries),
+        "hits": sum(entry["hits"] for entry in entries),
+    }
+
+    return stats
+
+
+def _read_entry(entry_dir):
+    path = os.path.join(entry_dir, ENTRY_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def _write_entry(entry, entry_dir):
+    write_json(entry, os.path.join(entry_dir, ENTRY_FILE))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m ogeth.result_cache",
+        description="Inspect the cache of OG-ETH model solutions.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=RESULT_CACHE_DIR,
+        help="path to the cache",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="list entries, most recent first")
+    evict = subparsers.add_parser(
+        "evict", help="evict least recently used entries"
+    )
+    evict.add_argument(
+        "--max-bytes",
+        type=int,
+        default=MAX_BYTES,
+        help="disk budget, 0 to remove all entries",
+    )
+    subparsers.add_parser("stats", help="show cache statistics")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for entry in list_results(args.cache_dir):
+            print(
+                entry["key"][:16],
+                "baseline" if entry["baseline"] else "reform",
+                "time_path" if entry["time_path"] else "SS",
+                entry["size"],
+                entry["hits"],
+                entry["created"],
+                entry["source"],
+            )
+    elif args.command == "evict":
+        for key in evict_results(args.cache_dir, args.max_bytes):
+            print("removed", key)
+    else:
+        print(json.dumps(get_stats(args.cache_dir), indent=2))
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
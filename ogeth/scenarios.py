@@ -0,0 +1,337 @@
+"""
+Runs a baseline and several reforms of OG-ETH. The baseline is solved
+first, since the reforms start from its steady state solution, and the
+reforms are then solved at the same time on a shared Dask client, with
+the workers of the client split between them so that the J household
+problems of each reform are solved on their own workers.
+
+Each scenario is written to its own output directory with a
+manifest.json file recording its parameter updates, status and run time,
+and a manifest.json file in the save directory lists all scenarios.
+"""
+
+# imports
+import os
+import copy
+import json
+import time
+import queue
+import datetime
+import numpy as np
+import dask
+from concurrent.futures import ThreadPoolExecutor
+from ogcore.execute import runner
+from ogeth import result_cache
+from ogeth.utils import write_json
+
+BASELINE_DIR = "OUTPUT_BASELINE"
+REFORM_DIR = "OUTPUT_REFORM"
+MANIFEST_FILE = "manifest.json"
+
+
+def run_scenarios(
+    p,
+    reforms,
+    save_dir,
+    client=None,
+    names=None,
+    time_path=True,
+    run_baseline=True,
+    max_concurrent=None,
+    use_cache=False,
+    cache_dir=None,
+):
+    """
+    Run the baseline and then the reforms, at the same time if a client
+    is given.
+
+    Args:
+        p (OG-Core Specifications object): baseline model parameters
+        reforms (list): dicts of parameter updates for each reform,
+            passed to p.update_specifications
+        save_dir (str): path to the directory in which the output
+            directory of each scenario is saved
+        client (Dask client object): client shared by the scenarios, if
+            None the scenarios are run one after another
+        names (list): names of the reforms, used for their output
+            directories, defaults to "1", "2", ...
+        time_path (bool): whether to solve for the time path equilibrium
+        run_baseline (bool): if False, the baseline output already in
+            save_dir is used
+        max_concurrent (int): maximum number of reforms run at the same
+            time, defaults to the number of reforms, capped at the number
+            of workers of the client
+        use_cache (bool): if True, reuse the solutions in the result
+            cache of ogeth.result_cache and add new solutions to it
+        cache_dir (str): path to the result cache, defaults to
+            result_cache.RESULT_CACHE_DIR
+
+    Returns:
+        manifest (list): manifest of each scenario, the baseline first
+
+    """
+    if names is None:
+        names = [str(i + 1) for i in range(len(reforms))]
+    if len(names) != len(reforms):
+        raise ValueError("names must have the same length as reforms")
+    if len(set(names)) != len(names):
+        raise ValueError("Repeated reform names: " + str(names))
+    base_dir = os.path.join(save_dir, BASELINE_DIR)
+
+    cache = (cache_dir or result_cache.RESULT_CACHE_DIR) if use_cache else None
+    # baseline
+    p_base = get_baseline_specifications(p, base_dir)
+    if run_baseline:
+        base_manifest = run_scenario(
+            "baseline", p_base, {}, time_path, client, None, cache
+        )
+        if base_manifest["status"] != "complete":
+            _write_manifest([base_manifest], save_dir)
+            raise RuntimeError(
+                "Baseline failed: " + str(base_manifest["error"])
+            )
+    else:
+        if not scenario_complete(base_dir, time_path):
+            raise FileNotFoundError(
+                "No baseline output for time_path="
+                + str(time_path)
+                + " in "
+                + base_dir
+            )
+        if os.path.exists(os.path.join(base_dir, MANIFEST_FILE)):
+            base_manifest = read_manifest(base_dir)
+        else:
+            # baselines not run by run_scenarios have no manifest
+            base_manifest = {
+                "name": "baseline",
+                "baseline": True,
+                "output_dir": base_dir,
+                "baseline_dir": base_dir,
+                "updates": {},
+                "time_path": time_path,
+                "num_workers": None,
+                "started": None,
+                "status": "complete",
+                "error": None,
+                "cached": False,
+            }
+
+    # reforms
+    scenarios = []
+    for name, reform in zip(names, reforms):
+        p_reform = get_reform_specifications(
+            p_base, reform, os.path.join(save_dir, REFORM_DIR + "_" + name)
+        )
+        scenarios.append((name, p_reform, reform))
+    if client is None or not scenarios:
+        reform_manifests = [
+            run_scenario(name, p_reform, reform, time_path, None, None, cache)
+            for name, p_reform, reform in scenarios
+        ]
+    else:
+        workers = list(client.scheduler_info()["workers"])
+        num_groups = min(
+            len(scenarios), len(workers), max_concurrent or len(scenarios)
+        )
+        # each running reform takes a group of workers from the queue and
+        # returns it when done
+        groups = queue.Queue()
+        for group in split_workers(workers, num_groups):
+            groups.put(group)
+
+        def run(scenario):
+            group = groups.get()
+            try:
+                return run_scenario(*scenario, time_path, client, group, cache)
+            finally:
+                groups.put(group)
+
+        with ThreadPoolExecutor(max_workers=num_groups) as executor:
+            reform_manifests = list(executor.map(run, scenarios))
+    manifest = [base_manifest] + reform_manifests
+    _write_manifest(manifest, save_dir)
+    for entry in reform_manifests:
+        if entry["status"] != "complete":
+            print("Reform " + entry["name"] + " failed: " + entry["error"])
+
+    return manifest
+
+
+def get_baseline_specifications(p, output_dir):
+    """
+    Get the parameters of a baseline run.
+
+    Args:
+        p (OG-Core Specifications object): model parameters
+        output_dir (str): path to the output directory of the baseline
+
+    Returns:
+        p_base (OG-Core Specifications object): copy of p for a baseline
+            run saved to output_dir
+
+    """
+    p_base = copy.deepcopy(p)
+    p_base.baseline = True
+    p_base.baseline_dir = output_dir
+    p_base.output_base = output_dir
+
+    return p_base
+
+
+def get_reform_specifications(p_base, reform, output_dir):
+    """
+    Get the parameters of a reform run.
+
+    Args:
+        p_base (OG-Core Specifications object): baseline parameters, see
+            get_baseline_specifications
+        reform (dict): parameter updates of the reform
+        output_dir (str): path to the output directory of the reform
+
+    Returns:
+        p_reform (OG-Core Specifications object): copy of p_base with the
+            reform updates, for a reform run saved to output_dir
+
+    """
+    p_reform = copy.deepcopy(p_base)
+    p_reform.baseline = False
+    p_reform.output_base = output_dir
+    p_reform.update_specifications(reform)
+
+    return p_reform
+
+
+def split_workers(workers, num_groups):
+    """
+    Split the workers of a client into groups of nearly equal size.
+
+    Args:
+        workers (list): addresses of the workers
+        num_groups (int): number of groups
+
+    Returns:
+        groups (list): lists of worker addresses
+
+    """
+    groups = [list(group) for group in np.array_split(workers, num_groups)]
+
+    return groups
+
+
+def scenario_complete(output_dir, time_path=True):
+    """
+    Check whether the output of a scenario is on disk.
+
+    Args:
+        output_dir (str): path to the output directory of the scenario
+        time_path (bool): whether the time path output is required
+
+    Returns:
+        complete (bool): True if the SS, and TPI if time_path, output
+            files exist
+
+    """
+    files = [os.path.join("SS", "SS_vars.pkl")]
+    if time_path:
+        files.append(os.path.join("TPI", "TPI_vars.pkl"))
+    complete = all(
+        os.path.exists(os.path.join(output_dir, file)) for file in files
+    )
+
+    return complete
+
+
+def read_manifest(output_dir):
+    """
+    Read the manifest of a scenario or of a set of scenarios.
+
+    Args:
+        output_dir (str): path to the output directory of the scenario,
+            or to the save directory of run_scenarios
+
+    Returns:
+        manifest (dict or list): manifest of the scenario, or list of
+            manifests of all scenarios
+
+    """
+    with open(os.path.join(output_dir, MANIFEST_FILE), "r") as file:
+        return json.load(file)
+
+
+def run_scenario(
+    name,
+    p,
+    updates=None,
+    time_path=True,
+    client=None,
+    workers=None,
+    cache_dir=None,
+):
+    """
+    Run one scenario and write its manifest to p.output_base. Errors of
+    the model solution are recorded in the manifest, not raised.
+
+    Args:
+        name (str): name of the scenario
+        p (OG-Core Specifications object): model parameters
+        updates (dict): parameter updates of the scenario, recorded in
+            the manifest
+        time_path (bool): whether to solve for the time path equilibrium
+        client (Dask client object): client
+        workers (list): addresses of the workers of the client to run
+            on, all workers if None
+        cache_dir (str): path to the result cache of ogeth.result_cache,
+            the cache is not used if None
+
+    Returns:
+        manifest (dict): manifest of the scenario
+
+    """
+    started = datetime.datetime.now(datetime.timezone.utc)
+    tick = time.time()
+    manifest = {
+        "name": name,
+        "baseline": bool(p.baseline),
+        "output_dir": p.output_base,
+        "baseline_dir": p.baseline_dir,
+        "updates": {} if updates is None else updates,
+        "time_path": time_path,
+        "num_workers": None if workers is None else len(workers),
+        "started": started.isoformat(),
+        "status": "running",
+        "error": None,
+        "cached": False,
+    }
+    os.makedirs(p.output_base, exist_ok=True)
+    _write_manifest(manifest, p.output_base)
+    try:
+        if workers is None:
+            manifest["cached"] = _run(p, time_path, client, cache_dir)
+        else:
+            # restrict the tasks submitted from this thread to the group
+            with dask.annotate(workers=workers, allow_other_workers=False):
+                manifest["cached"] = _run(p, time_path, client, cache_dir)
+        manifest["status"] = "complete"
+    except Exception as e:
+        manifest["status"] = "failed"
+        manifest["error"] = repr(e)
+    manifest["finished"] = datetime.datetime.now(
+        datetime.timezone.utc
+    ).isoformat()
+    manifest["run_time"] = time.time() - tick
+    _write_manifest(manifest, p.output_base)
+
+    return manifest
+
+
+def _run(p, time_path, client, cache_dir):
+    if cache_dir is None:
+        runner(p, time_path=time_path, client=client)
+        return False
+    return result_cache.cached_runner(
+        p, time_path=time_path, client=client, cache_dir=cache_dir
+    )
+
+
+def _write_manifest(manifest, output_dir):
+    write_json(manifest, os.path.join(output_dir, MANIFEST_FILE))
@@ -0,0 +1,237 @@
+"""
+A local store of snapshots of the raw data series retrieved by
+macro_params.get_macro_params. Each snapshot is a directory of Parquet
+files, one per series, and a manifest.json file in the store records
+the retrieval date and source query of every series, so that
+calibrations can be reproduced from a snapshot without network access.
+
+Snapshots can be refreshed and inspected from the command line:
+
+    python -m ogeth.snapshots refresh
+    python -m ogeth.snapshots list
+    python -m ogeth.snapshots show latest
+"""
+
+# imports
+import os
+import json
+import argparse
+import datetime
+import hashlib
+import pandas as pd
+from ogeth.utils import CACHE_DIR, write_json
+
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, "macro_snapshots")
+MANIFEST_FILE = "manifest.json"
+
+
+def save_snapshot(data, queries, snapshot_dir=None):
+    """
+    Save raw data series as a new snapshot.
+
+    Args:
+        data (dict): maps series names to DataFrames
+        queries (dict): maps series names to dicts describing the source
+            query (e.g., URL and parameters) of each series
+        snapshot_dir (str): path to the snapshot store, defaults to
+            SNAPSHOT_DIR
+
+    Returns:
+        snapshot_id (str): id of the new snapshot
+
+    """
+    if snapshot_dir is None:
+        snapshot_dir = SNAPSHOT_DIR
+    retrieved = datetime.datetime.now(datetime.timezone.utc)
+    digest = hashlib.sha256()
+    for name in sorted(data.keys()):
+        digest.update(name.encode("utf-8"))
+        digest.update(
+            pd.util.hash_pandas_object(data[name], index=True).values
+        )
+    snapshot_id = (
+        retrieved.strftime("%Y%m%dT%H%M%S") + "-" + digest.hexdigest()[:8]
+    )
+    os.makedirs(os.path.join(snapshot_dir, snapshot_id), exist_ok=True)
+    series = {}
+    for name, df in data.items():
+        file = os.path.join(snapshot_id, name + ".parquet")
+        df.to_parquet(os.path.join(snapshot_dir, file))
+        series[name] = {
+            "file": file,
+            "query": queries.get(name, {}),
+            "retrieved": retrieved.isoformat(),
+        }
+    manifest = _read_manifest(snapshot_dir)
+    manifest.append(
+        {
+            "id": snapshot_id,
+            "created": retrieved.isoformat(),
+            "series": series,
+        }
+    )
+    _write_manifest(manifest, snapshot_dir)
+
+    return snapshot_id
+
+
+def load_snapshot(snapshot_id="latest", snapshot_dir=None):
+    """
+    Load the raw data series of a snapshot.
+
+    Args:
+        snapshot_id (str): id of the snapshot, or "latest" for the most
+            recent snapshot
+        snapshot_dir (str): path to the snapshot store, defaults to
+            SNAPSHOT_DIR
+
+    Returns:
+        data (dict): maps series names to DataFrames
+
+    """
+    if snapshot_dir is None:
+        snapshot_dir = SNAPSHOT_DIR
+    entry = get_snapshot_info(snapshot_id, snapshot_dir)
+    data = {
+        name: pd.read_parquet(os.path.join(snapshot_dir, info["file"]))
+        for name, info in entry["series"].items()
+    }
+
+    return data
+
+
+def get_snapshot_info(snapshot_id="latest", snapshot_dir=None):
+    """
+    Get the manifest entry of a snapshot.
+
+    Args:
+        snapshot_id (str): id of the snapshot, or "latest" for the most
+            recent snapshot
+        snapshot_dir (str): path to the snapshot store, defaults to
+            SNAPSHOT_DIR
+
+    Returns:
+        entry (dict): manifest entry with the id, creation date, and the
+            file, source query, and retrieval date of each series
+
+    """
+    manifest = list_snapshots(snapshot_dir)
+    if snapshot_id == "latest" and manifest:
+        return manifest[-1]
+    for entry in manifest:
+        if entry["id"] == snapshot_id:
+            return entry
+    raise KeyError("No snapshot with id " + str(snapshot_id))
+
+
+def list_snapshots(snapshot_dir=None):
+    """
+    List the snapshots in the store, oldest first.
+
+    Args:
+        snapshot_dir (str): path to the snapshot store, defaults to
+            SNAPSHOT_DIR
+
+    Returns:
+        manifest (list): manifest entries of all snapshots
+
+    """
+    if snapshot_dir is None:
+        snapshot_dir = SNAPSHOT_DIR
+
+    return _read_manifest(snapshot_dir)
+
+
+def refresh_snapshot(snapshot_dir=None, **kwargs):
+    """
+    Retrieve the macro data from the APIs and save them as a new
+    snapshot.
+
+    Args:
+        snapshot_dir (str): path to the snapshot store, defaults to
+            SNAPSHOT_DIR
+        kwargs: keyword arguments passed to
+            macro_params.get_macro_data
+
+    Returns:
+        snapshot_id (str): id of the new snapshot, None if no data
+            could be retrieved
+
+    """
+    from ogeth import macro_params
+
+    data, queries, status = macro_params.get_macro_data(**kwargs)
+    for name, source_status in status.items():
+        if not source_status["ok"]:
+            print(
+                "Failed to retrieve "
+                + name
+                + ": "
+                + str(source_status["error"])
+            )
+    if not data:
+        return None
+
+    return save_snapshot(data, queries, snapshot_dir)
+
+
+def _read_manifest(snapshot_dir):
+    path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def _write_manifest(manifest, snapshot_dir):
+    write_json(manifest, os.path.join(snapshot_dir, MANIFEST_FILE))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m ogeth.snapshots",
+        description="Manage snapshots of the OG-ETH macro data.",
+    )
+    parser.add_argument(
+        "--snapshot-dir",
+        default=SNAPSHOT_DIR,
+        help="path to the snapshot store",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    refresh = subparsers.add_parser(
+        "refresh", help="retrieve the data and save a new snapshot"
+    )
+    refresh.add_argument("--start-year", type=int, default=1947)
+    refresh.add_argument("--end-year", type=int, default=2024)
+    refresh.add_argument("--country", default="ETH")
+    subparsers.add_parser("list", help="list snapshots")
+    show = subparsers.add_parser("show", help="show a snapshot")
+    show.add_argument("snapshot_id", nargs="?", default="latest")
+    args = parser.parse_args(argv)
+
+    if args.command == "refresh":
+        snapshot_id = refresh_snapshot(
+            args.snapshot_dir,
+            data_start_date=datetime.datetime(args.start_year, 1, 1),
+            data_end_date=datetime.datetime(args.end_year, 12, 31),
+            country_iso=args.country,
+        )
+        if snapshot_id is None:
+            return 1
+        print(snapshot_id)
+    elif args.command == "list":
+        for entry in list_snapshots(args.snapshot_dir):
+            print(entry["id"], ", ".join(entry["series"].keys()))
+    else:
+        print(
+            json.dumps(
+                get_snapshot_info(args.snapshot_id, args.snapshot_dir),
+                indent=2,
+            )
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
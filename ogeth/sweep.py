@@ -0,0 +1,430 @@
+"""
+Runs sweeps of reforms over a grid or a Latin hypercube sample of
+parameter values, against a single baseline. The reforms are run at the
+same time on a shared Dask client, with at most max_concurrent reforms
+in flight, and the percentage change of the macro aggregates of each
+reform from the baseline is written to a Parquet file as soon as the
+reform finishes. A sweep that stopped part way is resumed by running
+run_sweep again with the same save_dir, which only runs the reforms
+without results.
+"""
+
+# imports
+import os
+import copy
+import datetime
+import json
+import queue
+import itertools
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from scipy.stats import qmc
+from ogcore import output_tables as ot
+from ogcore.utils import safe_read_pickle
+from ogeth import scenarios, result_cache
+from ogeth.utils import to_json, write_json
+
+SWEEP_FILE = "sweep.json"
+RESULTS_DIR = "results"
+VAR_LIST = ["Y", "C", "K", "L", "r", "w"]
+
+
+def grid_scenarios(grid):
+    """
+    Get the points of a full grid of parameter values.
+
+    Args:
+        grid (dict): maps parameter names to lists of values
+
+    Returns:
+        points (list): dicts of parameter values, one per grid point
+
+    """
+    names = list(grid.keys())
+    points = [
+        dict(zip(names, values))
+        for values in itertools.product(*[grid[name] for name in names])
+    ]
+
+    return points
+
+
+def latin_hypercube_scenarios(bounds, n, seed=None):
+    """
+    Get a Latin hypercube sample of parameter values.
+
+    Args:
+        bounds (dict): maps parameter names to (low, high) tuples
+        n (int): number of points
+        seed (int): seed of the sample
+
+    Returns:
+        points (list): dicts of parameter values, one per point
+
+    """
+    names = list(bounds.keys())
+    sample = qmc.LatinHypercube(d=len(names), seed=seed).random(n)
+    sample = qmc.scale(
+        sample,
+        [bounds[name][0] for name in names],
+        [bounds[name][1] for name in names],
+    )
+    points = [
+        {name: float(value) for name, value in zip(names, row)}
+        for row in sample
+    ]
+
+    return points
+
+
+def get_reform(p, point):
+    """
+    Get the parameter updates of a sweep point. Scalar values are
+    wrapped in lists to match the dimensions of the parameter in p, e.g.,
+    0.25 for cit_rate becomes [[0.25]].
+
+    Args:
+        p (OG-Core Specifications object): model parameters
+        point (dict): maps parameter names to values
+
+    Returns:
+        reform (dict): parameter updates for p.update_specifications
+
+    """
+    reform = {}
+    for name, value in point.items():
+        if np.ndim(value) == 0:
+            for _ in range(np.ndim(getattr(p, name))):
+                value = [value]
+        reform[name] = value
+
+    return reform
+
+
+def run_sweep(
+    p,
+    points,
+    save_dir,
+    client=None,
+    calibration=None,
+    time_path=True,
+    max_concurrent=None,
+    var_list=VAR_LIST,
+    num_years=10,
+    keep_output=True,
+    use_cache=False,
+    cache_dir=None,
+):
+    """
+    Run the baseline, if its output is not in save_dir, and a reform for
+    each sweep point without results in save_dir.
+
+    Args:
+        p (OG-Core Specifications object): baseline model parameters
+        points (list): dicts of parameter values of each reform, see
+            grid_scenarios and latin_hypercube_scenarios
+        save_dir (str): path to the directory of the sweep, a
+            ValueError is raised if it has the results of a sweep with
+            other points, options, or baseline parameters
+        client (Dask client object): client shared by the reforms, if
+            None the reforms are run one after another
+        calibration (Calibration): calibration applied to p once for the
+            baseline and all reforms
+        time_path (bool): whether to solve for the time path equilibrium
+        max_concurrent (int): maximum number of reforms run at the same
+            time, defaults to the number of workers of the client
+        var_list (list): macro aggregates in the results
+        num_years (int): number of years of the time path in the results
+        keep_output (bool): if False, the output directory of each
+            reform is removed once its results are written
+        use_cache (bool): if True, reuse the solutions in the result
+            cache of ogeth.result_cache and add new solutions to it
+        cache_dir (str): path to the result cache, defaults to
+            result_cache.RESULT_CACHE_DIR
+
+    Returns:
+        results (DataFrame): results of all reforms, see load_results
+
+    """
+    cache = (cache_dir or result_cache.RESULT_CACHE_DIR) if use_cache else None
+    p = copy.deepcopy(p)
+    if calibration is not None:
+        p.update_specifications(calibration.get_dict())
+    base_dir = os.path.join(save_dir, scenarios.BASELINE_DIR)
+    p_base = scenarios.get_baseline_specifications(p, base_dir)
+    # the baseline parameters are part of the sweep, so that results for
+    # another baseline are never reused
+    _check_sweep(
+        save_dir,
+        {
+            "points": points,
+            "time_path": time_path,
+            "var_list": var_list,
+            "num_years": num_years,
+            "baseline": result_cache.get_result_key(p_base, time_path),
+        },
+    )
+
+    # baseline
+    if not scenarios.scenario_complete(base_dir, time_path):
+        manifest = scenarios.run_scenario(
+            "baseline", p_base, {}, time_path, client, None, cache
+        )
+        if manifest["status"] != "complete":
+            raise RuntimeError("Baseline failed: " + str(manifest["error"]))
+    baseline = _read_output(base_dir, time_path)
+
+    # reforms, submitted as workers become free so that at most
+    # num_groups reforms are queued or running
+    results_dir = os.path.join(save_dir, RESULTS_DIR)
+    os.makedirs(results_dir, exist_ok=True)
+    pending = [
+        i
+        for i in range(len(points))
+        if not os.path.exists(_results_path(results_dir, i))
+    ]
+    print(
+        str(len(points) - len(pending))
+        + " of "
+        + str(len(points))
+        + " sweep points already have results"
+    )
+    if client is None:
+        groups = [None]
+    else:
+        workers = list(client.scheduler_info()["workers"])
+        num_groups = min(len(workers), max_concurrent or len(workers))
+        groups = scenarios.split_workers(workers, num_groups)
+    free_groups = queue.Queue()
+    for group in groups:
+        free_groups.put(group)
+
+    def run(i, p_reform, reform):
+        group = free_groups.get()
+        try:
+            return scenarios.run_scenario(
+                _scenario_id(i),
+                p_reform,
+                reform,
+                time_path,
+                client,
+                group,
+                cache,
+            )
+        finally:
+            free_groups.put(group)
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+        running = {}
+        while pending or running:
+            while pending and len(running) < len(groups):
+                i = pending.pop(0)
+                reform_dir = os.path.join(
+                    save_dir, scenarios.REFORM_DIR + "_" + _scenario_id(i)
+                )
+                try:
+                    reform = get_reform(p_base, points[i])
+                    p_reform = scenarios.get_reform_specifications(
+                        p_base, reform, reform_dir
+                    )
+                except Exception as e:
+                    # invalid parameter values fail only their point
+                    _write_failed_manifest(i, points[i], e, reform_dir)
+                    print("Sweep point " + str(i) + " failed: " + repr(e))
+                    failed.append(i)
+                    continue
+                running[executor.submit(run, i, p_reform, reform)] = i
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                manifest = future.result()
+                if manifest["status"] != "complete":
+                    print(
+                        "Sweep point "
+                        + str(i)
+                        + " failed: "
+                        + str(manifest["error"])
+                    )
+                    failed.append(i)
+                    continue
+                reform_output = _read_output(manifest["output_dir"], time_path)
+                _write_results(
+                    get_pct_diff(
+                        baseline,
+                        reform_output,
+                        time_path,
+                        var_list,
+                        num_years,
+                    ),
+                    points[i],
+                    i,
+                    results_dir,
+                )
+                if not keep_output:
+                    _remove_output(manifest["output_dir"])
+    if failed:
+        print("Failed sweep points, rerun to retry: " + str(failed))
+
+    return load_results(save_dir)
+
+
+def get_pct_diff(
+    baseline, reform, time_path=True, var_list=VAR_LIST, num_years=10
+):
+    """
+    Get the percentage changes of macro aggregates from the baseline to
+    a reform, in the long format.
+
+    Args:
+        baseline (dict): baseline output, with keys "params", "ss", and
+            "tpi" if time_path
+        reform (dict): reform output, with the same keys
+        time_path (bool): whether the time path output is used
+        var_list (list): macro aggregates
+        num_years (int): number of years of the time path
+
+    Returns:
+        pct_diff (DataFrame): columns variable, year (the years, the
+            budget window, and "SS"), and pct_diff
+
+    """
+    if time_path:
+        table = ot.macro_table(
+            baseline["tpi"],
+            baseline["params"],
+            reform_tpi=reform["tpi"],
+            reform_params=reform["params"],
+            var_list=var_list,
+            output_type="pct_diff",
+            num_years=num_years,
+            start_year=int(baseline["params"].start_year),
+        )
+        pct_diff = table.melt(
+            id_vars="Variable", var_name="year", value_name="pct_diff"
+        )
+    else:
+        table = ot.macro_table_SS(baseline["ss"], reform["ss"], var_list)
+        pct_diff = pd.DataFrame(
+            {
+                "Variable": table.index,
+                "year": "SS",
+                "pct_diff": table["% Change (or pp diff)"].values,
+            }
+        )
+    pct_diff = pct_diff.rename(columns={"Variable": "variable"})
+    pct_diff["year"] = pct_diff["year"].astype(str)
+    pct_diff["pct_diff"] = pct_diff["pct_diff"].astype(float)
+
+    return pct_diff
+
+
+def load_results(save_dir):
+    """
+    Load the results of a sweep.
+
+    Args:
+        save_dir (str): path to the directory of the sweep
+
+    Returns:
+        results (DataFrame): one row per sweep point, macro aggregate,
+            and year, with columns scenario (the index of the point), the
+            parameters of the sweep, variable, year, and pct_diff
+
+    """
+    results_dir = os.path.join(save_dir, RESULTS_DIR)
+    files = sorted(
+        f for f in os.listdir(results_dir) if f.endswith(".parquet")
+    )
+    if not files:
+        return pd.DataFrame(
+            columns=["scenario", "variable", "year", "pct_diff"]
+        )
+    results = pd.concat(
+        [pd.read_parquet(os.path.join(results_dir, f)) for f in files],
+        ignore_index=True,
+    )
+
+    return results
+
+
+def _scenario_id(i):
+    return "{:05d}".format(i)
+
+
+def _results_path(results_dir, i):
+    return os.path.join(results_dir, _scenario_id(i) + ".parquet")
+
+
+def _check_sweep(save_dir, spec):
+    os.makedirs(save_dir, exist_ok=True)
+    path = os.path.join(save_dir, SWEEP_FILE)
+    spec = json.loads(json.dumps(spec, default=to_json))
+    if os.path.exists(path):
+        with open(path, "r") as file:
+            if json.load(file) != spec:
+                raise ValueError(
+                    save_dir + " has the results of a different sweep"
+                )
+        return
+    write_json(spec, path)
+
+
+def _read_output(output_dir, time_path):
+    output = {
+        "params": safe_read_pickle(
+            os.path.join(output_dir, "model_params.pkl")
+        ),
+        "ss": safe_read_pickle(os.path.join(output_dir, "SS", "SS_vars.pkl")),
+    }
+    if time_path:
+        output["tpi"] = safe_read_pickle(
+            os.path.join(output_dir, "TPI", "TPI_vars.pkl")
+        )
+
+    return output
+
+
+def _write_results(pct_diff, point, i, results_dir):
+    results = pct_diff.copy()
+    results.insert(0, "scenario", i)
+    for k, (name, value) in enumerate(point.items()):
+        if np.ndim(value) > 0:
+            value = json.dumps(value, default=to_json)
+        results.insert(k + 1, name, value)
+    path = _results_path(results_dir, i)
+    # write to a temporary file first, so that a partial file is never
+    # read as results
+    results.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+
+
+def _write_failed_manifest(i, point, error, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    write_json(
+        {
+            "name": _scenario_id(i),
+            "baseline": False,
+            "output_dir": output_dir,
+            "updates": point,
+            "started": now,
+            "status": "failed",
+            "error": repr(error),
+            "cached": False,
+            "finished": now,
+        },
+        os.path.join(output_dir, scenarios.MANIFEST_FILE),
+    )
+
+
+def _remove_output(output_dir):
+    for file in [
+        os.path.join("SS", "SS_vars.pkl"),
+        os.path.join("TPI", "TPI_vars.pkl"),
+        "model_params.pkl",
+    ]:
+        path = os.path.join(output_dir, file)
+        if os.path.lexists(path):
+            os.remove(path)
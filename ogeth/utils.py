@@ -1,8 +1,22 @@
+import os
+import time
+import glob
+import json
+import hashlib
+import threading
+import numpy as np
 import requests
 import urllib3
 import ssl
 import socket
 
+# Directory for on-disk caches of downloaded and derived data. Can be
+# overridden with the OGETH_CACHE_DIR environment variable.
+CACHE_DIR = os.environ.get(
+    "OGETH_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "ogeth"),
+)
+
 
 class CustomHttpAdapter(requests.adapters.HTTPAdapter):
     """
@@ -24,11 +38,18 @@ class CustomHttpAdapter(requests.adapters.HTTPAdapter):
         )
 
 
-def get_legacy_session():
+def get_legacy_session(pool_maxsize=10):
     ctx = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
     ctx.options |= 0x4  # OP_LEGACY_SERVER_CONNECT  #in Python 3.12 you will be able to switch from 0x4 to ssl.OP_LEGACY_SERVER_CONNECT.
     session = requests.session()
-    session.mount("https://", CustomHttpAdapter(ctx))
+    # pool_maxsize sets the number of connections kept open per host, so
+    # that a session shared between threads reuses its connections
+    session.mount(
+        "https://",
+        CustomHttpAdapter(
+            ctx, pool_connections=pool_maxsize, pool_maxsize=pool_maxsize
+        ),
+    )
     return session
 
 
@@ -42,3 +63,108 @@ def is_connected():
     except OSError:
         pass
     return False
+
+
+def hash_bytes(data):
+    """
+    Compute the SHA-256 hex digest of a bytes object. Used to build
+    content-addressed cache keys.
+
+    Args:
+        data (bytes): content to hash
+
+    Returns:
+        digest (str): hex digest of data
+
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def to_json(obj):
+    """
+    Convert objects that the json module can't serialize, for use as the
+    default argument of json.dump. Numpy arrays and scalars become lists
+    and Python scalars, anything else its string.
+
+    Args:
+        obj (object): object to convert
+
+    Returns:
+        value (list, scalar, or str): JSON serializable value of obj
+
+    """
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    return str(obj)
+
+
+def write_json(obj, path, indent=2):
+    """
+    Write an object to a JSON file. The file is written to a temporary
+    file first and then moved to path, so that other threads and
+    processes never read a partially written file.
+
+    Args:
+        obj (object): object to write, with values converted by to_json
+        path (str): path to the JSON file
+        indent (int): indentation of the file, None for a single line
+
+    Returns:
+        None
+
+    """
+    tmp_path = (
+        path + ".tmp" + str(os.getpid()) + "-" + str(threading.get_ident())
+    )
+    with open(tmp_path, "w") as file:
+        json.dump(obj, file, indent=indent, default=to_json)
+    os.replace(tmp_path, path)
+
+
+def evict_cache(cache_dir, max_bytes=None, ttl=None, keep=(), pattern="*"):
+    """
+    Remove files from an on-disk cache directory. Files last modified
+    more than ttl seconds ago are removed first, then the least recently
+    modified files are removed until the directory is within max_bytes.
+
+    Args:
+        cache_dir (str): path to cache directory
+        max_bytes (int): maximum total size of cached files, no size
+            limit if None
+        ttl (float): maximum age of cached files in seconds, no age
+            limit if None
+        keep (list): paths of files that are never evicted
+        pattern (str): glob pattern of files in cache_dir to consider
+
+    Returns:
+        removed (list): paths of files that were removed
+
+    """
+    keep = {os.path.abspath(k) for k in keep}
+    entries = []
+    for path in glob.glob(os.path.join(cache_dir, pattern)):
+        if os.path.isfile(path) and os.path.abspath(path) not in keep:
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+    # oldest first
+    entries.sort()
+    removed = []
+    now = time.time()
+    if ttl is not None:
+        for mtime, size, path in list(entries):
+            if now - mtime > ttl:
+                os.remove(path)
+                removed.append(path)
+                entries.remove((mtime, size, path))
+    if max_bytes is not None:
+        total = sum(
+            os.path.getsize(k) for k in keep if os.path.isfile(k)
+        ) + sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if total <= max_bytes:
+                break
+            os.remove(path)
+            removed.append(path)
+            total -= size
+
+    return removed
@@ -21,7 +21,7 @@ setuptools.setup(
     package_data={
         "ogeth": [
             "ogeth_default_parameters.json",
-            "data/*",
+            "data/*.csv",
         ]
     },
     include_packages=True,
@@ -31,12 +31,12 @@ setuptools.setup(
         "psutil",
         "scipy>=1.7.1",
         "pandas>=1.2.5",
+        "pyarrow",
         "matplotlib",
         "dask>=2.30.0",
         "distributed>=2.30.1",
         "paramtools>=0.20.0",
         "requests",
-        "pandas-datareader",
         "xlwt",
         "openpyxl>=3.1.2",
         "statsmodels",
@@ -0,0 +1,139 @@
+"""
+Fixtures shared by the tests
+"""
+
+import os
+import time
+import pickle
+import threading
+import pytest
+import numpy as np
+import pandas as pd
+import cloudpickle
+from ogeth import scenarios, result_cache
+
+AGE_GROUPS = (
+    ["00-04", "05-09", "10-14", "14-Oct", "9-May"]
+    + [f"{a}-{a + 4}" for a in range(15, 75, 5)]
+    + ["75+"]
+)
+
+
+@pytest.fixture(scope="session")
+def qlfs_dir(tmp_path_factory):
+    """
+    Synthetic Quarterly Labour Force Survey files, with the variables
+    used by labor.py and some others
+    """
+    data_dir = tmp_path_factory.mktemp("qlfs")
+    rng = np.random.default_rng(2023)
+    for q in range(1, 5):
+        n = 3000
+        hours = rng.integers(0, 80, n).astype(str).astype(object)
+        prefix = rng.random(n) < 0.3
+        hours[prefix] = "Hours " + hours[prefix]
+        hours[rng.random(n) < 0.05] = np.nan
+        hours[rng.random(n) < 0.02] = "Don't know"
+        df = pd.DataFrame(
+            {
+                "Q14AGE": rng.integers(0, 90, n),
+                "age_grp1": rng.choice(AGE_GROUPS, n),
+                "Q418HRSWRK": hours,
+                "Hrswrk": rng.integers(0, 80, n),
+                "Weight": rng.uniform(50, 500, n).round(3),
+                "Region": rng.choice(["Addis Ababa", "Tigray", "Afar"], n),
+            }
+        )
+        df.to_csv(
+            os.path.join(data_dir, f"qlfs-2023-q{q}-worker-v1.csv"),
+            index=False,
+            encoding="latin-1",
+        )
+
+    return str(data_dir)
+
+
+def where(x):
+    from distributed import get_worker
+
+    time.sleep(0.05)
+    return get_worker().address
+
+
+class FakeRunner:
+    """
+    Stand-in for ogcore.execute.runner. The J household problems are
+    submitted to the client, and the output files are written with the
+    macro aggregates in VAR_LIST equal to 1 + cit_rate + tau_c. A
+    cit_rate of 0.99 fails the first time it is run.
+    """
+
+    VAR_LIST = ["Y", "C"]
+
+    def __init__(self):
+        # (baseline, output_base, workers) of each successful run
+        self.calls = []
+        self.failed = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, p, time_path=True, client=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            workers = set()
+            if client is not None:
+                futures = [
+                    client.submit(where, j, pure=False) for j in range(p.J)
+                ]
+                workers = set(client.gather(futures))
+            time.sleep(0.2)
+            if not p.baseline:
+                # as ogcore.SS.run_SS does for reforms
+                p.SS_theta = np.ones(p.J)
+            with self.lock:
+                fail = p.output_base not in self.failed
+                if p.cit_rate[0, 0] == 0.99 and fail:
+                    self.failed.append(p.output_base)
+                    raise RuntimeError("Steady state equilibrium not found")
+            self.write_output(p, time_path)
+            with self.lock:
+                self.calls.append((p.baseline, p.output_base, workers))
+        finally:
+            with self.lock:
+                self.running -= 1
+
+    def write_output(self, p, time_path):
+        value = 1 + p.cit_rate[0, 0] + p.tau_c[0, 0]
+        output = {
+            result_cache.SS_FILE: {v: value for v in self.VAR_LIST},
+            result_cache.TPI_FILE: {
+                v: np.full(p.T, value) for v in self.VAR_LIST
+            },
+        }
+        if not time_path:
+            del output[result_cache.TPI_FILE]
+        for file, output_vars in output.items():
+            path = os.path.join(p.output_base, file)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                pickle.dump(output_vars, f)
+        with open(
+            os.path.join(p.output_base, result_cache.PARAMS_FILE), "wb"
+        ) as f:
+            cloudpickle.dump(p, f)
+
+
+@pytest.fixture
+def fake_runner(monkeypatch):
+    """
+    FakeRunner in place of ogcore.execute.runner in the scenario runner
+    and the result cache
+    """
+    runner = FakeRunner()
+    monkeypatch.setattr(scenarios, "runner", runner)
+    monkeypatch.setattr(result_cache, "runner", runner)
+
+    return runner
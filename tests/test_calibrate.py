@@ -0,0 +1,206 @@
+"""
+Tests of calibrate.py module
+"""
+
+import os
+import numpy as np
+import pytest
+from ogcore.parameters import Specifications
+from ogeth import calibrate
+
+
+@pytest.fixture
+def fake_components(monkeypatch):
+    """
+    Stand-ins for the population builds, which need the UN data, and the
+    earnings profiles, which need the OG-USA baseline, with the model
+    dimensions of each call
+    """
+    calls = {"demographics": [], "demog80": [], "e": []}
+
+    def get_pop_objs_concurrent(dims, T, start_year):
+        calls["demographics"].append((list(dims), start_year))
+        return [
+            {"omega_SS": np.full(S, 1 / S), "g_n_ss": 0.02} for E, S in dims
+        ]
+
+    def get_pop_objs(E, S, T, start_year):
+        calls["demog80"].append(start_year)
+        return {"omega_SS": np.full(S, 1 / S), "g_n_ss": 0.02}
+
+    def get_e_interp(E, S, J, lambdas, age_wgts, gini_to_match, plot_path):
+        calls["e"].append(J)
+        assert age_wgts.shape == (80,)
+        return np.full((S, J), gini_to_match)
+
+    monkeypatch.setattr(
+        calibrate.demographics,
+        "get_pop_objs_concurrent",
+        get_pop_objs_concurrent,
+    )
+    monkeypatch.setattr(calibrate.demographics, "get_pop_objs", get_pop_objs)
+    monkeypatch.setattr(calibrate.income, "get_e_interp", get_e_interp)
+    return calls
+
+
+def test_calibration_cache(fake_components, tmp_path, capsys):
+    p = Specifications()
+    kwargs = {"update_from_api": False, "cache_dir": str(tmp_path)}
+    c = calibrate.Calibration(p, **kwargs)
+    d = c.get_dict()
+    assert set(c.recomputed) == set(calibrate.COMPONENTS)
+    # both population builds run at once, the build for 80 period lives
+    # is then memoized by ogeth.demographics
+    assert fake_components["demographics"][0] == (
+        [(p.E, p.S), (20, 80)],
+        p.start_year,
+    )
+    cached = calibrate.Calibration(p, **kwargs)
+    cached_d = cached.get_dict()
+    assert cached.recomputed == []
+    assert len(fake_components["e"]) == 1
+    assert d.keys() == cached_d.keys()
+    for key, value in d.items():
+        assert np.array_equal(value, cached_d[key])
+    c = calibrate.Calibration(p, gini_to_match=35.0, **kwargs)
+    assert np.all(c.e == 35.0)
+    assert c.recomputed == ["e"]
+    c = calibrate.Calibration(p, refresh=["macro"], **kwargs)
+    c.get_dict()
+    assert c.recomputed == ["macro"]
+    c = calibrate.Calibration(p, refresh=True, **kwargs)
+    c.get_dict()
+    assert set(c.recomputed) == set(calibrate.COMPONENTS)
+    c = calibrate.Calibration(p, output_path=str(tmp_path / "out"), **kwargs)
+    c.get_dict()
+    assert c.recomputed == ["e"]
+    c = calibrate.Calibration(p, use_cache=False, **kwargs)
+    c.get_dict()
+    assert set(c.recomputed) == set(calibrate.COMPONENTS)
+
+
+def test_calibration_lazy(fake_components, tmp_path):
+    p = Specifications()
+    c = calibrate.Calibration(
+        p, update_from_api=False, use_cache=False, cache_dir=str(tmp_path)
+    )
+    assert c.recomputed == []
+    # only the components that are accessed are computed
+    c.e
+    assert c.recomputed == ["demog80", "e"]
+    c.get_dict()
+    assert sorted(c.recomputed) == sorted(calibrate.COMPONENTS)
+    assert fake_components["demographics"][-1] == ([(p.E, p.S)], p.start_year)
+    # only the components whose inputs changed are recomputed
+    p.update_specifications({"lambdas": [0.3, 0.2, 0.2, 0.1, 0.1, 0.09, 0.01]})
+    assert c.recalibrate(p) == ["e"]
+    c.get_dict()
+    assert c.recomputed == ["e"]
+    p.update_specifications({"start_year": p.start_year + 1})
+    assert c.recalibrate(p) == ["demographics", "demog80", "e"]
+    assert c.recalibrate(gini_to_match=40.0) == ["e"]
+    assert c.recalibrate() == []
+    assert c.recalibrate(refresh=["io_matrix"]) == ["io_matrix"]
+    c.get_dict()
+    assert c.recomputed == ["demographics", "demog80", "e", "io_matrix"]
+    assert fake_components["demographics"][-1] == (
+        [(p.E, p.S), (20, 80)],
+        p.start_year,
+    )
+
+
+def test_calibration_cache_failed_source(
+    fake_components, monkeypatch, tmp_path
+):
+    def get_macro_params(*args, **kwargs):
+        return {}, {"wb": {"ok": False, "error": "timeout"}}
+
+    monkeypatch.setattr(
+        calibrate.macro_params, "get_macro_params", get_macro_params
+    )
+    p = Specifications()
+    for _ in range(2):
+        c = calibrate.Calibration(p, cache_dir=str(tmp_path))
+        c.get_dict()
+    assert c.recomputed == ["macro"]
+
+
+def test_calibration_cache_api_ttl(fake_components, monkeypatch, tmp_path):
+    calls = []
+
+    def get_macro_params(*args, **kwargs):
+        calls.append(kwargs["update_from_api"])
+        return {"g_y": 0.03}, {"wb": {"ok": True, "error": None}}
+
+    monkeypatch.setattr(
+        calibrate.macro_params, "get_macro_params", get_macro_params
+    )
+    p = Specifications()
+    # the start of a period of MACRO_CACHE_TTL seconds
+    now = calibrate.time.time() // calibrate.MACRO_CACHE_TTL
+    now = now * calibrate.MACRO_CACHE_TTL
+    for days in [0, 1, 31]:
+        monkeypatch.setattr(
+            calibrate.time, "time", lambda: now + days * 24 * 60 * 60
+        )
+        c = calibrate.Calibration(p, cache_dir=str(tmp_path))
+        assert c.macro_params == {"g_y": 0.03}
+    # the API data is pulled again once the cached pull is too old
+    assert calls == [True, True]
+
+
+def test_calibration_demographic_data_path(
+    fake_components, monkeypatch, tmp_path
+):
+    calls = []
+
+    def save_un_rates(E, S, start_year, download_path):
+        calls.append(start_year)
+        for file in calibrate.demographics.UN_RATES_FILES.values():
+            open(os.path.join(download_path, file), "w").close()
+
+    monkeypatch.setattr(calibrate.demographics, "save_un_rates", save_un_rates)
+    p = Specifications()
+    kwargs = {
+        "update_from_api": False,
+        "cache_dir": str(tmp_path / "cache"),
+        "demographic_data_path": str(tmp_path),
+    }
+    c = calibrate.Calibration(p, **kwargs)
+    c.get_dict()
+    assert calls == [p.start_year]
+    # the UN data is not pulled again for cached demographics
+    c = calibrate.Calibration(p, **kwargs)
+    c.get_dict()
+    assert c.recomputed == []
+    assert len(calls) == 1
+    # unless the files are missing
+    os.remove(tmp_path / "fert_rates.csv")
+    c = calibrate.Calibration(p, **kwargs)
+    c.get_dict()
+    assert c.recomputed == ["demographics"]
+    assert len(calls) == 2
+
+
+def test_calibration_cache_data_ttl(fake_components, monkeypatch, tmp_path):
+    p = Specifications()
+    # the start of a period of DATA_CACHE_TTL seconds
+    now = calibrate.time.time() // calibrate.DATA_CACHE_TTL
+    now = now * calibrate.DATA_CACHE_TTL
+    recomputed = []
+    for days in [0, 1, 31]:
+        monkeypatch.setattr(
+            calibrate.time, "time", lambda: now + days * 24 * 60 * 60
+        )
+        c = calibrate.Calibration(
+            p, update_from_api=False, cache_dir=str(tmp_path)
+        )
+        c.get_dict()
+        recomputed.append(sorted(c.recomputed))
+    # the UN data and OG-USA baseline are pulled again once they are too
+    # old
+    assert recomputed == [
+        sorted(calibrate.COMPONENTS),
+        [],
+        ["demog80", "demographics", "e"],
+    ]
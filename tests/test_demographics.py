@@ -0,0 +1,91 @@
+"""
+Tests of demographics.py module
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+from ogcore import demographics as ogcore_demographics
+from ogeth import demographics
+
+START_YEAR = 2022
+
+
+def fake_un_data(
+    variable_code, country_id="231", start_year=2021, end_year=2023
+):
+    """
+    Synthetic UN data in the format returned by
+    ogcore.demographics.get_un_data
+    """
+    rng = np.random.default_rng(int(variable_code))
+    frames = []
+    for y in range(2015, 2030):
+        if variable_code == "68":
+            ages = np.arange(15, 50)
+            value = 100 * np.exp(-(((ages - 28) / 8) ** 2))
+        elif variable_code == "80":
+            ages = np.arange(0, 100)
+            value = np.minimum(0.0005 * np.exp(0.08 * ages), 0.9)
+            value[0] = 0.04
+        else:
+            ages = np.arange(0, 100)
+            value = 2000 * np.exp(-0.03 * ages) * (1 + 0.02 * (y - 2015))
+        value = value * (1 + 0.01 * rng.random(ages.shape))
+        frames.append(pd.DataFrame({"year": y, "age": ages, "value": value}))
+    df = pd.concat(frames)
+
+    return df[(df.year >= start_year) & (df.year <= end_year)]
+
+
+@pytest.fixture
+def un_calls(monkeypatch):
+    calls = []
+
+    def get_un_data(variable_code, **kwargs):
+        calls.append(variable_code)
+        return fake_un_data(variable_code, **kwargs)
+
+    monkeypatch.setattr(ogcore_demographics, "get_un_data", get_un_data)
+    demographics.get_un_series.cache_clear()
+    demographics._get_pop_objs.cache_clear()
+    yield calls
+    demographics.get_un_series.cache_clear()
+    demographics._get_pop_objs.cache_clear()
+
+
+@pytest.mark.parametrize("E,S", [(20, 80), (10, 40)], ids=["S=80", "S=40"])
+def test_get_pop_objs(un_calls, E, S):
+    pop_dict = demographics.get_pop_objs(E, S, 160, START_YEAR)
+    expected = ogcore_demographics.get_pop_objs(
+        E,
+        S,
+        160,
+        0,
+        99,
+        country_id="231",
+        initial_data_year=START_YEAR - 1,
+        final_data_year=START_YEAR + 1,
+        GraphDiag=False,
+    )
+    assert pop_dict.keys() == expected.keys()
+    for k, v in expected.items():
+        assert np.allclose(pop_dict[k], v)
+
+
+def test_get_pop_objs_concurrent(un_calls):
+    pop_dicts = demographics.get_pop_objs_concurrent(
+        [(20, 80), (20, 80), (10, 40)], 160, START_YEAR
+    )
+    # each UN series is only retrieved once
+    assert sorted(un_calls) == ["47", "68", "80"]
+    assert np.array_equal(pop_dicts[0]["omega_SS"], pop_dicts[1]["omega_SS"])
+    assert pop_dicts[2]["omega_SS"].shape == (40,)
+    # results are memoized
+    demographics.get_pop_objs(10, 40, 160, START_YEAR)
+    assert demographics._get_pop_objs.cache_info().hits == 1
+    # callers get copies, so editing them does not change the memo
+    omega_SS = pop_dicts[2]["omega_SS"].copy()
+    pop_dicts[2]["omega_SS"][:] = 0
+    pop_dict = demographics.get_pop_objs(10, 40, 160, START_YEAR)
+    assert np.array_equal(pop_dict["omega_SS"], omega_SS)
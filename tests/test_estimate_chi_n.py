@@ -0,0 +1,147 @@
+"""
+Tests of estimate_chi_n.py module
+"""
+
+import numpy as np
+import pytest
+from ogcore.parameters import Specifications
+from ogeth import estimate_chi_n as est
+from ogeth import labor
+
+
+def fake_model_moments(p, chi_n):
+    """
+    Stand-in for the steady state solve, with labor supply decreasing in
+    chi_n
+    """
+    return 0.6 / (1 + chi_n)
+
+
+@pytest.fixture
+def fake_solver(monkeypatch):
+    calls = []
+
+    def solve_model_moments(p, chi_n, guess=None):
+        calls.append(chi_n)
+        nfev = 10 if guess is None else 4
+        return fake_model_moments(p, chi_n), {"r": chi_n.mean()}, nfev
+
+    monkeypatch.setattr(est, "solve_model_moments", solve_model_moments)
+    return calls
+
+
+def test_get_chi_n_basis():
+    basis = est.get_chi_n_basis(80, 4)
+    assert basis.shape == (80, 4)
+    assert np.allclose(basis[:, 0], 1)
+    assert np.allclose(basis[[0, -1], 1], [-1, 1])
+
+
+def test_get_model_moments(fake_solver):
+    distributed = pytest.importorskip("distributed")
+    p = Specifications()
+    chi_ns = [np.full(p.S, c) for c in [1.0, 2.0, 3.0]]
+    serial = est.get_model_moments(chi_ns, p)
+    with distributed.Client(
+        n_workers=2, threads_per_worker=1, processes=False
+    ) as client:
+        parallel = est.get_model_moments(chi_ns, p, client)
+    for s, m, chi_n in zip(serial, parallel, chi_ns):
+        assert np.array_equal(s, m)
+        assert np.allclose(m, fake_model_moments(p, chi_n))
+
+
+def test_ss_cache(fake_solver):
+    p = Specifications()
+    ss_cache = est.SSCache()
+    assert ss_cache.nearest(np.ones(p.S)) is None
+    est.get_model_moments(
+        [np.full(p.S, 1.0), np.full(p.S, 3.0)], p, ss_cache=ss_cache
+    )
+    # seeded from the solution for the nearest chi_n in logs
+    guess = ss_cache.nearest(np.full(p.S, 1.9))
+    assert guess == {"r": 3.0}
+    est.get_model_moments([np.full(p.S, 1.9)], p, ss_cache=ss_cache)
+    summary = ss_cache.summary()
+    assert summary["solves"] == 3
+    assert summary["warm_solves"] == 1
+    assert summary["nfev"] == 24
+    assert summary["nfev_saved"] == 6
+    # warm starts are dropped once they stop saving evaluations
+    ss_cache.add(np.full(p.S, 2.0), None, 20, warm=True)
+    assert ss_cache.nearest(np.full(p.S, 1.9)) is None
+
+
+def test_solve_model_moments_hooks(monkeypatch):
+    p = Specifications()
+    hooked = []
+
+    def run_SS(p, client=None):
+        # the SS functions are wrapped only during the solve
+        hooked.append(est.SS.SS_fsolve is est._counting_SS_fsolve)
+        est.SS.SS_fsolve()
+        if p.chi_n[0, 0] > 10:
+            raise RuntimeError("Steady state equilibrium not found")
+        output = {key: 1.0 for key in est.SS_GUESS_KEYS}
+        output["n"] = np.full((p.S, p.J), 0.4)
+        output["b_sp1"] = np.full((p.S, p.J), 0.01)
+        return output
+
+    monkeypatch.setattr(est.SS, "run_SS", run_SS)
+
+    def fsolve():
+        pass
+
+    monkeypatch.setattr(est.SS, "SS_fsolve", fsolve)
+    monkeypatch.setattr(est, "_SS_FSOLVE", fsolve)
+    moments, guess, nfev = est.solve_model_moments(p, np.ones(p.S))
+    assert np.allclose(moments, 0.4 / p.ltilde)
+    assert nfev == 1
+    assert est.solve_model_moments(p, np.full(p.S, 20.0)) == (None, None, 1)
+    assert hooked == [True, True]
+    assert est.SS.SS_fsolve is fsolve
+    assert est.SS.SS_initial_guesses is est._SS_INITIAL_GUESSES
+
+
+@pytest.mark.local
+def test_solve_model_moments_warm_start(tmp_path):
+    p = Specifications(baseline=True, output_base=str(tmp_path))
+    chi_n = p.chi_n[0, :]
+    moments, guess, nfev = est.solve_model_moments(p, chi_n)
+    cold_moments, _, _ = est.solve_model_moments(p, chi_n * 1.001)
+    warm_moments, _, warm_nfev = est.solve_model_moments(
+        p, chi_n * 1.001, guess
+    )
+    assert warm_nfev < nfev
+    assert np.allclose(warm_moments, cold_moments, atol=1e-8)
+
+
+def test_chi_estimate(fake_solver, qlfs_dir, tmp_path, capsys):
+    p = Specifications(output_base=str(tmp_path))
+    chi_n = est.chi_estimate(
+        p,
+        estimate=False,
+        plot=True,
+        data_dir=qlfs_dir,
+        n_boot=50,
+        seed=0,
+    )
+    assert np.array_equal(chi_n, p.chi_n[0, :])
+    assert (tmp_path / "labor_moments_fit.png").exists()
+    chi_n = est.chi_estimate(
+        p, estimate=True, data_dir=qlfs_dir, n_boot=50, seed=0
+    )
+    # the gradient steps are evaluated together with each trial point
+    assert len(fake_solver) % (est.NUM_BASIS + 1) == 1
+    capture = capsys.readouterr().out
+    assert "warm started" in capture
+    assert chi_n.shape == (p.S,)
+    data_moments = labor.compute_labor_moments(
+        labor.get_labor_data(2023, qlfs_dir), p.S
+    )[3]
+    model_moments = fake_model_moments(p, chi_n)
+    start_moments = fake_model_moments(p, p.chi_n[0, :])
+    assert (
+        np.abs(model_moments - data_moments).mean()
+        < 0.5 * np.abs(start_moments - data_moments).mean()
+    )
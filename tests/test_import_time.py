@@ -0,0 +1,53 @@
+"""
+Tests that importing the ogeth package stays cheap
+"""
+
+import sys
+import subprocess
+import pytest
+
+# modules that should only be imported when they are needed
+HEAVY_MODULES = ["pandas", "statsmodels", "ogcore", "scipy", "matplotlib"]
+
+
+def import_times(statement):
+    """
+    Run a statement in a new interpreter with ``python -X importtime``
+    and return the cumulative import time in microseconds of each
+    module that was imported
+    """
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        times[module.strip()] = int(cumulative)
+
+    return times
+
+
+def test_import_ogeth():
+    times = import_times("import ogeth")
+    assert "ogeth" in times
+    for module in HEAVY_MODULES:
+        assert module not in times, module + " imported by import ogeth"
+    assert "ogeth.input_output" not in times
+
+
+@pytest.mark.parametrize(
+    "statement,module",
+    [
+        ("import ogeth; ogeth.get_alpha_c", "pandas"),
+        ("import ogeth; ogeth.Calibration", "ogcore"),
+        ("from ogeth import *", "statsmodels"),
+    ],
+    ids=["get_alpha_c", "Calibration", "star import"],
+)
+def test_lazy_attributes(statement, module):
+    assert module in import_times(statement)
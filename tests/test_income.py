@@ -0,0 +1,288 @@
+"""
+Tests of income.py module
+"""
+
+import io
+import os
+import time
+import urllib.error
+import pytest
+import numpy as np
+import scipy.optimize as opt
+import scipy.interpolate as si
+from ogcore import utils
+from ogeth import income
+
+
+@pytest.fixture
+def fake_ogusa(monkeypatch):
+    """
+    Serve an empty OG-USA parameter file (so the OG-Core defaults are
+    used as the USA baseline) and count the number of downloads.
+    """
+    calls = {"n": 0, "content": b"{}", "fail": False}
+
+    def urlopen(url, timeout=None):
+        calls["n"] += 1
+        if calls["fail"]:
+            raise urllib.error.URLError("no network")
+        return io.BytesIO(calls["content"])
+
+    monkeypatch.setattr(income.urllib.request, "urlopen", urlopen)
+
+    return calls
+
+
+def test_get_usa_baseline_cache(fake_ogusa, tmp_path):
+    usa1 = income.get_usa_baseline(cache_dir=tmp_path)
+    assert fake_ogusa["n"] == 1
+    assert usa1["e"].shape == (usa1["S"], usa1["J"])
+    assert len(os.listdir(tmp_path)) == 1
+    # second call is served from the cache without a download
+    usa2 = income.get_usa_baseline(cache_dir=tmp_path)
+    assert fake_ogusa["n"] == 1
+    for k in income.USA_BASELINE_KEYS:
+        assert np.array_equal(usa1[k], usa2[k])
+
+
+def test_get_usa_baseline_expired(fake_ogusa, tmp_path):
+    income.get_usa_baseline(cache_dir=tmp_path)
+    path = os.path.join(tmp_path, os.listdir(tmp_path)[0])
+    old = time.time() - 2 * income.USA_CACHE_TTL
+    os.utime(path, (old, old))
+    # expired entry with unchanged content is re-validated, not rebuilt
+    income.get_usa_baseline(cache_dir=tmp_path)
+    assert fake_ogusa["n"] == 2
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+    assert os.path.getmtime(path) > old
+    # changed content replaces the expired entry
+    os.utime(path, (old, old))
+    fake_ogusa["content"] = b'{"J": 7}'
+    income.get_usa_baseline(cache_dir=tmp_path)
+    assert len(os.listdir(tmp_path)) == 1
+    assert os.listdir(tmp_path) != [os.path.basename(path)]
+
+
+def test_get_usa_baseline_offline(fake_ogusa, tmp_path):
+    fake_ogusa["fail"] = True
+    with pytest.raises(urllib.error.URLError):
+        income.get_usa_baseline(cache_dir=tmp_path)
+    fake_ogusa["fail"] = False
+    usa1 = income.get_usa_baseline(cache_dir=tmp_path)
+    # stale cache is used when the source can't be reached
+    fake_ogusa["fail"] = True
+    usa2 = income.get_usa_baseline(cache_dir=tmp_path, refresh=True)
+    assert np.array_equal(usa1["e"], usa2["e"])
+
+
+def test_get_usa_baseline_other_urls(fake_ogusa, tmp_path):
+    income.get_usa_baseline(url="https://example.com/b", cache_dir=tmp_path)
+    path = os.path.join(tmp_path, os.listdir(tmp_path)[0])
+    old = time.time() - 2 * income.USA_CACHE_TTL
+    os.utime(path, (old, old))
+    # refreshing one url keeps the expired baselines of the others
+    income.get_usa_baseline(cache_dir=tmp_path)
+    assert os.path.exists(path)
+    fake_ogusa["fail"] = True
+    income.get_usa_baseline(url="https://example.com/b", cache_dir=tmp_path)
+
+
+@pytest.fixture
+def usa_baseline(fake_ogusa, monkeypatch, tmp_path):
+    monkeypatch.setattr(income, "CACHE_DIR", str(tmp_path))
+
+    return income.get_usa_baseline()
+
+
+def test_weighted_gini(usa_baseline):
+    rng = np.random.default_rng(0)
+    emat = rng.lognormal(size=(3, 80, 7))
+    gini = income.weighted_gini(
+        emat, usa_baseline["omega_SS"], usa_baseline["lambdas"]
+    )
+    for k in range(3):
+        expected = utils.Inequality(
+            emat[k],
+            usa_baseline["omega_SS"],
+            usa_baseline["lambdas"],
+            80,
+            7,
+        ).gini()
+        assert np.allclose(gini[k], expected, rtol=0, atol=1e-14)
+
+
+@pytest.mark.parametrize(
+    "S,lambdas",
+    [
+        (80, np.array([[0.25], [0.25], [0.2], [0.1], [0.1], [0.09], [0.01]])),
+        (80, np.array([0.25, 0.25, 0.25, 0.15, 0.1])),
+        (40, np.array([0.25, 0.25, 0.25, 0.15, 0.1])),
+    ],
+    ids=["OG-USA dims", "S=80, J=5", "S=40, J=5"],
+)
+def test_get_e_interp_batch(usa_baseline, S, lambdas):
+    J = lambdas.shape[0]
+    age_wgts = np.ones(S) / S
+    targets = np.array([26.0, 31.1, 38.0])
+    emat = income.get_e_interp_batch(20, S, J, lambdas, age_wgts, targets)
+    assert emat.shape == (3, S, J)
+    for k, gini in enumerate(targets):
+        expected = scalar_e_interp(
+            usa_baseline, 20, S, J, lambdas, age_wgts, gini
+        )
+        assert np.allclose(emat[k], expected, rtol=0, atol=1e-8)
+    assert np.allclose(
+        income.get_e_interp(20, S, J, lambdas, age_wgts, targets[1]),
+        emat[1],
+        rtol=0,
+        atol=1e-12,
+    )
+
+
+def scalar_e_interp(usa, E, S, J, lambdas, age_wgts, gini_to_match):
+    """
+    The original one target get_e_interp, with a bisection on
+    ogcore.utils.Inequality and scipy.interpolate.griddata
+    """
+    lambdas = lambdas.flatten()
+    e_usa = usa["e"]
+    gini_usa_model = utils.Inequality(
+        e_usa, usa["omega_SS"], usa["lambdas"], usa["S"], usa["J"]
+    ).gini()
+
+    def f(a):
+        gini_target_model = utils.Inequality(
+            e_usa * np.exp(a * e_usa),
+            usa["omega_SS"],
+            usa["lambdas"],
+            usa["S"],
+            usa["J"],
+        ).gini()
+        return (gini_to_match / income.GINI_USA_DATA) - (
+            gini_target_model / gini_usa_model
+        )
+
+    a = opt.root_scalar(f, method="bisect", bracket=[-1, 1], xtol=1e-12).root
+    e_new = e_usa * np.exp(a * e_usa)
+    emat = (
+        e_new
+        / (
+            e_new
+            * usa["omega_SS"].reshape(usa["S"], 1)
+            * usa["lambdas"].reshape(1, usa["J"])
+        ).sum()
+    )
+    if S == usa["S"] and np.array_equal(usa["lambdas"].flatten(), lambdas):
+        return emat
+    # summed in this order because the Delaunay triangulation of the
+    # regular grid of midpoints depends on their rounding
+    abil_midp = np.zeros(J)
+    pct_lb = 0.0
+    for j in range(J):
+        abil_midp[j] = pct_lb + 0.5 * lambdas[j]
+        pct_lb += lambdas[j]
+    usa_j_midp = np.zeros(usa["J"])
+    pct_lb = 0.0
+    for m in range(usa["J"]):
+        usa_j_midp[m] = pct_lb + 0.5 * usa["lambdas"][m]
+        pct_lb += usa["lambdas"][m]
+    usa_step = 80 / usa["S"]
+    usa_s_midp = np.linspace(
+        usa["E"] + 0.5 * usa_step,
+        usa["E"] + usa["S"] - 0.5 * usa_step,
+        usa["S"],
+    )
+    usa_j_mesh, usa_s_mesh = np.meshgrid(usa_j_midp, usa_s_midp)
+    step = 80 / S
+    new_s_midp = np.linspace(E + 0.5 * step, E + S - 0.5 * step, S)
+    new_j_mesh, new_s_mesh = np.meshgrid(abil_midp, new_s_midp)
+    emat_new = si.griddata(
+        np.hstack((usa_s_mesh.reshape(-1, 1), usa_j_mesh.reshape(-1, 1))),
+        emat.flatten(),
+        (new_s_mesh, new_j_mesh),
+        method="linear",
+    )
+
+    return (
+        emat_new
+        / (emat_new * age_wgts.reshape(S, 1) * lambdas.reshape(1, J)).sum()
+    )
+
+
+def test_gini_scale_kernel(usa_baseline):
+    emat = usa_baseline["e"]
+    kernel = income.GiniScaleKernel(
+        emat, usa_baseline["omega_SS"], usa_baseline["lambdas"]
+    )
+    # includes values of a for which the sort order of emat changes
+    a = np.array([-1.0, -0.5, kernel.a_min, 0.0, 0.3, 1.0])
+    gini, gini_prime = kernel(a)
+    expected = income.weighted_gini(
+        emat[None, :, :] * np.exp(a.reshape(-1, 1, 1) * emat[None, :, :]),
+        usa_baseline["omega_SS"],
+        usa_baseline["lambdas"],
+    )
+    assert np.allclose(gini, expected, rtol=0, atol=1e-13)
+    h = 1e-6
+    fd = (kernel(a + h)[0] - kernel(a - h)[0]) / (2 * h)
+    assert np.allclose(gini_prime, fd, rtol=1e-5, atol=1e-6)
+
+
+def test_get_gini_scale(usa_baseline):
+    targets = np.array([26.0, 31.1, 41.5, 50.0])
+    a = income.get_gini_scale(targets, usa_baseline)
+    # compare to the bisection on ogcore.utils.Inequality
+    gini_usa_model = utils.Inequality(
+        usa_baseline["e"],
+        usa_baseline["omega_SS"],
+        usa_baseline["lambdas"],
+        usa_baseline["S"],
+        usa_baseline["J"],
+    ).gini()
+    for k, gini in enumerate(targets):
+
+        def f(x):
+            return gini / income.GINI_USA_DATA - utils.Inequality(
+                usa_baseline["e"] * np.exp(x * usa_baseline["e"]),
+                usa_baseline["omega_SS"],
+                usa_baseline["lambdas"],
+                usa_baseline["S"],
+                usa_baseline["J"],
+            ).gini() / (gini_usa_model)
+
+        expected = opt.root_scalar(
+            f, method="bisect", bracket=[-1, 1], xtol=1e-10
+        ).root
+        assert np.allclose(a[k], expected, rtol=0, atol=2e-10)
+
+
+@pytest.mark.parametrize(
+    "E,S,lambdas",
+    [
+        (20, 80, np.array([0.25, 0.25, 0.25, 0.15, 0.1])),
+        (20, 40, np.array([0.25, 0.25, 0.2, 0.1, 0.1, 0.05, 0.04, 0.01])),
+        # ages below the OG-USA grid are outside of the triangulation
+        (15, 80, np.array([0.25, 0.25, 0.25, 0.15, 0.1])),
+    ],
+    ids=["S=80", "S=40", "E=15"],
+)
+def test_get_interp_matrix(usa_baseline, E, S, lambdas):
+    usa = usa_baseline
+    interp_mat = income.get_interp_matrix(E, S, lambdas, usa)
+    # memoized
+    assert income.get_interp_matrix(E, S, lambdas, usa) is interp_mat
+    s_midp, j_midp = income.get_midpoints(usa["E"], usa["S"], usa["lambdas"])
+    j_mesh, s_mesh = np.meshgrid(j_midp, s_midp)
+    new_s_midp, new_j_midp = income.get_midpoints(E, S, lambdas)
+    new_j_mesh, new_s_mesh = np.meshgrid(new_j_midp, new_s_midp)
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(size=(usa["S"] * usa["J"], 3))
+    expected = si.griddata(
+        np.hstack((s_mesh.reshape(-1, 1), j_mesh.reshape(-1, 1))),
+        values,
+        (new_s_mesh, new_j_mesh),
+        method="linear",
+    ).reshape(S * lambdas.shape[0], 3)
+    assert np.allclose(
+        interp_mat @ values, expected, rtol=0, atol=1e-13, equal_nan=True
+    )
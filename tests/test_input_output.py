@@ -0,0 +1,120 @@
+"""
+Tests of input_output.py module
+"""
+
+import os
+import shutil
+import pytest
+import numpy as np
+from ogeth import input_output as io
+from ogeth.constants import CONS_DICT, PROD_DICT
+
+
+def test_sam_matrix_cache(tmp_path):
+    csv_path = os.path.join(tmp_path, "sam.csv")
+    shutil.copy(io.sam_path, csv_path)
+    matrix, row_index, col_index = io.get_sam_matrix(csv_path)
+    assert isinstance(matrix, np.memmap) and not matrix.flags.writeable
+    assert os.path.exists(os.path.join(tmp_path, "sam.npy"))
+    sam = io.get_sam(csv_path)
+    assert np.array_equal(
+        matrix[row_index["cmaiz"], [col_index["hhd-r1"], col_index["gov"]]],
+        sam.loc["cmaiz", ["hhd-r1", "gov"]].values.astype(float),
+    )
+    # the cache is reused by a new process and rebuilt if the csv changes
+    io._load_sam_matrix.cache_clear()
+    mtime = os.path.getmtime(os.path.join(tmp_path, "sam.npy"))
+    assert np.array_equal(io.get_sam_matrix(csv_path)[0], matrix)
+    assert os.path.getmtime(os.path.join(tmp_path, "sam.npy")) == mtime
+    # the csv is only hashed again once it changes
+    csv_hash = io.get_sam_hash(csv_path)
+    misses = io._hash_sam.cache_info().misses
+    assert io.get_sam_hash(csv_path) == csv_hash
+    assert io._hash_sam.cache_info().misses == misses
+    with open(csv_path, "r") as file:
+        lines = file.readlines()
+    lines[1] = lines[1].replace("Activities - Maize", "Maize")
+    with open(csv_path, "w") as file:
+        file.writelines(lines)
+    io._load_sam_matrix.cache_clear()
+    io.get_sam_matrix(csv_path)
+    assert os.path.getmtime(os.path.join(tmp_path, "sam.npy")) != mtime
+    assert io.get_sam_hash(csv_path) != csv_hash
+
+
+def test_get_io_matrix():
+    sam = io.get_sam()
+    io_df = io.get_io_matrix()
+    # label based calculation on the SAM DataFrame
+    expected = np.array(
+        [
+            [
+                sam.loc[sam.index.isin(cv), pv].values.astype(float).sum()
+                for pv in PROD_DICT.values()
+            ]
+            for cv in CONS_DICT.values()
+        ]
+    )
+    expected = expected / expected.sum(axis=1, keepdims=True)
+    assert np.allclose(io_df.values, expected)
+    assert np.allclose(io.get_io_matrix(sam).values, expected)
+    alpha_c = io.get_alpha_c()
+    assert np.isclose(sum(alpha_c.values()), 1.0)
+    assert io.get_alpha_c(sam) == alpha_c
+
+
+def test_fine_grained_io_matrix():
+    sam = io.get_sam()
+    cons_dict = {c: [c] for c in sam.index if str(c).startswith("c")}
+    prod_dict = {a: [a] for a in sam.columns if str(a).startswith("a")}
+    io_df = io.get_io_matrix(cons_dict=cons_dict, prod_dict=prod_dict)
+    assert io_df.shape == (len(cons_dict), len(prod_dict))
+    levels = sam.loc[list(cons_dict), list(prod_dict)].values.astype(float)
+    with np.errstate(invalid="ignore"):
+        expected = levels / levels.sum(axis=1, keepdims=True)
+    assert np.allclose(io_df.values, expected, equal_nan=True)
+    C = io.get_aggregation_matrix(io.get_sam_matrix()[1], CONS_DICT)
+    assert C.shape == (len(CONS_DICT), len(io.get_sam_matrix()[1]))
+    assert C.sum() == sum(len(v) for v in CONS_DICT.values())
+
+
+def test_get_io_batch():
+    services = dict(CONS_DICT)
+    services["Services"] = [
+        c for c in CONS_DICT["Services"] if c not in ["celec", "cwatr"]
+    ]
+    services["Utilities"] = ["celec", "cwatr"]
+    coffee = {k: [c for c in v if c != "ccoff"] for k, v in CONS_DICT.items()}
+    coffee["Coffee"] = ["ccoff"]
+    coffee_prod = {
+        k: [a for a in v if a != "acoff"] for k, v in PROD_DICT.items()
+    }
+    coffee_prod["Coffee"] = ["acoff"]
+    schemes = [
+        (CONS_DICT, PROD_DICT),
+        (services, PROD_DICT),
+        (coffee, coffee_prod),
+    ]
+    results = io.get_io_batch(schemes)
+    assert results[0][0] == io.get_alpha_c()
+    assert results[0][1].equals(io.get_io_matrix())
+    for (cons_dict, prod_dict), (alpha_c, io_df) in zip(schemes, results):
+        assert alpha_c == io.get_alpha_c(cons_dict=cons_dict)
+        assert np.allclose(
+            io_df.values, io.get_io_matrix(None, cons_dict, prod_dict).values
+        )
+    assert list(results[2][1].columns)[-1] == "Coffee"
+
+
+@pytest.mark.parametrize(
+    "cons_dict,message",
+    [
+        ({"Food": ["cmaiz"]}, "missing"),
+        (dict(CONS_DICT, Coffee=["ccoff"]), "repeated ccoff"),
+        (dict(CONS_DICT, Other=["amaiz"]), "not commodities amaiz"),
+    ],
+    ids=["missing", "repeated", "unknown"],
+)
+def test_validate_scheme(cons_dict, message):
+    with pytest.raises(ValueError, match=message):
+        io.get_io_batch([(CONS_DICT, PROD_DICT), (cons_dict, PROD_DICT)])
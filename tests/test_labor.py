@@ -0,0 +1,244 @@
+"""
+Tests of labor.py module
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import pytest
+import numpy as np
+import pandas as pd
+from scipy import interpolate
+from ogeth import labor
+
+
+def read_labor_data_full(data_dir):
+    """
+    Labor data as read in before chunked reading, with all columns
+    """
+    df = pd.concat(
+        [
+            pd.read_csv(
+                os.path.join(data_dir, f"qlfs-2023-q{q}-worker-v1.csv"),
+                encoding="latin-1",
+                low_memory=False,
+            )
+            for q in range(1, 5)
+        ]
+    )
+    df.rename(
+        columns={
+            "Q418HRSWRK": "hours",
+            "age_grp1": "age_group",
+            "Weight": "weight",
+        },
+        inplace=True,
+    )
+    df["hours"] = df["hours"].str.split().str[-1]
+    df["hours"] = pd.to_numeric(df["hours"], errors="coerce").fillna(0)
+
+    return df
+
+
+def test_get_labor_data(qlfs_dir):
+    df = labor.get_labor_data(2023, qlfs_dir, chunksize=1000)
+    full = read_labor_data_full(qlfs_dir)
+    assert list(df.columns) == ["age_group", "hours", "weight"]
+    assert df["weight"].dtype == np.float32
+    assert isinstance(df["age_group"].dtype, pd.CategoricalDtype)
+    assert np.array_equal(df["hours"].values, full["hours"].values)
+
+
+@pytest.mark.parametrize("chunksize", [500, 100_000])
+def test_get_labor_sums(qlfs_dir, chunksize):
+    sums = labor.get_labor_sums(2023, qlfs_dir, chunksize)
+    full = read_labor_data_full(qlfs_dir)
+    by_age = full.groupby("age_group")[["hours", "weight"]].apply(
+        lambda x: (x["hours"] * x["weight"]).sum() / x["weight"].sum()
+    )
+    # labels mangled by Excel are merged into their age groups
+    assert list(sums.index) == labor.AGE_GROUPS
+    model = labor.MODEL_AGE_GROUPS
+    assert np.allclose(
+        (sums["weighted_hours"] / sums["weight"]).loc[model].values,
+        by_age.loc[model].values,
+        rtol=1e-6,
+    )
+    assert np.isclose(
+        sums.loc["10-14", "weight"],
+        full.loc[full["age_group"].isin(["10-14", "14-Oct"]), "weight"].sum(),
+    )
+    moments = labor.compute_labor_moments(sums)[0]
+    assert moments.shape == (80,)
+    assert np.allclose(
+        moments, labor.compute_labor_moments(full)[0], rtol=1e-6
+    )
+
+
+def test_convert_labor_data(qlfs_dir, tmp_path):
+    files = labor.convert_labor_data(
+        [2022, 2023], qlfs_dir, parquet_dir=tmp_path, max_workers=2
+    )
+    # there are no 2022 files
+    assert len(files) == 4
+    assert os.path.exists(
+        os.path.join(tmp_path, "year=2023", "quarter=3", "part-0.parquet")
+    )
+    from_csv = labor.get_labor_data(2023, qlfs_dir)
+    from_parquet = labor.get_labor_data(2023, qlfs_dir, parquet_dir=tmp_path)
+    for col in ["hours", "weight"]:
+        assert np.array_equal(from_parquet[col].values, from_csv[col].values)
+    assert list(from_parquet["age_group"].astype(str)) == list(
+        from_csv["age_group"].astype(str)
+    )
+    sums = labor.get_labor_sums(2023, qlfs_dir, parquet_dir=tmp_path)
+    assert np.allclose(sums, labor.get_labor_sums(2023, qlfs_dir))
+    both = labor.get_labor_data([2023, 2023], qlfs_dir, parquet_dir=tmp_path)
+    assert len(both) == 2 * len(from_csv)
+
+
+def test_labor_moments(qlfs_dir):
+    df = labor.get_labor_data(2023, qlfs_dir)
+    labor_dist_data, age_midpoints, by_age, _ = labor.compute_labor_moments(df)
+    assert list(by_age.index) == labor.MODEL_AGE_GROUPS[:-1] + ["75-85"]
+    assert list(age_midpoints) == list(labor.AGE_MIDPOINTS)
+    moments = labor.labor_moments(
+        df["age_group"].cat.codes.values,
+        df["hours"].values,
+        df["weight"].values,
+    )
+    assert np.allclose(moments, labor_dist_data)
+
+
+@pytest.mark.parametrize("method", ["half", "poisson", "multinomial"])
+def test_bootstrap_labor_moments(qlfs_dir, method):
+    df = labor.get_labor_data(2023, qlfs_dir)
+    df = df[df["age_group"].isin(labor.MODEL_AGE_GROUPS)]
+    codes = df["age_group"].cat.codes.values
+    hours = df["hours"].values
+    weight = df["weight"].values
+    moments = labor.bootstrap_labor_moments(df, 6, method, seed=7)
+    # each replicate is the moments of the resampled data
+    rng = np.random.default_rng(np.random.SeedSequence(7).spawn(1)[0])
+    weights = labor.resample_weights(rng, 6, len(df), method)
+    for i in range(6):
+        expected = labor.labor_moments(
+            codes, hours, weight * weights[i].astype(np.float32)
+        )
+        assert np.allclose(moments[i], expected)
+    # replicates are reproducible for a given seed and block size
+    assert np.array_equal(
+        labor.bootstrap_labor_moments(df, 6, method, seed=7, block_size=2),
+        labor.bootstrap_labor_moments(df, 6, method, seed=7, block_size=2),
+    )
+    assert not np.array_equal(
+        labor.bootstrap_labor_moments(df, 6, method, seed=8), moments
+    )
+
+
+def test_VCV_moments(qlfs_dir):
+    df = labor.get_labor_data(2023, qlfs_dir)
+    VCV = labor.VCV_moments(df, n=200, seed=0, block_size=30)
+    assert VCV.shape == (80, 80)
+    assert np.allclose(VCV, VCV.T)
+    assert (np.diag(VCV) > 0).all()
+    moments = labor.bootstrap_labor_moments(df, 200, seed=0, block_size=30)
+    assert np.allclose(VCV, np.cov(moments.T))
+    # the same result with any number of workers
+    for executor in [
+        ThreadPoolExecutor(max_workers=3),
+        ProcessPoolExecutor(max_workers=2),
+    ]:
+        with executor:
+            assert np.array_equal(
+                labor.VCV_moments(
+                    df, n=200, seed=0, block_size=30, executor=executor
+                ),
+                VCV,
+            )
+
+
+def test_VCV_moments_too_few(qlfs_dir):
+    df = labor.get_labor_data(2023, qlfs_dir)
+    with pytest.raises(ValueError, match="1 of 1"):
+        labor.VCV_moments(df, n=1, seed=0)
+
+
+def test_VCV_moments_dask(qlfs_dir):
+    distributed = pytest.importorskip("distributed")
+    df = labor.get_labor_data(2023, qlfs_dir)
+    VCV = labor.VCV_moments(df, n=100, seed=1, block_size=25)
+    with distributed.Client(
+        n_workers=2, threads_per_worker=1, processes=False
+    ) as client:
+        assert np.array_equal(
+            labor.VCV_moments(
+                df, n=100, seed=1, block_size=25, executor=client
+            ),
+            VCV,
+        )
+
+
+def test_labor_dist_operator():
+    rng = np.random.default_rng(0)
+    hours = rng.uniform(10, 50, (5, len(labor.AGE_MIDPOINTS)))
+    operator = labor.get_labor_dist_operator()
+    assert operator.shape == (80, len(labor.AGE_MIDPOINTS))
+    assert not operator.flags.writeable
+    assert labor.get_labor_dist_operator() is operator
+    # same as fitting the spline to each replicate
+    frac_work = hours / ((24 - 8) * 7)
+    spline = interpolate.interp1d(
+        labor.AGE_MIDPOINTS, frac_work, kind="cubic"
+    )(np.linspace(20, 80, 60))
+    moments = labor.labor_dist_from_hours(hours, labor.AGE_MIDPOINTS)
+    assert np.allclose(moments[:, :60], spline)
+    slope = (spline[:, -1] - spline[:, -8]) / 9
+    assert np.allclose(
+        moments[:, 60:], spline[:, -1:] + slope[:, None] * np.arange(20)
+    )
+    # moments for 40 model periods are averages over two years of age
+    assert np.allclose(
+        labor.labor_dist_from_hours(hours, labor.AGE_MIDPOINTS, S=40),
+        moments.reshape(5, 40, 2).mean(axis=2),
+    )
+
+
+def test_labor_moments_S(qlfs_dir):
+    df = labor.get_labor_data(2023, qlfs_dir)
+    labor_dist_data, _, _, labor_dist_out = labor.compute_labor_moments(
+        df, S=20
+    )
+    assert np.allclose(labor_dist_out, labor_dist_data.reshape(20, 4).mean(1))
+    VCV = labor.VCV_moments(df, n=50, S=20, seed=0)
+    assert VCV.shape == (20, 20)
+    # model periods of 80 / 30 years
+    _, _, _, labor_dist_out = labor.compute_labor_moments(df, S=30)
+    assert labor_dist_out.shape == (30,)
+    assert np.isclose(
+        labor_dist_out[0],
+        (labor_dist_data[0] + labor_dist_data[1] + 2 / 3 * labor_dist_data[2])
+        * 3
+        / 8,
+    )
+    moments = labor.bootstrap_labor_moments(df, 20, seed=0, S=30)
+    assert np.allclose(
+        moments,
+        labor.bootstrap_labor_moments(df, 20, seed=0)
+        @ labor.get_age_aggregation_matrix(30).T,
+    )
+
+
+@pytest.mark.parametrize("S", [80, 40, 30, 7, 160])
+def test_age_aggregation_matrix(S):
+    agg_matrix = labor.get_age_aggregation_matrix(S)
+    assert agg_matrix.shape == (S, 80)
+    assert np.allclose(agg_matrix.sum(axis=1), 1)
+    # every year of age is fully allocated to the model periods
+    assert np.allclose(agg_matrix.sum(axis=0) * 80 / S, 1)
+    if 80 % S == 0:
+        assert np.allclose(
+            agg_matrix, np.kron(np.eye(S), np.full(80 // S, S / 80))
+        )
+    # the mean over all ages is unchanged
+    ages = np.arange(80.0)
+    assert np.isclose((agg_matrix @ ages).mean(), ages.mean())
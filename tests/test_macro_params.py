@@ -2,8 +2,68 @@
 Tests of macro_params.py module
 """
 
+import json
+import time
+import threading
+import datetime
+import http.server
 import pytest
-from ogeth import macro_params
+import requests
+from urllib.parse import urlparse
+from ogeth import macro_params, snapshots
+
+WB_VALUES = {"2022": 900.0, "2023": 950.0, "2024": 1000.0}
+ILO_CSV = "ref_area,time,obs_value\nETH,2023,42.0\nETH,2024,40.0\n"
+
+
+class FakeAPIHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Stand-in for the World Bank and ILOSTAT APIs
+    """
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path.startswith("/wb/"):
+            body = json.dumps(
+                [
+                    {"page": 1, "pages": 1, "total": len(WB_VALUES)},
+                    [
+                        {
+                            "country": {"id": "ET", "value": "Ethiopia"},
+                            "date": year,
+                            "value": value,
+                        }
+                        for year, value in sorted(WB_VALUES.items())[::-1]
+                    ],
+                ]
+            )
+            content_type = "application/json"
+        elif path.startswith("/ilo/"):
+            body = ILO_CSV
+            content_type = "text/csv"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FakeAPIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = "http://127.0.0.1:" + str(server.server_address[1])
+    monkeypatch.setattr(macro_params, "WB_API_URL", url + "/wb")
+    monkeypatch.setattr(macro_params, "ILO_API_URL", url + "/ilo/")
+    yield url
+    server.shutdown()
+    server.server_close()
 
 
 @pytest.mark.parametrize(
@@ -11,7 +71,7 @@ from ogeth import macro_params
     [True, False],
     ids=["update_from_api=True", "update_from_api=False"],
 )
-def test_get_macro_params(update_from_api):
+def test_get_macro_params(fake_api, update_from_api):
     test_dict = macro_params.get_macro_params(update_from_api=update_from_api)
 
     assert isinstance(test_dict, dict)
@@ -35,3 +95,90 @@ def test_get_macro_params(update_from_api):
             list(test_dict.keys()).sort()
             == ["r_gov_shift", "r_gov_scale"].sort()
         )
+
+
+def test_fetch_sources():
+    calls = {"flaky": 0}
+
+    def slow(delay, session=None, timeout=None):
+        time.sleep(delay)
+        return delay
+
+    def flaky(session=None, timeout=None):
+        calls["flaky"] += 1
+        if calls["flaky"] < 2:
+            raise requests.ConnectionError("connection reset")
+        return "ok"
+
+    def broken(session=None, timeout=None):
+        raise ValueError("bad data")
+
+    start = time.time()
+    results, status = macro_params.fetch_sources(
+        {
+            "slow1": (slow, {"delay": 0.5}),
+            "slow2": (slow, {"delay": 0.5}),
+            "flaky": (flaky, {}),
+            "broken": (broken, {}),
+        },
+        max_retries=2,
+        backoff=0.01,
+    )
+    # sources are fetched at the same time
+    assert time.time() - start < 0.9
+    assert results == {"slow1": 0.5, "slow2": 0.5, "flaky": "ok"}
+    assert status["flaky"]["ok"] and status["flaky"]["attempts"] == 2
+    assert not status["broken"]["ok"]
+    assert status["broken"]["attempts"] == 3
+    assert "bad data" in status["broken"]["error"]
+
+
+def test_snapshot_round_trip(fake_api, tmp_path, monkeypatch):
+    params, status = macro_params.get_macro_params(
+        update_from_api=True,
+        save_snapshot=True,
+        snapshot_dir=tmp_path,
+        return_status=True,
+    )
+    assert status["wb"]["ok"] and status["ilo"]["ok"]
+    assert params["gamma"] == [0.6]
+    snapshot_id = status["wb"]["snapshot"]
+    info = snapshots.get_snapshot_info("latest", tmp_path)
+    assert info["id"] == snapshot_id
+    assert info["series"]["ilo"]["query"]["series"] == "SDG_1041_NOC_RT_A"
+    assert info["series"]["wb"]["query"]["url"] == fake_api + "/wb"
+    # reproduce the parameters from the snapshot without the APIs
+    monkeypatch.setattr(macro_params, "WB_API_URL", "http://127.0.0.1:9/wb")
+    monkeypatch.setattr(macro_params, "ILO_API_URL", "http://127.0.0.1:9/")
+    from_snapshot = macro_params.get_macro_params(
+        snapshot_id=snapshot_id, snapshot_dir=tmp_path
+    )
+    assert from_snapshot.keys() == params.keys()
+    for key in params.keys():
+        assert from_snapshot[key] == params[key]
+    with pytest.raises(KeyError):
+        snapshots.load_snapshot("missing", tmp_path)
+
+
+def test_snapshots_cli(fake_api, tmp_path, capsys):
+    assert (
+        snapshots.main(
+            [
+                "--snapshot-dir",
+                str(tmp_path),
+                "refresh",
+                "--start-year",
+                "2022",
+            ]
+        )
+        == 0
+    )
+    snapshot_id = capsys.readouterr().out.strip()
+    assert snapshots.main(["--snapshot-dir", str(tmp_path), "list"]) == 0
+    assert snapshot_id in capsys.readouterr().out
+    assert snapshots.main(["--snapshot-dir", str(tmp_path), "show"]) == 0
+    info = json.loads(capsys.readouterr().out)
+    assert info["id"] == snapshot_id
+    data = snapshots.load_snapshot(snapshot_id, tmp_path)
+    assert data["wb"].index.names == ["country", "year"]
+    assert list(data["ilo"]["obs_value"]) == [42.0, 40.0]
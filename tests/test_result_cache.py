@@ -0,0 +1,107 @@
+"""
+Tests of result_cache.py module
+"""
+
+import os
+import pickle
+import pytest
+from ogcore.parameters import Specifications
+from ogeth import result_cache, scenarios
+
+
+def test_get_result_key(tmp_path):
+    p = Specifications(baseline=True, output_base=str(tmp_path / "a"))
+    key = result_cache.get_result_key(p)
+    # paths and the number of workers do not change the solution
+    p.output_base = str(tmp_path / "b")
+    p.num_workers = 3
+    assert result_cache.get_result_key(p) == key
+    assert result_cache.get_result_key(p, time_path=False) != key
+    # nor do the attributes the solvers set
+    p.SS_theta = p.lambdas
+    assert result_cache.get_result_key(p) == key
+    p.update_specifications({"cit_rate": [[0.25]]})
+    assert result_cache.get_result_key(p) != key
+
+
+def test_cached_runner(fake_runner, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    p = Specifications(baseline=True, output_base=str(tmp_path / "a"))
+    assert not result_cache.cached_runner(p, cache_dir=cache_dir)
+    p.output_base = str(tmp_path / "b")
+    assert result_cache.cached_runner(p, cache_dir=cache_dir)
+    p.output_base = str(tmp_path / "c")
+    assert result_cache.cached_runner(p, cache_dir=cache_dir, link=True)
+    assert [c[1] for c in fake_runner.calls] == [str(tmp_path / "a")]
+    for out in ["b", "c"]:
+        for file in [result_cache.SS_FILE, result_cache.TPI_FILE]:
+            with open(tmp_path / "a" / file, "rb") as f:
+                expected = pickle.load(f)
+            with open(tmp_path / out / file, "rb") as f:
+                assert pickle.load(f).keys() == expected.keys()
+        # the parameters of the run that solved the model
+        with open(tmp_path / out / result_cache.PARAMS_FILE, "rb") as f:
+            assert pickle.load(f).output_base == str(tmp_path / "a")
+    assert os.path.islink(tmp_path / "c" / result_cache.SS_FILE)
+    assert os.path.islink(tmp_path / "c" / result_cache.PARAMS_FILE)
+    # the SS only solution is cached on its own
+    assert not result_cache.cached_runner(
+        p, time_path=False, cache_dir=cache_dir
+    )
+    stats = result_cache.get_stats(cache_dir)
+    assert stats["entries"] == 2
+    assert stats["hits"] == 2
+
+
+def test_evict_results(fake_runner, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    keys = []
+    for i, rate in enumerate([0.2, 0.25, 0.3]):
+        p = Specifications(baseline=True, output_base=str(tmp_path / str(i)))
+        p.update_specifications({"cit_rate": [[rate]]})
+        result_cache.runner(p)
+        keys.append(result_cache.save_results(p, cache_dir=cache_dir))
+        if i == 0:
+            size = result_cache.list_results(cache_dir)[0]["size"]
+            p0 = p
+    # using the first entry makes the second the least recently used
+    assert result_cache.load_results(p0, cache_dir=cache_dir)
+    removed = result_cache.evict_results(cache_dir, 2 * size)
+    assert removed == [keys[1]]
+    assert [e["key"] for e in result_cache.list_results(cache_dir)] == [
+        keys[0],
+        keys[2],
+    ]
+    assert result_cache.main(["--cache-dir", cache_dir, "list"]) == 0
+    assert result_cache.main(["--cache-dir", cache_dir, "stats"]) == 0
+    assert (
+        result_cache.main(
+            ["--cache-dir", cache_dir, "evict", "--max-bytes", "0"]
+        )
+        == 0
+    )
+    assert result_cache.get_stats(cache_dir)["entries"] == 0
+
+
+def test_run_scenarios_cache(fake_runner, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    p = Specifications()
+    reforms = [{"cit_rate": [[0.25]]}]
+    for save_dir in ["a", "b"]:
+        manifest = scenarios.run_scenarios(
+            p,
+            reforms,
+            str(tmp_path / save_dir),
+            use_cache=True,
+            cache_dir=cache_dir,
+        )
+    # the reform is found in the cache even though the solver changes
+    # its parameters
+    assert [m["cached"] for m in manifest] == [True, True]
+    assert len(fake_runner.calls) == 2
+    # with the parameters the solver set
+    with open(
+        os.path.join(manifest[1]["output_dir"], result_cache.PARAMS_FILE),
+        "rb",
+    ) as f:
+        assert "SS_theta" in vars(pickle.load(f))
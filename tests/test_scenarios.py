@@ -0,0 +1,86 @@
+"""
+Tests of scenarios.py module
+"""
+
+import os
+import pytest
+from ogcore.parameters import Specifications
+from ogeth import scenarios
+
+
+def test_split_workers():
+    groups = scenarios.split_workers(["a", "b", "c", "d", "e"], 2)
+    assert groups == [["a", "b", "c"], ["d", "e"]]
+
+
+def test_run_scenarios(fake_runner, tmp_path):
+    distributed = pytest.importorskip("distributed")
+    calls = fake_runner.calls
+    p = Specifications()
+    reforms = [{"cit_rate": [[0.25]]}, {"cit_rate": [[0.2]]}]
+    with distributed.Client(
+        n_workers=4, threads_per_worker=1, processes=False
+    ) as client:
+        manifest = scenarios.run_scenarios(
+            p, reforms, str(tmp_path), client=client, names=["a", "b"]
+        )
+        workers = set(client.scheduler_info()["workers"])
+    # the baseline uses all workers and the reforms split them
+    assert [m["name"] for m in manifest] == ["baseline", "a", "b"]
+    assert calls[0][0] and calls[0][2] == workers
+    reform_workers = [c[2] for c in calls[1:]]
+    assert all(len(w) <= 2 for w in reform_workers)
+    assert not reform_workers[0] & reform_workers[1]
+    assert fake_runner.max_running == 2
+    for entry, reform in zip(manifest[1:], reforms):
+        assert entry["status"] == "complete"
+        assert entry["updates"] == reform
+        assert entry["num_workers"] == 2
+        assert not entry["baseline"]
+        assert entry["baseline_dir"] == manifest[0]["output_dir"]
+        assert scenarios.read_manifest(entry["output_dir"]) == entry
+        with open(
+            os.path.join(entry["output_dir"], "SS", "SS_vars.pkl"), "rb"
+        ) as f:
+            assert f.read()
+    assert scenarios.read_manifest(str(tmp_path)) == manifest
+
+
+def test_run_scenarios_serial(fake_runner, tmp_path):
+    calls = fake_runner.calls
+    p = Specifications()
+    with pytest.raises(FileNotFoundError):
+        scenarios.run_scenarios(
+            p, [{}], str(tmp_path), run_baseline=False, time_path=False
+        )
+    scenarios.run_scenarios(p, [], str(tmp_path), time_path=False)
+    # a baseline run outside of run_scenarios, without a manifest
+    os.remove(
+        os.path.join(
+            str(tmp_path), scenarios.BASELINE_DIR, scenarios.MANIFEST_FILE
+        )
+    )
+    manifest = scenarios.run_scenarios(
+        p,
+        [{"cit_rate": [[0.99]]}, {"cit_rate": [[0.2]]}],
+        str(tmp_path),
+        run_baseline=False,
+        time_path=False,
+    )
+    # the baseline is not rerun and a failed reform does not stop the
+    # others
+    assert len(calls) == 2
+    assert fake_runner.max_running == 1
+    assert manifest[0]["output_dir"] == os.path.join(
+        str(tmp_path), scenarios.BASELINE_DIR
+    )
+    assert [m["status"] for m in manifest] == [
+        "complete",
+        "failed",
+        "complete",
+    ]
+    assert "Steady state" in manifest[1]["error"]
+    assert scenarios.scenario_complete(manifest[2]["output_dir"], False)
+    assert not scenarios.scenario_complete(manifest[1]["output_dir"], False)
+    with pytest.raises(ValueError):
+        scenarios.run_scenarios(p, [{}, {}], str(tmp_path), names=["a"])
@@ -0,0 +1,107 @@
+"""
+Tests of sweep.py module
+"""
+
+import os
+import numpy as np
+import pytest
+from ogcore.parameters import Specifications
+from ogeth import scenarios, sweep
+
+# the macro aggregates written by the fake_runner fixture
+VAR_LIST = ["Y", "C"]
+
+
+def test_grid_scenarios():
+    points = sweep.grid_scenarios(
+        {"cit_rate": [0.2, 0.3], "tau_c": [0.1, 0.15], "alpha_G": [0.05]}
+    )
+    assert len(points) == 4
+    assert points[1] == {"cit_rate": 0.2, "tau_c": 0.15, "alpha_G": 0.05}
+
+
+def test_latin_hypercube_scenarios():
+    bounds = {"cit_rate": (0.2, 0.4), "tau_c": (0.0, 0.2)}
+    points = sweep.latin_hypercube_scenarios(bounds, 10, seed=0)
+    assert points == sweep.latin_hypercube_scenarios(bounds, 10, seed=0)
+    # one point in each tenth of the range of each parameter
+    for name, (low, high) in bounds.items():
+        values = np.array([point[name] for point in points])
+        bins = np.floor((values - low) / (high - low) * 10)
+        assert sorted(bins) == list(range(10))
+
+
+def test_get_reform():
+    p = Specifications()
+    reform = sweep.get_reform(p, {"cit_rate": 0.25, "alpha_G": 0.05})
+    assert reform == {"cit_rate": [[0.25]], "alpha_G": [0.05]}
+
+
+def test_run_sweep(fake_runner, tmp_path):
+    distributed = pytest.importorskip("distributed")
+    calls = fake_runner.calls
+    p = Specifications()
+    points = sweep.grid_scenarios({"cit_rate": [0.2, 0.3], "tau_c": [0.1]})
+    points += [{"cit_rate": 0.99, "tau_c": 0.1}]
+    points += sweep.grid_scenarios({"cit_rate": [0.25], "tau_c": [0.05]})
+    with distributed.Client(
+        n_workers=4, threads_per_worker=1, processes=False
+    ) as client:
+        results = sweep.run_sweep(
+            p,
+            points,
+            str(tmp_path),
+            client=client,
+            max_concurrent=2,
+            var_list=VAR_LIST,
+            num_years=3,
+        )
+    # the baseline and three of the four reforms, at most two at a time
+    assert len(calls) == 4
+    assert fake_runner.max_running == 2
+    # two variables for three years, the budget window, and the SS
+    assert len(results) == 3 * 2 * 5
+    assert sorted(results["scenario"].unique()) == [0, 1, 3]
+    years = [str(p.start_year + t) for t in range(3)]
+    assert set(results["year"]) == set(
+        years + [years[0] + "-" + years[-1], "SS"]
+    )
+    base = 1 + p.cit_rate[0, 0] + p.tau_c[0, 0]
+    for _, row in results.iterrows():
+        reform = 1 + row["cit_rate"] + row["tau_c"]
+        assert np.isclose(row["pct_diff"], (reform - base) / base * 100)
+
+    # resuming reruns only the failed point
+    results = sweep.run_sweep(
+        p, points, str(tmp_path), var_list=VAR_LIST, num_years=3
+    )
+    assert len(calls) == 5
+    assert calls[-1][1].endswith("00002")
+    assert len(results) == 4 * 2 * 5
+    with pytest.raises(ValueError):
+        sweep.run_sweep(p, points[:2], str(tmp_path), var_list=VAR_LIST)
+
+
+def test_run_sweep_steady_state(fake_runner, tmp_path):
+    calls = fake_runner.calls
+    p = Specifications()
+    # a point with invalid parameter values fails on its own
+    points = sweep.grid_scenarios({"cit_rate": [0.2, 5.0, 0.3]})
+    kwargs = {"time_path": False, "var_list": VAR_LIST}
+    results = sweep.run_sweep(
+        p, points, str(tmp_path), keep_output=False, **kwargs
+    )
+    assert fake_runner.max_running == 1
+    assert len(results) == 2 * 2
+    assert sorted(results["scenario"].unique()) == [0, 2]
+    assert set(results["year"]) == {"SS"}
+    assert not scenarios.scenario_complete(calls[1][1], time_path=False)
+    manifest = scenarios.read_manifest(
+        os.path.join(str(tmp_path), scenarios.REFORM_DIR + "_00001")
+    )
+    assert manifest["status"] == "failed"
+    assert "cit_rate" in manifest["error"]
+    # the results of another baseline are not reused
+    p.update_specifications({"frisch": p.frisch + 0.1})
+    with pytest.raises(ValueError):
+        sweep.run_sweep(p, points, str(tmp_path), **kwargs)